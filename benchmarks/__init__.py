@@ -0,0 +1,14 @@
+"""
+Benchmarks of quail's analyses, loaders and egg operations
+
+The suite follows the conventions of airspeed velocity (asv): classes with
+`params`, `setup` and `time_*` / `peakmem_*` methods.  Results are stored per
+commit in .asv/results, and nothing is downloaded when running against the
+installed environment:
+
+    asv run --python=same          # benchmark the working tree
+    asv continuous master HEAD     # compare two commits
+    asv publish && asv preview     # browse the recorded history
+
+Eggs are synthetic (see benchmarks.common.make_egg), so no data is needed.
+"""
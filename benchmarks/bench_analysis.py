@@ -0,0 +1,74 @@
+"""
+Benchmarks of analyze and recall_matrix
+"""
+import quail
+from quail.analysis.recmat import recall_matrix
+from .common import make_egg
+
+
+class Analyze(object):
+    params = [['pandas', 'columnar'], [10, 100], [16, 64]]
+    param_names = ['backend', 'n_subjects', 'list_length']
+
+    def setup(self, backend, n_subjects, list_length):
+        self.egg = make_egg(n_subjects=n_subjects, list_length=list_length,
+                            backend=backend)
+
+    def time_accuracy(self, *args):
+        self.egg.analyze('accuracy')
+
+    def time_spc(self, *args):
+        self.egg.analyze('spc')
+
+    def time_pfr(self, *args):
+        self.egg.analyze('pfr')
+
+    def time_pnr(self, *args):
+        self.egg.analyze('pnr', position=1)
+
+    def time_lagcrp(self, *args):
+        self.egg.analyze('lagcrp')
+
+    def time_temporal(self, *args):
+        self.egg.analyze('temporal', permute=False)
+
+    def peakmem_lagcrp(self, *args):
+        self.egg.analyze('lagcrp')
+
+
+class Fingerprint(object):
+    params = [['pandas', 'columnar'], [1, 4], [1, 50]]
+    param_names = ['backend', 'n_features', 'feature_dim']
+    timeout = 120
+
+    def setup(self, backend, n_features, feature_dim):
+        self.egg = make_egg(n_subjects=20, n_features=n_features,
+                            feature_dim=feature_dim, backend=backend)
+        # start from an empty distance store
+        quail.analysis.diststore.distance_store.clear()
+
+    def time_fingerprint(self, *args):
+        self.egg.analyze('fingerprint')
+
+    def time_fingerprint_permute(self, *args):
+        self.egg.analyze('fingerprint', permute=True, n_perms=100,
+                         random_state=0)
+
+    def peakmem_fingerprint(self, *args):
+        self.egg.analyze('fingerprint')
+
+
+class RecallMatrix(object):
+    params = [['pandas', 'columnar'], [10, 100], ['exact', 'best']]
+    param_names = ['backend', 'n_subjects', 'match']
+    # the recall matrix is cached by the egg, so every sample starts over
+    number = 1
+
+    def setup(self, backend, n_subjects, match):
+        self.egg = make_egg(n_subjects=n_subjects, backend=backend)
+
+    def time_recall_matrix(self, backend, n_subjects, match):
+        self.egg.clear_recall_cache()
+        # Temporal is the one feature recalled items carry
+        features = None if match == 'exact' else ['Temporal']
+        recall_matrix(self.egg, match=match, features=features)
@@ -0,0 +1,98 @@
+"""
+Benchmarks of creating, slicing, stacking, saving and loading eggs
+"""
+import os
+import shutil
+import tempfile
+import quail
+from quail.helpers import crack_egg, stack_eggs
+from .common import make_egg
+
+
+class Create(object):
+    params = [['pandas', 'columnar'], [10, 100]]
+    param_names = ['backend', 'n_subjects']
+
+    def setup(self, backend, n_subjects):
+        egg = make_egg(n_subjects=n_subjects, n_features=3)
+        arrays = egg.arrays
+        self.items = arrays.items('pres'), arrays.items('rec')
+        self.features = {k: v.decode() for k, v in arrays.pres_features.items()
+                         if k != 'Temporal'}
+        self.nested = [[[dict(item=item, **{k: v[s, l, i] for k, v in self.features.items()})
+                         for i, item in enumerate(lst)]
+                        for l, lst in enumerate(sub)]
+                       for s, sub in enumerate(self.items[0])]
+        self.recalled = arrays.items('rec').tolist()
+
+    def time_init(self, backend, n_subjects):
+        quail.Egg(pres=self.nested, rec=self.recalled, backend=backend)
+
+    def time_from_arrays(self, backend, n_subjects):
+        quail.Egg.from_arrays(*self.items, features=self.features,
+                              backend=backend)
+
+    def peakmem_init(self, backend, n_subjects):
+        quail.Egg(pres=self.nested, rec=self.recalled, backend=backend)
+
+
+class Slice(object):
+    params = [['pandas', 'columnar'], [10, 100]]
+    param_names = ['backend', 'n_subjects']
+
+    def setup(self, backend, n_subjects):
+        self.egg = make_egg(n_subjects=n_subjects, backend=backend)
+        self.subjects = list(range(0, n_subjects, 2))
+        self.eggs = [make_egg(n_subjects=n_subjects // 5, backend=backend, seed=i)
+                     for i in range(5)]
+
+    def time_crack_egg(self, *args):
+        crack_egg(self.egg, subjects=self.subjects, lists=[0, 1, 2])
+
+    def time_view(self, *args):
+        self.egg.view(subjects=self.subjects, lists=[0, 1, 2])
+
+    def time_stack_eggs(self, *args):
+        stack_eggs(self.eggs)
+
+
+class Load(object):
+    params = [['pandas', 'columnar'], [10, 100]]
+    param_names = ['backend', 'n_subjects']
+
+    def setup(self, backend, n_subjects):
+        self.dir = tempfile.mkdtemp()
+        egg = make_egg(n_subjects=n_subjects, backend=backend)
+        self.path = os.path.join(self.dir, 'data.egg')
+        egg.save(self.path)
+        self.columnar_path = os.path.join(self.dir, 'columnar.egg')
+        egg.save(self.columnar_path, format='columnar')
+
+    def teardown(self, *args):
+        shutil.rmtree(self.dir)
+
+    def time_load_egg(self, *args):
+        quail.load_egg(self.path)
+
+    def time_load_egg_columnar(self, *args):
+        quail.load_egg(self.columnar_path)
+
+    def time_save(self, backend, n_subjects):
+        quail.load_egg(self.path).save(os.path.join(self.dir, 'copy.egg'))
+
+
+class Simulate(object):
+    params = [[100, 1000], [16, 64]]
+    param_names = ['n_subjects', 'list_length']
+
+    def time_simulate_egg(self, n_subjects, list_length):
+        quail.simulate_egg(n_subjects=n_subjects, n_lists=16,
+                           list_length=list_length, random_state=0)
+
+    def peakmem_simulate_egg(self, n_subjects, list_length):
+        quail.simulate_egg(n_subjects=n_subjects, n_lists=16,
+                           list_length=list_length, random_state=0)
+
+
+def timeraw_import_quail():
+    return "import quail"
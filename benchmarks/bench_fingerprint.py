@@ -0,0 +1,58 @@
+"""
+Benchmarks of the fingerprint analyses and of OptimalPresenter
+"""
+import contextlib
+import io
+import numpy as np
+import quail
+from quail.analysis.clustering import fingerprint_helper
+from quail.helpers import parse_egg
+from .common import make_egg
+
+
+class FingerprintHelper(object):
+    params = [[1, 4], [1, 50]]
+    param_names = ['n_features', 'feature_dim']
+
+    def setup(self, n_features, feature_dim):
+        self.egg = make_egg(n_subjects=1, n_lists=1, list_length=64,
+                            n_recalls=48, n_features=n_features,
+                            feature_dim=feature_dim)
+
+    def time_fingerprint_helper(self, *args):
+        fingerprint_helper(self.egg)
+
+    def time_fingerprint_helper_permute(self, *args):
+        fingerprint_helper(self.egg, permute=True, n_perms=500, random_state=0)
+
+
+class PresenterOrder(object):
+    params = [['permute', 'stick', 'best_choice'], [16, 64]]
+    param_names = ['method', 'list_length']
+    timeout = 120
+
+    def setup(self, method, list_length):
+        egg = make_egg(n_subjects=1, n_lists=1, list_length=list_length,
+                       n_features=3)
+        self.egg = quail.Egg.from_arrays(
+            egg.arrays.items('pres'), egg.arrays.items('pres'),
+            features={k: v.decode() for k, v in egg.arrays.pres_features.items()
+                      if k != 'Temporal'},
+            backend='pandas')
+        features = [f for f in parse_egg(self.egg)[2][0] if f != 'item']
+        self.presenter = quail.OptimalPresenter(strategy='stabilize',
+                                                features=features)
+        self.fingerprint = np.linspace(.3, .9, len(features))
+        self.nperms = 2500 if method == 'permute' else 10
+
+    def time_order(self, method, list_length):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.presenter.order(self.egg, method=method, nperms=self.nperms,
+                                 fingerprint=self.fingerprint)
+
+    def time_order_next(self, method, list_length):
+        if getattr(self.presenter, '_prepared', None) is None:
+            self.presenter.prepare(self.egg, backend='serial')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.presenter.order_next(method=method, nperms=self.nperms,
+                                      fingerprint=self.fingerprint)
@@ -0,0 +1,62 @@
+"""
+Synthetic eggs for the benchmarks
+"""
+import numpy as np
+from quail import Egg
+
+N_CATEGORIES = 8
+
+
+def make_egg(n_subjects=10, n_lists=8, list_length=16, n_recalls=None,
+             n_features=2, feature_dim=1, backend='columnar', seed=0):
+    """
+    Creates an egg of random lists drawn from a shared word pool
+
+    Parameters
+    ----------
+    n_subjects, n_lists, list_length : int
+        Size of the egg
+
+    n_recalls : int or None
+        Number of items recalled from each list (default: half the list)
+
+    n_features : int
+        Number of features of the items.  The first one is a category, the
+        others are numbers (or vectors, see feature_dim).
+
+    feature_dim : int
+        Dimensionality of the numeric features
+
+    backend : str
+        Egg backend, 'columnar' or 'pandas'
+
+    seed : int
+        Seed of the random generator
+
+    Returns
+    ----------
+    egg : quail.Egg
+        The egg
+    """
+    rng = np.random.RandomState(seed)
+    n_words = n_lists * list_length
+    words = np.array(['WORD%d' % i for i in range(n_words)], dtype=object)
+
+    # each subject sees the whole pool once, in random order
+    idx = rng.rand(n_subjects, n_words).argsort(1).reshape(
+        n_subjects, n_lists, list_length)
+    if n_recalls is None:
+        n_recalls = list_length // 2
+    recalled = np.take_along_axis(
+        idx, rng.rand(n_subjects, n_lists, list_length).argsort(2)[:, :, :n_recalls], 2)
+
+    features = {}
+    if n_features > 0:
+        categories = np.array(['CAT%d' % i for i in range(N_CATEGORIES)], dtype=object)
+        features['category'] = categories[rng.randint(N_CATEGORIES, size=n_words)][idx]
+    for f in range(1, n_features):
+        values = rng.rand(n_words, feature_dim) if feature_dim > 1 else rng.rand(n_words)
+        features['feature%d' % f] = values[idx]
+
+    return Egg.from_arrays(words[idx], words[recalled], features=features,
+                           backend=backend)
@@ -1,17 +1,47 @@
+import sys
+import types
+from importlib import import_module
+
 try:
     from importlib.metadata import version
 except ImportError:
     from importlib_metadata import version
 
-from .load import load, load_example_data, load_egg, loadEL
-from .egg import Egg, FriedEgg
+from .load import load, load_example_data, load_egg, load_shards, convert_egg, loadEL
+from .egg import Egg, EggView, EggCollection, FriedEgg
 from .analysis.analysis import analyze
-from .plot import plot
 from .helpers import stack_eggs, crack_egg, recmat2egg, df2list
-from .decode_speech import decode_speech
 from .fingerprint import Fingerprint, OptimalPresenter
+from .simulate import simulate_egg, simulate_shards
+from .report import report
 from .distance import *
 
 
 __version__ = version('quail')
 
+# plot (matplotlib, seaborn) and decode_speech (whisper) are imported on first
+# use, each from the submodule of the same name
+_lazy = ['plot', 'decode_speech']
+
+
+def __getattr__(name):
+    if name in _lazy:
+        value = getattr(import_module('.' + name, __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # importing a lazy submodule must not shadow its function
+        if name in _lazy and isinstance(value, types.ModuleType):
+            return
+        super(_Package, self).__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
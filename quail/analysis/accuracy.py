@@ -32,8 +32,22 @@ def accuracy_helper(egg, match='exact', distance='euclidean',
 
     """
 
-    def acc(lst):
-        return len([i for i in np.unique(lst) if i>=0])/(egg.list_length)
+    result = accuracy_rows(egg, match=match, distance=distance,
+                           features=features)
+    return np.nanmean(result, axis=0)
+
+def accuracy_rows(egg, match='exact', distance='euclidean', features=None):
+    """
+    Computes the proportion of words recalled in every list of an egg at once
+
+    Parameters are the same as accuracy_helper.
+
+    Returns
+    ----------
+    rows : numpy array
+      proportion of words recalled in each list
+
+    """
 
     opts = dict(match=match, distance=distance, features=features)
     if match == 'exact':
@@ -41,10 +55,12 @@ def accuracy_helper(egg, match='exact', distance='euclidean',
     recmat = recall_matrix(egg, **opts)
 
     if match in ['exact', 'best']:
-        result = [acc(lst) for lst in recmat]
+        # count the distinct presentation positions recalled in each list
+        positions = np.sort(recmat.reshape(len(recmat), -1), axis=1)
+        distinct = positions >= 0
+        distinct[:, 1:] &= positions[:, 1:] != positions[:, :-1]
+        return distinct.sum(axis=1) / egg.list_length
     elif match == 'smooth':
-        result = np.mean(recmat, axis=1)
+        return np.mean(recmat, axis=1)
     else:
         raise ValueError('Match must be set to exact, best or smooth.')
-
-    return np.nanmean(result, axis=0)
@@ -7,15 +7,17 @@ import six
 import numpy as np
 import pandas as pd
 import warnings
-import six
+import itertools
+from functools import partial
 from ..helpers import *
 from ..distance import dist_funcs as dist_funcs_dict
 from .recmat import recall_matrix
-from .accuracy import accuracy_helper
-from .spc import spc_helper
-from .pnr import pnr_helper
-from .lagcrp import lagcrp_helper
-from .clustering import fingerprint_helper
+from .accuracy import accuracy_helper, accuracy_rows
+from .spc import spc_helper, spc_rows
+from .pnr import pnr_helper, pnr_rows
+from .lagcrp import lagcrp_helper, lagcrp_rows
+from .clustering import fingerprint_helper, fingerprint_rows, _check_random_state, _row_seeds
+from .executor import run_chunks
 
 analyses = {
     'accuracy' : accuracy_helper,
@@ -27,22 +29,40 @@ analyses = {
     'temporal' : fingerprint_helper
 }
 
+# analyses that can be computed for every list at once and then averaged
+# within subject/list groups
+row_analyses = {
+    'accuracy' : accuracy_rows,
+    'spc' : spc_rows,
+    'pfr' : pnr_rows,
+    'pnr' : pnr_rows,
+    'lagcrp' : lagcrp_rows,
+}
+
+# per-list kernels used to analyze egg shards incrementally
+stream_analyses = dict(row_analyses, fingerprint=fingerprint_rows,
+                       temporal=fingerprint_rows)
+
 # main analysis function
 def analyze(egg, subjgroup=None, listgroup=None, subjname='Subject',
             listname='List', analysis=None, position=0, permute=False,
             n_perms=1000, parallel=False, match='exact',
-            distance='euclidean', features=None, ts=None, n_jobs=-1):
+            distance='euclidean', features=None, ts=None, n_jobs=-1,
+            random_state=None, backend=None, chunksize=None):
     """
     General analysis function that groups data by subject/list number and performs analysis.
 
     Parameters
     ----------
-    egg : Egg data object
-        The data to be analyzed
+    egg : Egg data object, EggCollection, iterable of eggs or str
+        The data to be analyzed.  An EggCollection, an iterable (e.g. a
+        generator) of eggs or the path of a directory of egg files is
+        analyzed one shard at a time, as if the shards were stacked with
+        quail.stack_eggs, without holding more than one shard in memory.
 
     subjgroup : list of strings or ints
         String/int variables indicating how to group over subjects.  Must be
-        the length of the number of subjects
+        the length of the number of subjects (of all shards)
 
     subjname : string
         Name of the subject grouping variable
@@ -77,7 +97,8 @@ def analyze(egg, subjgroup=None, listgroup=None, subjname='Subject',
 
     parallel : bool
         Option to use multiprocessing (this can help speed up the permutations
-        tests in the clustering calculations)
+        tests in the clustering calculations).  Shortcut for
+        backend='processes'.
 
     match : str (exact, best or smooth)
         Matching approach to compute recall matrix.  If exact, the presented and
@@ -93,9 +114,23 @@ def analyze(egg, subjgroup=None, listgroup=None, subjname='Subject',
         distance function supported by numpy.spatial.distance.cdist.
 
     n_jobs : int
-        Number of parallel jobs for fingerprint analysis. Default is -1 (all cores).
-        Only used for fingerprint/temporal analyses when joblib is available.
+        Number of parallel jobs. Default is -1 (all cores).
+
+    random_state : int, np.random.RandomState or None
+        Optional argument for fingerprint/temporal cluster analyses. Seeds the
+        permutations so that corrected clustering scores are reproducible.
+        Default is None (uses the global numpy random state).
 
+    backend : str or None
+        Execution backend for the subject/list groups: 'serial', 'threads',
+        'processes' or 'loky'.  Worker pools are reused across calls and the
+        egg is sent to each worker process only once.  Defaults to 'serial'
+        ('processes' if parallel is True).  Accuracy, spc, pfr, pnr and lagcrp
+        are computed for all lists at once and always run serially.
+
+    chunksize : int or None
+        Number of subject/list groups sent to a worker at once.  By default
+        the groups are split in about 4 batches per worker.
 
     Returns
     ----------
@@ -112,7 +147,22 @@ def analyze(egg, subjgroup=None, listgroup=None, subjname='Subject',
 
     from ..egg import FriedEgg
 
-    if hasattr(egg, 'subjgroup'):
+    shards = None
+    if isinstance(egg, six.string_types):
+        from ..load import load_shards
+        egg = load_shards(egg)
+    if not hasattr(type(egg), 'pres'):
+        # stream of shards (checked on the type, since the frames of columnar
+        # eggs are built on first access): the first one provides the default names/features
+        if subjgroup is None:
+            subjgroup = getattr(egg, 'subjgroup', None)
+        shards = iter(egg)
+        try:
+            egg = next(shards)
+        except StopIteration:
+            raise ValueError('No eggs to analyze.')
+        shards = itertools.chain([egg], shards)
+    elif hasattr(egg, 'subjgroup'):
         if egg.subjgroup is not None:
             subjgroup = egg.subjgroup
 
@@ -120,7 +170,7 @@ def analyze(egg, subjgroup=None, listgroup=None, subjname='Subject',
         if egg.subjname is not None:
             subjname = egg.subjname
 
-    if hasattr(egg, 'listgroup'):
+    if hasattr(egg, 'listgroup') and shards is None:
         if egg.listgroup is not None:
             listgroup = egg.listgroup
 
@@ -136,6 +186,9 @@ def analyze(egg, subjgroup=None, listgroup=None, subjname='Subject',
         'listgroup' : listgroup,
         'subjname' : subjname,
         'parallel' : parallel,
+        'backend' : backend,
+        'n_jobs' : n_jobs,
+        'chunksize' : chunksize,
         'match' : match,
         'distance' : distance,
         'features' : features,
@@ -150,18 +203,23 @@ def analyze(egg, subjgroup=None, listgroup=None, subjname='Subject',
     if analysis == 'temporal':
         opts.update({'features' : ['Temporal']})
     if analysis in ['temporal', 'fingerprint']:
-        opts.update({'permute' : permute, 'n_perms' : n_perms, 'n_jobs' : n_jobs})
+        opts.update({'permute' : permute, 'n_perms' : n_perms,
+                     'random_state' : random_state})
     if analysis == 'lagcrp':
         opts.update({'ts' : ts})
 
-    return FriedEgg(data=_analyze_chunk(egg, **opts), analysis=analysis,
+    if shards is not None:
+        tensor, sizes = _analyze_stream(shards, **opts)
+        return FriedEgg(tensor=tensor, analysis=analysis, position=position, **sizes)
+
+    return FriedEgg(tensor=_analyze_chunk(egg, **opts), analysis=analysis,
                     list_length=egg.list_length, n_lists=egg.n_lists,
                     n_subjects=egg.n_subjects, position=position)
 
 def _analyze_chunk(data, subjgroup=None, subjname='Subject', listgroup=None,
                    listname='List', analysis=None, analysis_type=None,
                    pass_features=False, features=None, parallel=False,
-                   **kwargs):
+                   backend=None, n_jobs=-1, chunksize=None, **kwargs):
     """
     Private function that groups data by subject/list number and performs
     analysis for a chunk of data.
@@ -192,42 +250,240 @@ def _analyze_chunk(data, subjgroup=None, subjname='Subject', listgroup=None,
         Logical indicating whether the analyses uses the features field of the
         Egg
 
+    parallel : bool
+        Shortcut for backend='processes'
+
+    backend : str or None
+        How chunks are run: 'serial', 'threads', 'processes' or 'loky' (see
+        quail.analysis.executor).  Defaults to 'serial', or 'processes' if
+        parallel is True.  Analyses that are computed for all lists at once
+        (accuracy, spc, pfr, pnr, lagcrp) always run serially.
+
+    n_jobs : int
+        Number of workers (-1 for all cores)
+
+    chunksize : int or None
+        Number of chunks sent to a worker at once
+
     Returns
     ----------
-    analyzed_data : Pandas DataFrame
-        DataFrame containing the analysis results
+    tensor : dict
+        Dense (groups x lists x results) analysis results (see
+        FriedEgg.tensor)
+
+    """
+
+    if backend is None:
+        backend = 'processes' if parallel else 'serial'
+    if analysis_type in ['fingerprint', 'temporal']:
+        # chunks already run in parallel with the other backends
+        kwargs.update({'n_jobs' : n_jobs})
+        if backend != 'serial':
+            kwargs.update({'parallel' : False})
+        if kwargs.get('random_state') is not None:
+            # one seed per list of the egg, drawn as for streamed shards;
+            # each chunk gets the seeds of its lists (see _analyze_view)
+            n_rows = (data.arrays.n_rows if data.arrays is not None
+                      else len(data.pres))
+            kwargs['random_state'] = np.array(
+                _row_seeds(kwargs['random_state'], n_rows))
+
+    subjdict, listdict = _group_dicts(data, subjgroup, listgroup)
+
+    # Now listdict is always a dict keyed by subject group
+    chunks = [(subj, lst) for subj in subjdict for lst in listdict[subj]]
 
+    if analysis_type in row_analyses:
+        rows = row_analyses[analysis_type](data, features=features, **kwargs)
+        rows = np.asarray(rows, dtype=float).reshape(len(rows), -1)
+        # smooth lag-CRPs are averaged without skipping NaNs (as lagcrp_helper)
+        skipna = not (analysis_type == 'lagcrp' and kwargs.get('match') == 'smooth')
+        sums, counts = _group_sums(rows, _chunk_ids(data, subjdict, listdict),
+                                   len(chunks), skipna=skipna)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+        columns = None
+        if analysis_type == 'lagcrp':
+            ts = kwargs['ts'] if kwargs['ts'] else data.list_length
+            columns = range(-ts, ts+1)
+        return _chunk_tensor(chunks, means, [subjname, listname], columns)
+
+    res = run_chunks(partial(_analyze_view, analysis=analysis, features=features,
+                             kwargs=kwargs), data,
+                     [([s for s in subjdict[subj]], [l for l in listdict[subj][lst]])
+                      for subj, lst in chunks],
+                     backend=backend, n_jobs=n_jobs, chunksize=chunksize)
+
+    columns = features if analysis_type == 'fingerprint' else None
+    return _chunk_tensor(chunks, res, [subjname, listname], columns)
+
+def _analyze_stream(shards, subjgroup=None, subjname='Subject', listgroup=None,
+                    listname='List', analysis=None, analysis_type=None,
+                    features=None, parallel=False, backend=None, n_jobs=-1,
+                    chunksize=None, **kwargs):
     """
+    Analyzes a stream of eggs one at a time, merging the per-group sums and
+    counts of the per-list results.  Subjects are numbered across shards (as
+    in stack_eggs), so a subject group may span several shards.
+
+    Parameters are the same as _analyze_chunk, except that subjgroup covers
+    the subjects of all shards.  Shards without a subjgroup use their own (if
+    any), or one group per subject.  Shards with fewer lists are padded with
+    empty lists, as in stack_eggs (permuted scores then draw their seeds in a
+    different order than for the stacked eggs).
 
-    # perform the analysis
-    def _analysis(c):
-        subj, lst = c
-        subjects = [s for s in subjdict[subj]]
-        lists = [l for l in listdict[subj][lst]]
-        s = data.crack(lists=lists, subjects=subjects)
-        index = pd.MultiIndex.from_arrays([[subj],[lst]], names=[subjname, listname])
-        opts = dict()
-        if analysis_type == 'fingerprint':
-                opts.update({'columns' : features})
-        elif analysis_type == 'lagcrp':
-            if kwargs['ts']:
-                opts.update({'columns' : range(-kwargs['ts'],kwargs['ts']+1)})
-            else:
-                opts.update({'columns' : range(-data.list_length,data.list_length+1)})
-        return pd.DataFrame([analysis(s, features=features, **kwargs)],
-                            index=index, **opts)
-
-    subjgroup = subjgroup if subjgroup else data.pres.index.levels[0].values
-    listgroup = listgroup if listgroup else data.pres.index.levels[1].values
-
-    subjdict = {subj : data.pres.index.levels[0].values[subj==np.array(subjgroup)] for subj in set(subjgroup)}
+    Returns
+    ----------
+    tensor : dict
+        Dense (groups x lists x results) analysis results (see
+        FriedEgg.tensor)
+
+    sizes : dict
+        list_length, n_lists and n_subjects of the stacked shards
+    """
+    if analysis_type in ['fingerprint', 'temporal']:
+        kwargs.update({'n_jobs' : n_jobs})
+        if kwargs.get('random_state') is not None:
+            # one random state for all shards: the lists of each shard draw
+            # the next seeds, as the lists of the stacked egg would
+            kwargs['random_state'] = _check_random_state(kwargs['random_state'])
+    # smooth lag-CRPs are averaged without skipping NaNs (as lagcrp_helper)
+    skipna = not (analysis_type == 'lagcrp' and kwargs.get('match') == 'smooth')
+
+    totals = {}
+    list_keys = {}
+    labels = []
+    short = []
+    sizes = {'list_length' : 0, 'n_lists' : 0, 'n_subjects' : 0}
+    width = None
+    for shard in shards:
+        offset = sizes['n_subjects']
+        if subjgroup:
+            local_subjgroup = list(subjgroup[offset:offset + shard.n_subjects])
+            if len(local_subjgroup) != shard.n_subjects:
+                raise ValueError('subjgroup is shorter than the number of subjects.')
+        elif getattr(shard, 'subjgroup', None):
+            local_subjgroup = list(shard.subjgroup)
+        else:
+            local_subjgroup = list(range(offset, offset + shard.n_subjects))
+        labels.extend(local_subjgroup)
+        shard_listgroup = listgroup or getattr(shard, 'listgroup', None)
+        subjdict, listdict = _group_dicts(shard, local_subjgroup, shard_listgroup)
+        chunks = [(subj, lst) for subj in subjdict for lst in listdict[subj]]
+
+        rows = stream_analyses[analysis_type](shard, features=features, **kwargs)
+        rows = np.asarray(rows, dtype=float).reshape(len(rows), -1)
+        if width is not None and rows.shape[1] != width:
+            raise ValueError('All eggs must have the same list length.')
+        width = rows.shape[1]
+        sums, counts = _group_sums(rows, _chunk_ids(shard, subjdict, listdict),
+                                   len(chunks), skipna=skipna)
+        _add_totals(totals, chunks, sums, counts)
+        for subj in subjdict:
+            # ordered union of the list groups of every shard
+            list_keys.setdefault(subj, {}).update(dict.fromkeys(listdict[subj]))
+        if not shard_listgroup:
+            short.append((local_subjgroup, shard.n_lists))
+
+        sizes['n_subjects'] += shard.n_subjects
+        sizes['n_lists'] = max(sizes['n_lists'], shard.n_lists)
+        sizes['list_length'] = max(sizes['list_length'], shard.list_length)
+        del shard, rows
+
+    # stack_eggs pads the subjects of shards with fewer lists with empty
+    # lists, which count in the group results (e.g. as an accuracy of 0)
+    short = [(groups, n) for groups, n in short if n < sizes['n_lists']]
+    if short:
+        from ..egg import Egg
+        empty = [[[np.nan] * sizes['list_length']]]
+        pad_kwargs = dict(kwargs)
+        if 'random_state' in pad_kwargs:
+            pad_kwargs['random_state'] = None
+        pad = stream_analyses[analysis_type](Egg(pres=empty, rec=empty),
+                                             features=features, **pad_kwargs)
+        pad_sums, pad_counts = _group_sums(
+            np.asarray(pad, dtype=float).reshape(1, -1), np.zeros(1, dtype=int),
+            1, skipna=skipna)
+        for groups, n in short:
+            pad_lists = range(n, sizes['n_lists'])
+            chunks = [(subj, lst) for subj in groups for lst in pad_lists]
+            _add_totals(totals, chunks, np.repeat(pad_sums, len(chunks), 0),
+                        np.repeat(pad_counts, len(chunks), 0))
+            for subj in groups:
+                list_keys[subj].update(dict.fromkeys(pad_lists))
+
+    # same group order as the in-memory analysis of the stacked eggs
+    chunks = [(subj, lst) for subj in set(labels) for lst in list_keys[subj]
+              if (subj, lst) in totals]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.array([totals[c][0] / totals[c][1] for c in chunks]).reshape(len(chunks), -1)
+    columns = None
+    if analysis_type == 'lagcrp':
+        ts = kwargs['ts'] if kwargs['ts'] else sizes['list_length']
+        columns = range(-ts, ts+1)
+    elif analysis_type == 'fingerprint':
+        columns = features
+    return _chunk_tensor(chunks, means, [subjname, listname], columns), sizes
+
+def _add_totals(totals, chunks, sums, counts):
+    """
+    Adds the sums and counts of (subject group, list group) chunks to the
+    running totals of a streamed analysis
+    """
+    for chunk, chunk_sums, chunk_counts in zip(chunks, sums, counts):
+        if chunk in totals:
+            totals[chunk][0] += chunk_sums
+            totals[chunk][1] += chunk_counts
+        else:
+            totals[chunk] = [chunk_sums, chunk_counts]
+
+def _chunk_tensor(chunks, rows, names, columns=None):
+    """
+    Dense (groups x lists x results) tensor of the results of (subject group,
+    list group) chunks, one row of rows per chunk, in the layout of
+    FriedEgg.tensor
+    """
+    groups = list(dict.fromkeys(c[0] for c in chunks))
+    lists = list(dict.fromkeys(c[1] for c in chunks))
+    group_pos = {g : i for i, g in enumerate(groups)}
+    list_pos = {l : i for i, l in enumerate(lists)}
+    group_idx = np.array([group_pos[c[0]] for c in chunks], dtype=int)
+    list_idx = np.array([list_pos[c[1]] for c in chunks], dtype=int)
+
+    rows = np.asarray(rows, dtype=float).reshape(len(chunks), -1)
+    values = np.full((len(groups), len(lists), rows.shape[1]), np.nan)
+    values[group_idx, list_idx] = rows
+    present = np.zeros((len(groups), len(lists)), dtype=bool)
+    present[group_idx, list_idx] = True
+    if columns is None:
+        columns = range(rows.shape[1])
+    return {'values' : values, 'present' : present, 'groups' : _labels(groups),
+            'lists' : _labels(lists), 'columns' : _labels(list(columns)),
+            'names' : list(names)}
+
+def _labels(values):
+    """Array of labels, typed (e.g. int64) if they all share a type"""
+    labels = np.empty(len(values), dtype=object)
+    labels[:] = values
+    return pd.Series(labels).infer_objects().to_numpy()
+
+def _group_dicts(data, subjgroup=None, listgroup=None):
+    """
+    Returns the subject groups of an egg ({group : subject labels}) and, for
+    each subject group, its list groups ({group : list labels})
+    """
+    subjects, lists = get_index_levels(data)
+    subjgroup = subjgroup if subjgroup else subjects
+    listgroup = listgroup if listgroup else lists
+
+    subjdict = _members(subjgroup, subjects)
 
     if all(isinstance(el, list) for el in listgroup):
         # Per-subject listgroup: listgroup is a list of lists, one per subject
         # Map subject indices to their listgroup dictionaries
         per_subject_listdict = []
         for listgrpsub in listgroup:
-            ld = {lst : data.pres.index.levels[1].values[lst==np.array(listgrpsub)] for lst in set(listgrpsub)}
+            ld = _members(listgrpsub, lists)
             per_subject_listdict.append(ld)
 
         # Create listdict keyed by subject group, mapping to the appropriate per-subject dict
@@ -247,23 +503,96 @@ def _analyze_chunk(data, subjgroup=None, subjname='Subject', listgroup=None,
                     listdict[subj_group] = per_subject_listdict[0]
     else:
         # Shared list grouping
-        ld = {lst : data.pres.index.levels[1].values[lst==np.array(listgroup)] for lst in set(listgroup)}
+        ld = _members(listgroup, lists)
         listdict = {subj : ld for subj in subjdict}
 
-    # Now listdict is always a dict keyed by subject group
-    chunks = [(subj, lst) for subj in subjdict for lst in listdict[subj]]
+    return subjdict, listdict
 
-    if parallel:
-        import multiprocessing
-        from pathos.multiprocessing import ProcessingPool as Pool
-        try:
-            p = Pool(multiprocessing.cpu_count())
-            res = p.map(_analysis, chunks)
-        finally:
-            p.close()
-            p.join()
-            p.clear() 
-    else:
-        res = [_analysis(c) for c in chunks]
+def _members(groups, labels):
+    """
+    Returns {group : labels of its members}, in one pass over groups
+    """
+    positions = {}
+    for i, group in enumerate(groups):
+        positions.setdefault(group, []).append(i)
+    return {group : labels[positions[group]] for group in set(groups)}
 
-    return pd.concat(res)
+def _analyze_view(data, chunk, analysis=None, features=None, kwargs=None):
+    """
+    Runs an analysis on the (subjects, lists) chunk of an egg
+    """
+    subjects, lists = chunk
+    view = data.view(lists=lists, subjects=subjects)
+    if isinstance(kwargs.get('random_state'), np.ndarray):
+        # per-list seeds of data (see _analyze_chunk)
+        kwargs = dict(kwargs, random_state=kwargs['random_state'][view.rows])
+    return analysis(view, features=features, **kwargs)
+
+def _chunk_ids(data, subjdict, listdict):
+    """
+    Returns the index of the chunk each row (list) of an egg belongs to, or -1
+    for rows outside every chunk.  Chunks are numbered in the order
+    [(subj, lst) for subj in subjdict for lst in listdict[subj]]
+    """
+    subjects, lists = get_index_levels(data)
+    subj_pos = {s : i for i, s in enumerate(subjects)}
+    list_pos = {l : i for i, l in enumerate(lists)}
+
+    # group number of each list, computed once per distinct list grouping
+    list_ids = {}
+    def list_table(ld):
+        if id(ld) not in list_ids:
+            table = np.full(len(lists), -1)
+            for i, lst in enumerate(ld):
+                table[[list_pos[l] for l in ld[lst]]] = i
+            list_ids[id(ld)] = table
+        return list_ids[id(ld)]
+
+    table = np.full((len(subjects), len(lists)), -1)
+    offset = 0
+    for subj in subjdict:
+        ids = list_table(listdict[subj])
+        table[[subj_pos[s] for s in subjdict[subj]]] = np.where(ids >= 0, ids + offset, -1)
+        offset += len(listdict[subj])
+
+    if getattr(data, 'arrays', None) is not None:
+        return table.ravel()
+    codes = data.pres.index.codes
+    return table[codes[0], codes[1]]
+
+def _group_sums(values, ids, n_groups, skipna=True):
+    """
+    Sums the non-NaN values (rows x columns) of each group, along with the
+    number of non-NaN values summed
+
+    Parameters
+    ----------
+    values : np.ndarray
+        2D array with one row per list
+
+    ids : np.ndarray
+        Group of each row, in range(n_groups) (negative ids are skipped)
+
+    n_groups : int
+        Number of groups
+
+    skipna : bool
+        If False, NaNs are summed (and counted) like any other value
+
+    Returns
+    ----------
+    sums, counts : np.ndarray
+        Arrays of shape (n_groups, columns)
+    """
+    keep = np.flatnonzero(ids >= 0)
+    order = keep[np.argsort(ids[keep], kind='stable')]
+    sizes = np.bincount(ids[keep], minlength=n_groups)
+    valid = ~np.isnan(values[order]) if skipna else np.ones((len(order), values.shape[1]), dtype=bool)
+    sums = np.zeros((n_groups, values.shape[1]))
+    counts = np.zeros((n_groups, values.shape[1]))
+    nonempty = sizes > 0
+    if nonempty.any():
+        starts = (np.cumsum(sizes) - sizes)[nonempty]
+        sums[nonempty] = np.add.reduceat(np.where(valid, values[order], 0.), starts, axis=0)
+        counts[nonempty] = np.add.reduceat(valid, starts, axis=0)
+    return sums, counts
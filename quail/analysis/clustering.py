@@ -1,22 +1,20 @@
 from __future__ import division
+import importlib.util
 import warnings
 import numpy as np
 import six
 from scipy.spatial.distance import cdist
 from ..distance import dist_funcs as distdict
-from ..helpers import shuffle_egg
+from .diststore import distance_store
 
-# Check if joblib is available for parallel processing
-try:
-    from joblib import Parallel, delayed
-    HAS_JOBLIB = True
-except ImportError:
-    HAS_JOBLIB = False
+# Check if joblib is available for parallel processing (it is imported when
+# first used)
+HAS_JOBLIB = importlib.util.find_spec('joblib') is not None
 
 
 def fingerprint_helper(egg, permute=False, n_perms=1000,
                        match='exact', distance='euclidean', features=None,
-                       parallel=True, n_jobs=-1):
+                       parallel=True, n_jobs=-1, random_state=None):
     """
     Computes clustering along a set of feature dimensions
 
@@ -50,18 +48,63 @@ def fingerprint_helper(egg, permute=False, n_perms=1000,
         Number of parallel jobs. Default is -1 (use all cores).
         Only used if parallel=True and joblib is available.
 
+    random_state : int, np.random.RandomState or None
+        Seed for the permutations (only used if permute=True).  If None, the
+        global numpy random state is used.
+
     Returns
     ----------
     probabilities : Numpy array
       Each number represents clustering along a different feature dimension
     """
 
+    return np.nanmean(fingerprint_rows(egg, permute=permute, n_perms=n_perms,
+                                       match=match, distance=distance,
+                                       features=features, parallel=parallel,
+                                       n_jobs=n_jobs, random_state=random_state),
+                      axis=0)
+
+
+def fingerprint_rows(egg, permute=False, n_perms=1000, match='exact',
+                     distance='euclidean', features=None, parallel=True,
+                     n_jobs=-1, random_state=None):
+    """
+    Computes the clustering scores of every list of an egg
+
+    Parameters are the same as fingerprint_helper.
+
+    Returns
+    ----------
+    rows : Numpy array
+      One row per list, with one clustering score per feature
+    """
+
     if features is None:
         features = list(egg.dist_funcs.keys())
     elif not isinstance(features, list):
         features = list(features)
 
+    if match == 'exact':
+        # items come straight from the arrays of columnar eggs
+        if getattr(egg, 'arrays', None) is not None:
+            n_rows, get_items = egg.arrays.n_rows, _columnar_items
+        else:
+            n_rows, get_items = len(egg.pres), _frame_items
+        seeds = _row_seeds(random_state, n_rows)
+        tasks = (_exact_task(egg, get_items, row, features) for row in range(n_rows))
+        if parallel and HAS_JOBLIB and n_rows > 10:
+            from joblib import Parallel, delayed
+            weights = Parallel(n_jobs=n_jobs)(delayed(_row_weights)(
+                *task, permute=permute, n_perms=n_perms, random_state=seed)
+                for task, seed in zip(tasks, seeds))
+        else:
+            weights = [_row_weights(*task, permute=permute, n_perms=n_perms,
+                                    random_state=seed)
+                       for task, seed in zip(tasks, seeds)]
+        return np.array(weights).reshape(n_rows, len(features))
+
     inds = egg.pres.index.tolist()
+    seeds = _row_seeds(random_state, len(inds))
 
     # Use optimized direct computation to avoid creating Egg objects
     use_parallel = parallel and HAS_JOBLIB and len(inds) > 10
@@ -69,13 +112,13 @@ def fingerprint_helper(egg, permute=False, n_perms=1000,
     if use_parallel:
         # Parallel processing for large datasets
         weights = _get_weights_parallel(egg, inds, features, distdict, permute,
-                                        n_perms, match, distance, n_jobs)
+                                        n_perms, match, distance, n_jobs, seeds)
     else:
         # Optimized serial processing - work directly with DataFrames
         weights = _get_weights_fast(egg, inds, features, distdict, permute,
-                                    n_perms, match, distance)
+                                    n_perms, match, distance, seeds)
 
-    return np.nanmean(weights, axis=0)
+    return np.asarray(weights)
 
 
 def _get_corrected_rank(x, dists):
@@ -114,155 +157,242 @@ def _get_weights(slices, features, distdict, permute, n_perms, match, distance):
     return weights
 
 
-def _get_weights_fast(egg, inds, features, distdict_module, permute, n_perms, match, distance):
+def _get_weights_fast(egg, inds, features, distdict_module, permute, n_perms, match, distance, seeds):
     """
-    Optimized serial processing that works directly with DataFrames.
-    Avoids creating Egg objects for each slice, dramatically reducing overhead.
+    Serial computation of the best match weights of each list, working on
+    views of the egg
     """
     weights = np.zeros((len(inds), len(features)))
 
     for sdx, idx in enumerate(inds):
-        # Extract data directly from DataFrame using index
-        pres_row = egg.pres.loc[idx]
-        rec_row = egg.rec.loc[idx]
-
-        # Get items and features directly
-        pres_items = [cell['item'] for cell in pres_row.values if cell and not (isinstance(cell.get('item'), float) and np.isnan(cell.get('item', 0)))]
-        rec_items = [cell['item'] for cell in rec_row.values if cell and not (isinstance(cell.get('item'), float) and np.isnan(cell.get('item', 0)))]
-        pres_feats = [cell for cell in pres_row.values if cell and not (isinstance(cell.get('item'), float) and np.isnan(cell.get('item', 0)))]
-
-        if len(rec_items) <= 2:
-            weights[sdx, :] = np.nan
-            continue
-
+        random_state = _check_random_state(seeds[sdx])
+        slice_egg = egg.view(subjects=[idx[0]], lists=[idx[1]])
         for fdx, feature in enumerate(features):
-            if match == 'exact':
-                weights[sdx, fdx] = _compute_weight_exact_fast(
-                    pres_items, rec_items, pres_feats, feature,
-                    egg.dist_funcs, distdict_module, permute, n_perms
-                )
-            elif match == 'best':
-                # For 'best' match, fall back to Egg-based computation (less common)
-                from ..egg import Egg
-                slice_egg = egg.crack(subjects=[idx[0]], lists=[idx[1]])
-                weights[sdx, fdx] = _get_weight_best(slice_egg, feature, distdict_module,
-                                                      permute, n_perms, distance)
+            weights[sdx, fdx] = _get_weight_best(slice_egg, feature, distdict_module,
+                                                  permute, n_perms, distance,
+                                                  random_state)
     return weights
 
 
-def _get_weights_parallel(egg, inds, features, distdict_module, permute, n_perms, match, distance, n_jobs):
+def _get_weights_parallel(egg, inds, features, distdict_module, permute, n_perms, match, distance, n_jobs, seeds):
     """
     Parallel processing for large datasets using joblib.
     """
-    def process_slice(idx):
+    def process_slice(idx, seed):
         """Process a single slice and return weights for all features."""
-        pres_row = egg.pres.loc[idx]
-        rec_row = egg.rec.loc[idx]
+        random_state = _check_random_state(seed)
+        slice_egg = egg.view(subjects=[idx[0]], lists=[idx[1]])
+        return np.array([_get_weight_best(slice_egg, feature, distdict_module,
+                                          permute, n_perms, distance, random_state)
+                         for feature in features])
 
-        # Get items and features directly
-        pres_items = [cell['item'] for cell in pres_row.values if cell and not (isinstance(cell.get('item'), float) and np.isnan(cell.get('item', 0)))]
-        rec_items = [cell['item'] for cell in rec_row.values if cell and not (isinstance(cell.get('item'), float) and np.isnan(cell.get('item', 0)))]
-        pres_feats = [cell for cell in pres_row.values if cell and not (isinstance(cell.get('item'), float) and np.isnan(cell.get('item', 0)))]
+    # Run in parallel
+    from joblib import Parallel, delayed
+    results = Parallel(n_jobs=n_jobs)(delayed(process_slice)(idx, seed)
+                                      for idx, seed in zip(inds, seeds))
+    return np.array(results)
 
-        slice_weights = np.zeros(len(features))
 
-        if len(rec_items) <= 2:
-            return np.full(len(features), np.nan)
+def _columnar_items(egg, row):
+    """Presented and recalled items of one list (row) of a columnar egg"""
+    arrays = egg.arrays
+    s, l = divmod(row, arrays.shape[1])
+    pres_codes = arrays.pres_codes[s, l]
+    rec_codes = arrays.rec_codes[s, l]
+    return (list(arrays.vocab[pres_codes[pres_codes >= 0]]),
+            list(arrays.vocab[rec_codes[rec_codes >= 0]]))
 
-        for fdx, feature in enumerate(features):
-            if match == 'exact':
-                slice_weights[fdx] = _compute_weight_exact_fast(
-                    pres_items, rec_items, pres_feats, feature,
-                    egg.dist_funcs, distdict_module, permute, n_perms
-                )
-            elif match == 'best':
-                # For 'best' match, fall back to Egg-based computation
-                from ..egg import Egg
-                slice_egg = egg.crack(subjects=[idx[0]], lists=[idx[1]])
-                slice_weights[fdx] = _get_weight_best(slice_egg, feature, distdict_module,
-                                                       permute, n_perms, distance)
-        return slice_weights
 
-    # Run in parallel
-    results = Parallel(n_jobs=n_jobs)(delayed(process_slice)(idx) for idx in inds)
-    return np.array(results)
+def _frame_items(egg, row):
+    """Presented and recalled items of one list (row) of a pandas egg"""
+    def items(cells):
+        return [cell['item'] for cell in cells if cell and not
+                (isinstance(cell.get('item'), float) and np.isnan(cell.get('item', 0)))]
+    return items(egg.pres.iloc[row].values), items(egg.rec.iloc[row].values)
 
 
-def _compute_weight_exact_fast(pres_items, rec_items, pres_feats, feature, dist_funcs, distdict_module, permute, n_perms):
+def _exact_task(egg, get_items, row, features):
     """
-    Fast computation of exact match weight without creating Egg objects.
-    Works directly with extracted item lists and feature dictionaries.
+    Items of one list and the distances between its presented items for each
+    feature (drawn from the shared distance store)
     """
-    if permute:
-        # For permutation, we need to shuffle and recompute
-        perms = []
-        for _ in range(n_perms):
-            shuffled_rec = list(rec_items)
-            np.random.shuffle(shuffled_rec)
-            perms.append(_compute_weight_exact_fast(
-                pres_items, shuffled_rec, pres_feats, feature,
-                dist_funcs, distdict_module, False, None
-            ))
-        real = _compute_weight_exact_fast(
-            pres_items, rec_items, pres_feats, feature,
-            dist_funcs, distdict_module, False, None
-        )
-        bools = [1 if perm < real else 0.5 if perm == real else 0 for perm in perms]
-        return np.sum(np.array(bools), axis=0) / n_perms
-
-    # Build distance matrix from features
-    f_data = [xi[feature] for xi in pres_feats if xi and feature in xi]
-    if len(f_data) == 0:
-        return np.nan
+    pres_items, rec_items = get_items(egg, row)
+    if len(rec_items) <= 2:
+        return pres_items, rec_items, [None] * len(features)
+    distmats = [distance_store.distances(egg, feature, distdict[egg.dist_funcs[feature]], row)
+                for feature in features]
+    return pres_items, rec_items, distmats
 
-    f = np.array(f_data)
-    if f.ndim == 1:
-        f = f.reshape(-1, 1)
 
-    distmat = cdist(f, f, distdict_module[dist_funcs[feature]])
+def _row_weights(pres_items, rec_items, distmats, permute=False, n_perms=1000,
+                 random_state=None):
+    """
+    Computes the exact match clustering scores of one list, one per feature
+    distance matrix (NaN where it is None)
+    """
+    random_state = _check_random_state(random_state)
+    return np.array([np.nan if d is None else
+                     _exact_weight(d, pres_items, rec_items, permute, n_perms,
+                                   random_state) for d in distmats])
 
+
+def _exact_weight(distmat, pres_items, rec_items, permute, n_perms, random_state=None):
+    """
+    Computes the exact match weight of a list given the distances between its
+    presented items.  With permute, the distance matrix and recall indices
+    are computed once and all permuted recall orders are scored together.
+    """
     # Map items to indices
     try:
         p_map = {item: i for i, item in enumerate(pres_items)}
         r_idxs = [p_map[item] for item in rec_items if item in p_map]
     except TypeError:
         r_idxs = [pres_items.index(item) for item in rec_items if item in pres_items]
+    r_idxs = np.array(r_idxs, dtype=int)
 
-    if len(r_idxs) < 2:
-        return np.nan
+    real = _exact_scores(distmat, r_idxs[None, :])[0]
+    if not permute:
+        return real
+    perms = _exact_scores(distmat, _permutations(r_idxs, n_perms, random_state))
+    return _permutation_score(real, perms)
 
-    ranks = []
-    seen = np.zeros(len(pres_items), dtype=bool)
 
-    for i in range(len(r_idxs) - 1):
-        c_idx = r_idxs[i]
-        n_idx = r_idxs[i + 1]
+def _exact_scores(distmat, r_idxs):
+    """
+    Computes the exact match clustering score of several recall sequences of
+    the same list at once
 
-        if seen[c_idx] or seen[n_idx]:
-            continue
+    Parameters
+    ----------
+    distmat : np.ndarray
+        Distances between the presented items (items x items)
+
+    r_idxs : np.ndarray
+        Presentation indices of the recalled items, one sequence per row
+        (sequences x recalls)
+
+    Returns
+    ----------
+    scores : np.ndarray
+        Mean percentile rank of the transitions of each sequence (NaN if no
+        transition could be scored)
+    """
+    n_seqs, n_rec = r_idxs.shape
+    seqs = np.arange(n_seqs)
+    seen = np.zeros((n_seqs, len(distmat)), dtype=bool)
+    ranks = np.full((n_seqs, max(n_rec - 1, 0)), np.nan)
+
+    for i in range(n_rec - 1):
+        c_idx = r_idxs[:, i]
+        n_idx = r_idxs[:, i + 1]
+
+        # skip transitions from/to items recalled at previous steps
+        ok = ~seen[seqs, c_idx] & ~seen[seqs, n_idx]
 
         dists = distmat[c_idx]
-        target_dist = dists[n_idx]
+        target_dist = dists[seqs, n_idx][:, None]
 
         valid_mask = ~seen
-        valid_mask[c_idx] = False
+        valid_mask[seqs, c_idx] = False
+
+        n_greater = np.sum(valid_mask & (dists > target_dist), axis=1)
+        n_equal = np.sum(valid_mask & (dists == target_dist), axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_rank = (n_greater + (n_equal + 1) / 2.0) / valid_mask.sum(1)
+
+        ranks[ok, i] = avg_rank[ok]
+        seen[seqs[ok], c_idx[ok]] = True
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(ranks, axis=1)
+
+
+def _best_scores(distmat, matchmat, n_steps, orders):
+    """
+    Computes the best match clustering score of several orderings of the
+    recalls of a list at once
+
+    Parameters
+    ----------
+    distmat : np.ndarray
+        Distances between the presented items (items x items)
 
-        dists_filt = dists[valid_mask]
+    matchmat : np.ndarray
+        Distances between presented and recalled items (items x recalls)
 
-        n_greater = np.sum(dists_filt > target_dist)
-        n_equal = np.sum(dists_filt == target_dist)
-        avg_rank = n_greater + (n_equal + 1) / 2.0
+    n_steps : int
+        Number of transitions to score
 
-        ranks.append(avg_rank / len(dists_filt))
-        seen[c_idx] = True
+    orders : np.ndarray
+        Orderings of the recalls (orderings x recalls)
 
-    return np.nanmean(ranks)
+    Returns
+    ----------
+    scores : np.ndarray
+        Mean corrected rank of the transitions of each ordering
+    """
+    if n_steps < 1:
+        return np.full(len(orders), np.nan)
+    closest = np.argmin(matchmat[np.arange(n_steps + 1)][:, orders], axis=2)
+    cdx, ndx = closest[:-1], closest[1:]
+    dists = distmat[cdx]
+    di = distmat[cdx, ndx][..., None]
+    # NaN distances sort first in the descending order of _get_corrected_rank
+    n_greater = np.sum((dists > di) | np.isnan(dists), axis=-1)
+    n_equal = np.sum(dists == di, axis=-1)
+    ranks = np.where(n_equal > 0, (n_greater + (n_equal + 1) / 2.0) / distmat.shape[1], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(ranks, axis=0)
+
+
+def _permutations(idxs, n_perms, random_state=None):
+    """
+    Returns n_perms random orderings of idxs (n_perms x len(idxs))
+    """
+    random_state = _check_random_state(random_state)
+    order = np.argsort(random_state.rand(n_perms, len(idxs)), axis=1)
+    return np.asarray(idxs)[order]
+
+
+def _permutation_score(real, perms):
+    """
+    Proportion of permuted scores that are lower than the observed score
+    """
+    # permuted values that are *less* than the
+    # observed value contribute a score of 1; permuted
+    # values that are *equal* to the observed value contribute 0.5;
+    # all others (strictly greater than) contribute 0.
+    return (np.sum(perms < real) + 0.5 * np.sum(perms == real)) / len(perms)
 
 
-def _get_weight_exact(egg, feature, distdict, permute, n_perms):
+def _check_random_state(random_state):
+    """
+    Turns None (global numpy random state), an int seed or a RandomState into
+    a RandomState
+    """
+    if random_state is None:
+        return np.random.mtrand._rand
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+    return np.random.RandomState(random_state)
+
+
+def _row_seeds(random_state, n_rows):
+    """
+    Draws one seed per list so that permutations are reproducible whether
+    lists are processed serially or in parallel.  An array of seeds (one per
+    list, as drawn for a whole egg and sliced for a view) is used as is.
+    """
+    if random_state is None:
+        return [None] * n_rows
+    if isinstance(random_state, np.ndarray):
+        return list(random_state)
+    return list(_check_random_state(random_state).randint(np.iinfo(np.int32).max, size=n_rows))
+
 
-    if permute:
-        return _permute(egg, feature, distdict, _get_weight_exact, n_perms)
+def _get_weight_exact(egg, feature, distdict, permute, n_perms, random_state=None):
 
     pres = list(egg.get_pres_items().values[0])
     rec = list(egg.get_rec_items().values[0])
@@ -272,111 +402,40 @@ def _get_weight_exact(egg, feature, distdict, permute, n_perms):
         return np.nan
 
     distmat = get_distmat(egg, feature, distdict)
+    return _exact_weight(distmat, pres, rec, permute, n_perms, random_state)
 
-    # Map items to indices for faster lookup
-    # Handle duplicate items? Quail usually assumes unique items in pres for index()
-    try:
-        p_map = {item: i for i, item in enumerate(pres)}
-        # Filter recalls to those in presentation list
-        r_idxs = [p_map[item] for item in rec if item in p_map]
-    except TypeError:
-        # Fallback for unhashable types (dicts/lists? shouldn't happen for items)
-        r_idxs = [pres.index(item) for item in rec if item in pres]
 
-    ranks = []
-    seen = np.zeros(len(pres), dtype=bool)
-    
-    # Pre-loop checks
-    if len(r_idxs) < 2:
-        return np.nan
-
-    for i in range(len(r_idxs)-1):
-        c_idx = r_idxs[i]
-        n_idx = r_idxs[i+1]
-        
-        # Skip if already recalled (shouldn't happen in standard FR but check)
-        if seen[c_idx] or seen[n_idx]:
-             # Matches logic "c not in past_words and n not in past_words"
-             # If c was seen (prev iteration), it's in past.
-             # Wait, loop updates past_idxs AFTER calc.
-             # So c_idx is NOT seen yet.
-             pass
-
-        # Check if they were seen in *previous* steps
-        if seen[c_idx] or seen[n_idx]:
-            continue
-
-        # Get distances from current item
-        dists = distmat[c_idx]
-        target_dist = dists[n_idx]
-        
-        # Filter: keep only NOT seen indices
-        # Note: current c_idx is NOT in "seen" yet, so it is included in pool?
-        # Original logic: "if idx not in past_idxs". past_idxs appended c AFTER.
-        # So c IS in the pool?
-        # "past_idxs.append(pres.index(c))" happens at end.
-        valid_mask = ~seen
-        valid_mask[c_idx] = False # Exclude current item from pool
-        
-        dists_filt = dists[valid_mask]
-        
-        # Optimize Rank Calculation
-        # sort desc
-        # n_greater = np.sum(dists_filt > target_dist)
-        # n_equal = np.sum(dists_filt == target_dist)
-        # avg_rank = n_greater + (n_equal + 1) / 2
-        
-        n_greater = np.sum(dists_filt > target_dist)
-        n_equal = np.sum(dists_filt == target_dist)
-        avg_rank = n_greater + (n_equal + 1) / 2.0
-        
-        ranks.append(avg_rank / len(dists_filt))
-        
-        # Update seen
-        seen[c_idx] = True
-        
-    return np.nanmean(ranks)
-
-
-def _get_weight_best(egg, feature, distdict, permute, n_perms, distance):
-
-    if permute:
-        return _permute(egg, feature, distdict, _get_weight_best, n_perms)
+def _get_weight_best(egg, feature, distdict, permute, n_perms, distance,
+                     random_state=None):
 
     rec = list(egg.get_rec_items().values[0])
     if len(rec) <= 2:
+        if permute:
+            # NaN scores are never higher than the (NaN) permuted scores
+            return 0.
         warnings.warn('Not enough recalls to compute fingerprint, returning NaN')
         return np.nan
 
     distmat = get_distmat(egg, feature, distdict)
     matchmat = get_match(egg, feature, distdict)
 
-    ranks = []
-    for i in range(len(rec)-1):
-        cdx, ndx = np.argmin(matchmat[i, :]), np.argmin(matchmat[i+1, :])
-        dists = distmat[cdx, :]
-        di = dists[ndx]
-        dists_filt = np.array([dist for idx, dist in enumerate(dists)])
-        ranks.append(_get_corrected_rank(di, dists_filt))
-    return np.nanmean(ranks)
-
+    # permuting the recalls permutes the columns of the match matrix
+    recalls = np.arange(matchmat.shape[1])
+    real = _best_scores(distmat, matchmat, len(rec) - 1, recalls[None, :])[0]
+    if not permute:
+        return real
+    perms = _best_scores(distmat, matchmat, len(rec) - 1,
+                         _permutations(recalls, n_perms, random_state))
+    return _permutation_score(real, perms)
 
 
 def get_distmat(egg, feature, distdict):
-    # Filter out empty feature dictionaries (from padded lists)
-    pres_feats = egg.get_pres_features().values[0]
-    f_data = [xi[feature] for xi in pres_feats if xi and feature in xi]
-    if len(f_data) == 0:
-        # No valid data for this feature - return nan
+    # distances between the presented items that have the feature (NaN if
+    # there are none), drawn from the shared distance store
+    distmat = distance_store.distances(egg, feature, distdict[egg.dist_funcs[feature]])
+    if distmat is None:
         return np.nan
-    # Ensure (N_items, N_features)
-    # If elements are scalars, np.array gives (N,), reshape to (N, 1)
-    # If elements are lists, np.array gives (N, K)
-    f = np.array(f_data)
-    if f.ndim == 1:
-        f = f.reshape(-1, 1)
-
-    return cdist(f, f, distdict[egg.dist_funcs[feature]])
+    return distmat
 
 
 def get_match(egg, feature, distdict):
@@ -398,17 +457,3 @@ def get_match(egg, feature, distdict):
         r = r.reshape(-1, 1)
         
     return cdist(p, r, distdict[egg.dist_funcs[feature]])
-
-
-
-
-def _permute(egg, feature, distdict, func, n_perms=100):
-    perms = [func(shuffle_egg(egg), feature, distdict, False, None) for i in range(n_perms)]
-    real = func(egg, feature, distdict, False, None)
-
-    # permuted values that are *less* than the
-    # observed value contribute a score of 1; permuted
-    # values that are *equal* to the observed value contribute 0.5;
-    # all others (strictly greater than) contribute 0.
-    bools = [1 if perm < real else 0.5 if perm == real else 0 for perm in perms]
-    return np.sum(np.array(bools), axis=0) / n_perms
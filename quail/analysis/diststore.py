@@ -0,0 +1,371 @@
+"""
+Shared store of feature distances for the fingerprint analyses
+
+Clustering scores need, for every list and feature, the distances between
+the presented items.  Experiments typically draw their lists from one word
+pool, so the same distances are needed over and over.  A `DistanceStore`
+interns the values of each feature into a pool (one entry per distinct
+value, i.e. per item for item-level features) and fills a pool-level
+distance matrix as lists are analyzed.  The distance matrix of a list is then
+gathered from the pool matrix by fancy indexing, and only pairs that were
+never seen before are computed.
+
+Pools (their values and distance matrices) of all features share a memory
+limit; the least recently used ones are evicted when it is exceeded.  Pools
+whose distances don't fit fall back to computing the distances of each
+list, and features whose values alone don't fit (e.g. continuous or
+embedding features, with a new value per item) are not pooled anymore: the
+distances of each list are computed from its values.
+"""
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+from scipy.spatial.distance import cdist
+from ..columnar import _intern_key
+
+
+class DistanceStore(object):
+    """
+    Memoizes the distances between feature values, keyed by (feature, metric)
+
+    Parameters
+    ----------
+    limit : int
+        Maximum number of bytes held by the pools, values and distance
+        matrices (default: 256 MB)
+
+    """
+
+    def __init__(self, limit=2**28):
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self._pools = OrderedDict()
+        self._codes = weakref.WeakKeyDictionary()
+        self._unpooled = set()
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # pools are rebuilt where the store is unpickled
+        return {'limit' : self.limit}
+
+    def __setstate__(self, state):
+        self.__init__(state['limit'])
+
+    @property
+    def nbytes(self):
+        return sum(p.nbytes for p in self._pools.values())
+
+    def pool(self, feature, metric):
+        """Returns the value pool of a feature/distance metric pair"""
+        key = (feature, metric)
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = FeaturePool(metric)
+            return self._pools[key]
+
+    def codes(self, egg, feature, metric):
+        """
+        Returns the pool codes of the presented feature values of an egg, one
+        row per list (-1 where an item has no value for the feature), and the
+        positions of the lists of the egg in that array
+        """
+        rows = None
+        while getattr(egg, 'parent', None) is not None:
+            # views share the codes of the egg they were taken from
+            rows = egg.rows if rows is None else egg.rows[rows]
+            egg = egg.parent
+        pool = self.pool(feature, metric)
+        with self._lock:
+            cache = self._codes.setdefault(egg, {})
+            if (feature, metric) not in cache:
+                cache[(feature, metric)] = _encode_feature(egg, feature, pool)
+            codes = cache[(feature, metric)]
+        return codes, (np.arange(len(codes)) if rows is None else rows)
+
+    def distances(self, egg, feature, metric, row=0):
+        """
+        Returns the distances between the presented items of one list of an
+        egg that have a value for feature (None if there are none)
+
+        Parameters
+        ----------
+        egg : quail.Egg
+            Data to analyze
+
+        feature : str
+            Name of the feature
+
+        metric : str or function
+            Distance function (any metric supported by cdist)
+
+        row : int
+            Position of the list in the egg (subject-major)
+
+        Returns
+        ----------
+        distmat : np.ndarray or None
+            (items x items) distance matrix
+        """
+        with self._lock:
+            if (feature, metric) in self._unpooled:
+                self.misses += 1
+                return _cdist(_list_values(egg, feature, row), metric)
+            codes, rows = self.codes(egg, feature, metric)
+            list_codes = codes[rows[row]]
+            return self.matrix(feature, metric, list_codes[list_codes >= 0])
+
+    def value_distances(self, feature, metric, values):
+        """Distances between values of a feature (e.g. those of one list)"""
+        with self._lock:
+            if (feature, metric) in self._unpooled:
+                self.misses += 1
+                return _cdist(values, metric)
+            return self.matrix(feature, metric,
+                               self.pool(feature, metric).encode(values))
+
+    def matrix(self, feature, metric, codes):
+        """Distances between the pool values with the given codes"""
+        if len(codes) == 0:
+            return None
+        key = (feature, metric)
+        pool = self.pool(feature, metric)
+        with self._lock:
+            self._pools.move_to_end(key)
+            if not pool.reserve(self._budget(pool)):
+                # too large to be held: compute the distances of this list
+                self.misses += 1
+                dist = cdist(pool.stack(codes), pool.stack(codes), metric)
+            else:
+                if pool.fill(codes):
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                dist = pool.dist[np.ix_(codes, codes)]
+            if pool.values_nbytes > self.limit:
+                # the values alone don't fit: stop pooling this feature
+                self._evict(key)
+                self._unpooled.add(key)
+            return dist
+
+    def _budget(self, pool):
+        """
+        Bytes the distances of a pool may use, after evicting least recently
+        used pools
+        """
+        needed = pool.required_nbytes() + pool.values_nbytes
+        for key, other in list(self._pools.items()):
+            if self.nbytes - pool.nbytes + needed <= self.limit:
+                break
+            if other is not pool:
+                self._evict(key)
+        return self.limit - (self.nbytes - pool.nbytes) - pool.values_nbytes
+
+    def _evict(self, key):
+        """Forgets a pool: its values, distances and the codes into it"""
+        self._pools.pop(key, None)
+        for cache in self._codes.values():
+            cache.pop(key, None)
+
+    def discard(self, egg):
+        """Forgets the codes of an egg (e.g. after its data was modified)"""
+        with self._lock:
+            self._codes.pop(egg, None)
+
+    def clear(self):
+        """Drops every pool and cached code"""
+        with self._lock:
+            self._pools.clear()
+            self._codes = weakref.WeakKeyDictionary()
+            self._unpooled = set()
+
+    def info(self):
+        """
+        Returns a dict with the pools (number of values and whether their
+        distances are held), the features that are not pooled, the total size
+        of the pools in bytes, the size limit and the hit/miss counts
+        """
+        return {
+            'pools' : {key : (len(p.values), p.dist is not None)
+                       for key, p in self._pools.items()},
+            'unpooled' : sorted(self._unpooled, key=str),
+            'nbytes' : self.nbytes,
+            'limit' : self.limit,
+            'hits' : self.hits,
+            'misses' : self.misses,
+        }
+
+
+class FeaturePool(object):
+    """
+    Distinct values of a feature and the distances computed between them
+
+    Parameters
+    ----------
+    metric : str or function
+        Distance function (any metric supported by cdist)
+
+    """
+
+    def __init__(self, metric):
+        self.metric = metric
+        self.values = []
+        self.values_nbytes = 0
+        self._index = {}
+        self.dist = None
+        self.known = None
+
+    @property
+    def nbytes(self):
+        """Approximate size of the values and distances, in bytes"""
+        if self.dist is None:
+            return self.values_nbytes
+        return self.values_nbytes + self.dist.nbytes + self.known.nbytes
+
+    def encode(self, values):
+        """Returns the codes of values, adding the new ones to the pool"""
+        codes = np.empty(len(values), dtype=np.int64)
+        for i, v in enumerate(values):
+            key = _intern_key(v)
+            code = self._index.get(key)
+            if code is None:
+                code = self._index[key] = len(self.values)
+                self.values.append(v)
+                self.values_nbytes += _value_nbytes(v)
+            codes[i] = code
+        return codes
+
+    def stack(self, codes):
+        """(items x dims) array of the values with the given codes"""
+        f = np.array([self.values[c] for c in codes])
+        if f.ndim == 1:
+            f = f.reshape(-1, 1)
+        return f
+
+    def capacity(self):
+        """Side of the distance matrix needed to hold every value"""
+        n = len(self.dist) if self.dist is not None else 0
+        while n < len(self.values):
+            n = max(2 * n, 64)
+        return n
+
+    def required_nbytes(self):
+        """Bytes needed to hold the distances of every value of the pool"""
+        return self.capacity() ** 2 * 9
+
+    def reserve(self, budget):
+        """
+        Grows the distance matrix to hold every value of the pool, if it fits
+        in budget bytes (otherwise the held distances are dropped).  Returns
+        whether the pool holds distances.
+        """
+        if self.required_nbytes() > budget:
+            self.drop()
+            return False
+        n = self.capacity()
+        if self.dist is None or n > len(self.dist):
+            dist, known = np.empty((n, n)), np.zeros((n, n), dtype=bool)
+            if self.dist is not None:
+                m = len(self.dist)
+                dist[:m, :m] = self.dist
+                known[:m, :m] = self.known
+            self.dist, self.known = dist, known
+        return True
+
+    def fill(self, codes):
+        """
+        Computes the distances between codes that are not held yet.  Returns
+        whether anything was computed.
+        """
+        known = self.known[np.ix_(codes, codes)]
+        if known.all():
+            return False
+        rows = np.flatnonzero(~known.all(1))
+        cols = np.flatnonzero(~known[rows].all(0))
+        ix = np.ix_(codes[rows], codes[cols])
+        self.dist[ix] = cdist(self.stack(codes[rows]), self.stack(codes[cols]),
+                              self.metric)
+        self.known[ix] = True
+        return True
+
+    def drop(self):
+        """Forgets the held distances (the values are kept)"""
+        self.dist = None
+        self.known = None
+
+
+def _value_nbytes(value):
+    """Approximate memory held by a pooled value (and its index key)"""
+    if isinstance(value, np.ndarray):
+        return 2 * value.nbytes + 200
+    if isinstance(value, (list, tuple)):
+        return 2 * sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    return 2 * sys.getsizeof(value) + 100
+
+
+def _cdist(values, metric):
+    """Distances between a list of feature values (None if empty)"""
+    if len(values) == 0:
+        return None
+    f = np.array(list(values))
+    if f.ndim == 1:
+        f = f.reshape(-1, 1)
+    return cdist(f, f, metric)
+
+
+def _list_values(egg, feature, row):
+    """
+    Presented values of a feature in one list of an egg (skipping the items
+    without the feature)
+    """
+    while getattr(egg, 'parent', None) is not None:
+        row = egg.rows[row]
+        egg = egg.parent
+    arrays = getattr(egg, 'arrays', None)
+    if arrays is not None:
+        column = arrays.pres_features.get(feature)
+        if column is None:
+            return []
+        index = divmod(row, arrays.shape[1])
+        return list(column.decode(index)[column.mask[index]])
+    return [cell[feature] for cell in egg.pres.to_numpy()[row]
+            if isinstance(cell, dict) and feature in cell]
+
+
+def _encode_feature(egg, feature, pool):
+    """
+    Pool codes of the presented values of a feature, one row per list of egg
+    """
+    arrays = getattr(egg, 'arrays', None)
+    if arrays is not None:
+        n_rows, width = arrays.n_rows, arrays.shape[2]
+        codes = np.full((n_rows, width), -1, dtype=np.int64)
+        column = arrays.pres_features.get(feature)
+        if column is None:
+            return codes
+        mask = column.mask.reshape(n_rows, width)
+        if column.kind == 'categorical':
+            values, inverse = column.categories, column.data.reshape(n_rows, width)[mask]
+        elif column.kind in ['numeric', 'vector']:
+            data = column.data.reshape((n_rows, width) + column.data.shape[3:])[mask]
+            values, inverse = np.unique(data, axis=0, return_inverse=True)
+        else:
+            values = column.decode().reshape(n_rows, width)[mask]
+            inverse = np.arange(len(values))
+        codes[mask] = pool.encode(list(values))[np.ravel(inverse)]
+        return codes
+
+    cells = egg.pres.to_numpy()
+    codes = np.full(cells.shape, -1, dtype=np.int64)
+    for i, row in enumerate(cells):
+        # items without the feature are skipped, as in get_distmat
+        values = [cell[feature] for cell in row
+                  if isinstance(cell, dict) and feature in cell]
+        codes[i, :len(values)] = pool.encode(values)
+    return codes
+
+
+# store shared by the fingerprint analyses and OptimalPresenter
+distance_store = DistanceStore()
@@ -0,0 +1,208 @@
+"""
+Execution backends used by analyze to run per-chunk analyses in parallel
+
+Pools are created once and reused across calls.  For the process-based
+backends the egg is written once to a temporary file, which is reused by
+later calls with the same egg until it is modified (see discard).  Each
+worker loads the file the first time it sees it and keeps it, so only the
+small chunk descriptions travel through the pool for every task.  Numpy
+buffers (e.g. the arrays of columnar eggs) are memory-mapped and shared by
+the workers; other objects (e.g. the DataFrames of pandas eggs) are
+unpickled once by each worker.
+"""
+import atexit
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+BACKENDS = ['serial', 'threads', 'processes', 'loky']
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# files of the objects shared with the workers, as {id : (ref, path, finalizer)}
+_dumps = {}
+_dumps_lock = threading.Lock()
+
+# objects loaded by each worker process, by path (most recent last)
+_worker_cache = OrderedDict()
+WORKER_CACHE_SIZE = 4
+
+
+def get_n_jobs(n_jobs=-1):
+    """
+    Returns the number of workers for n_jobs (negative values count back from
+    the number of cores, -1 meaning all of them)
+    """
+    if n_jobs is None:
+        n_jobs = -1
+    if n_jobs < 0:
+        n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def get_executor(backend='processes', n_jobs=-1):
+    """
+    Returns a (reused) concurrent.futures executor for a backend
+
+    Parameters
+    ----------
+    backend : str
+        One of 'threads', 'processes' or 'loky' (joblib's robust process pool)
+
+    n_jobs : int
+        Number of workers (-1 for all cores)
+
+    Returns
+    ----------
+    executor : concurrent.futures.Executor
+        Executor shared by all calls with the same backend and n_jobs
+    """
+    n_jobs = get_n_jobs(n_jobs)
+    if backend == 'loky':
+        # loky keeps its own reusable executor
+        from joblib.externals.loky import get_reusable_executor
+        return get_reusable_executor(max_workers=n_jobs)
+    if backend not in ['threads', 'processes']:
+        raise ValueError('Backend not recognized. Choose one of the following: '
+                         + ', '.join(BACKENDS))
+    with _pools_lock:
+        key = (backend, n_jobs)
+        if key not in _pools:
+            pool = ThreadPoolExecutor if backend == 'threads' else ProcessPoolExecutor
+            _pools[key] = pool(max_workers=n_jobs)
+        return _pools[key]
+
+
+def shutdown():
+    """
+    Shuts down the pools created by get_executor
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=True)
+        _pools.clear()
+
+atexit.register(shutdown)
+
+
+def run_chunks(func, egg, chunks, backend='serial', n_jobs=-1, chunksize=None):
+    """
+    Applies func(egg, chunk) to every chunk, possibly in parallel
+
+    Parameters
+    ----------
+    func : function
+        Module-level function taking the egg and one chunk
+
+    egg : quail.Egg
+        Data shared by all chunks.  With the process-based backends it is
+        written to a file once and loaded by each worker only once, across
+        calls; call discard(egg) after modifying it in place.  Numpy buffers
+        are memory-mapped (zero-copy for columnar eggs); pandas eggs are
+        unpickled by each worker.
+
+    chunks : list
+        Chunk descriptions (small, picklable objects)
+
+    backend : str
+        One of 'serial', 'threads', 'processes' or 'loky'
+
+    n_jobs : int
+        Number of workers (-1 for all cores)
+
+    chunksize : int or None
+        Number of chunks per task.  By default chunks are split in about 4
+        tasks per worker.
+
+    Returns
+    ----------
+    results : list
+        func(egg, chunk) for each chunk, in order
+    """
+    if backend not in BACKENDS:
+        raise ValueError('Backend not recognized. Choose one of the following: '
+                         + ', '.join(BACKENDS))
+    if backend == 'serial' or len(chunks) <= 1:
+        return [func(egg, c) for c in chunks]
+
+    n_jobs = get_n_jobs(n_jobs)
+    if chunksize is None:
+        chunksize = max(1, -(-len(chunks) // (4 * n_jobs)))
+    batches = [chunks[i:i + chunksize] for i in range(0, len(chunks), chunksize)]
+    executor = get_executor(backend, n_jobs)
+
+    if backend == 'threads':
+        futures = [executor.submit(_run_batch, func, egg, b) for b in batches]
+        return [r for f in futures for r in f.result()]
+
+    path, temporary = _dump(egg)
+    try:
+        futures = [executor.submit(_run_shared_batch, func, path, b) for b in batches]
+        return [r for f in futures for r in f.result()]
+    finally:
+        if temporary:
+            os.remove(path)
+
+
+def discard(obj):
+    """
+    Forgets the file shared with the workers for obj (e.g. after it was
+    modified), so that the next call dumps it again
+    """
+    with _dumps_lock:
+        entry = _dumps.pop(id(obj), None)
+    if entry is not None and entry[0]() is obj:
+        entry[2]()
+
+
+def _dump(obj):
+    """
+    Returns the path of a file holding obj and whether it is temporary (to
+    be removed after the call).  Files of objects that support weak
+    references are kept, and removed when the object is discarded or
+    garbage collected.
+    """
+    import joblib
+    with _dumps_lock:
+        entry = _dumps.get(id(obj))
+        if entry is not None and entry[0]() is obj and os.path.exists(entry[1]):
+            return entry[1], False
+        fd, path = tempfile.mkstemp(suffix='.egg')
+        os.close(fd)
+        joblib.dump(obj, path)
+        try:
+            ref = weakref.ref(obj)
+        except TypeError:
+            return path, True
+        _dumps[id(obj)] = (ref, path, weakref.finalize(obj, _remove, id(obj), path))
+        return path, False
+
+
+def _remove(key, path):
+    """Removes a shared file (when its object is discarded or collected)"""
+    with _dumps_lock:
+        entry = _dumps.get(key)
+        if entry is not None and entry[1] == path:
+            del _dumps[key]
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _run_batch(func, egg, batch):
+    return [func(egg, c) for c in batch]
+
+
+def _run_shared_batch(func, path, batch):
+    """Runs a batch in a worker, loading the egg from path the first time"""
+    if path in _worker_cache:
+        _worker_cache.move_to_end(path)
+    else:
+        import joblib
+        _worker_cache[path] = joblib.load(path, mmap_mode='r')
+        while len(_worker_cache) > WORKER_CACHE_SIZE:
+            _worker_cache.popitem(last=False)
+    return _run_batch(func, _worker_cache[path], batch)
@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 from .recmat import recall_matrix
+from ..helpers import get_list_lengths
+from .spc import _positions, _position_rows
 
 
 def pnr_helper(egg, position, match='exact',
@@ -38,28 +40,26 @@ def pnr_helper(egg, position, match='exact',
 
     """
 
-    def get_list_length(list_idx):
-        """Get actual list length by counting non-nan items"""
-        pres_row = egg.pres.iloc[list_idx]
-        length = 0
-        for item in pres_row:
-            if isinstance(item, dict) and 'item' in item:
-                if not (isinstance(item['item'], float) and pd.isna(item['item'])):
-                    length += 1
-                else:
-                    break
-            else:
-                break
-        return length
-
-    def pnr(lst, position, list_idx):
-        actual_length = get_list_length(list_idx)
-        # Initialize with NaN for all positions up to max list length
-        result = [np.nan] * egg.list_length
-        # Set valid positions
-        for pos in range(1, actual_length + 1):
-            result[pos - 1] = 1 if pos == lst[position] else 0
-        return result
+    result = pnr_rows(egg, position, match=match, distance=distance,
+                      features=features)
+    return np.nanmean(result, axis=0)
+
+def pnr_rows(egg, position, match='exact', distance='euclidean',
+             features=None):
+    """
+    Computes the probability of nth recall curve of every list of an egg at
+    once
+
+    Positions past the end of a (shorter) list are NaN.  Parameters are the
+    same as pnr_helper.
+
+    Returns
+    ----------
+    rows : numpy array
+      one row per list (lists x list_length), 1 at the presentation position
+      of the item recalled nth and 0 elsewhere
+
+    """
 
     opts = dict(match=match, distance=distance, features=features)
     if match == 'exact':
@@ -67,9 +67,9 @@ def pnr_helper(egg, position, match='exact',
     recmat = recall_matrix(egg, **opts)
 
     if match in ['exact', 'best']:
-        result = [pnr(lst, position, i) for i, lst in enumerate(recmat)]
+        return _position_rows(_positions(recmat)[:, position],
+                              get_list_lengths(egg), egg.list_length)
     elif match == 'smooth':
-        result = np.atleast_2d(recmat[:, :, 0])
+        return np.atleast_2d(recmat[:, :, 0])
     else:
         raise ValueError('Match must be set to exact, best or smooth.')
-    return np.nanmean(result, axis=0)
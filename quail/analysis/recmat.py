@@ -1,10 +1,17 @@
 import numpy as np
 import pandas as pd
 import six
+import warnings
+from collections import OrderedDict
 from scipy.spatial.distance import cdist
 from ..helpers import check_nan, _format
+from ..columnar import match_positions, _intern_key
 
-def recall_matrix(egg, match='exact', distance='euclidean', features=None):
+# default memory cap (in bytes) for the temporaries of batched similarity
+MAX_BYTES = 2**28
+
+def recall_matrix(egg, match='exact', distance='euclidean', features=None,
+                  max_bytes=MAX_BYTES, dtype=np.float64):
     """
     Computes recall matrix given list of presented and list of recalled words
 
@@ -26,6 +33,19 @@ def recall_matrix(egg, match='exact', distance='euclidean', features=None):
         Applies only to 'best' and 'smooth' matching approaches.  Can be any
         distance function supported by numpy.spatial.distance.cdist.
 
+    features : str or list
+        Features used to compare presented and recalled items (best and smooth
+        matching only).  Defaults to every feature of the presented items.
+
+    max_bytes : int
+        Upper bound on the memory used by temporary arrays when computing
+        similarities for best and smooth matching.  Lists are processed in
+        chunks small enough to respect this cap (default: 256 MB).
+
+    dtype : np.float64 or np.float32
+        Precision of the similarity computations for best and smooth matching.
+        np.float32 halves memory use and is faster, at the cost of precision.
+
     Returns
     ----------
     recall_matrix : list of lists of ints
@@ -37,72 +57,288 @@ def recall_matrix(egg, match='exact', distance='euclidean', features=None):
 
     if match in ['best', 'smooth']:
         if not features:
-            features = [k for k,v in egg.pres.loc[0][0].values[0].items() if k!='item']
+            features = [k for k in _first_cell(egg) if k!='item']
             if not features:
                 raise('No features found.  Cannot match with best or smooth strategy')
 
     if not isinstance(features, list):
         features = [features]
 
-    if match=='exact':
-        features=['item']
-        return _recmat_exact(egg.pres, egg.rec, features)
-    else:
-        return _recmat_smooth(egg.pres, egg.rec, features, distance, match)
+    def compute():
+        if match=='exact':
+            if getattr(egg, 'arrays', None) is not None:
+                return _recmat_exact_arrays(egg.arrays)
+            return _recmat_exact(egg.pres, egg.rec, ['item'])
+        else:
+            return _recmat_smooth(egg, features, distance, match,
+                                  max_bytes=max_bytes, dtype=dtype)
+
+    cache = getattr(egg, 'recmat_cache', None)
+    if cache is None:
+        return compute()
+    return cache.get(_cache_key(match, distance, features, dtype), compute)
+
+def _cache_key(match, distance, features, dtype):
+    """Cache key of a recall matrix (distance/features only matter if inexact)"""
+    if match == 'exact':
+        return ('exact',)
+    return (match, distance, tuple(features), np.dtype(dtype).name)
+
+class RecallMatrixCache(object):
+    """
+    Memoizes recall matrices of an egg, keyed by (match, distance, features)
+
+    Cached matrices are read-only.  Least recently used entries are evicted
+    once the cache holds more than `limit` bytes; matrices larger than the
+    limit are not cached at all.
+
+    Parameters
+    ----------
+    limit : int
+        Maximum number of bytes held by the cache (default: 512 MB)
+
+    """
+
+    def __init__(self, limit=2**29):
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self._entries.values())
+
+    def get(self, key, compute):
+        """Returns the matrix stored under key, computing it if needed"""
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        return self.put(key, compute())
+
+    def put(self, key, recmat):
+        """Stores a matrix and evicts old entries to respect the limit"""
+        recmat = np.asarray(recmat)
+        if recmat.nbytes > self.limit:
+            return recmat
+        recmat.flags.writeable = False
+        self._entries[key] = recmat
+        self._entries.move_to_end(key)
+        while self.nbytes > self.limit:
+            self._entries.popitem(last=False)
+        return recmat
+
+    def take(self, rows):
+        """Returns a new cache holding the given rows of every matrix"""
+        new = RecallMatrixCache(self.limit)
+        for key, recmat in self._entries.items():
+            new.put(key, recmat[rows])
+        return new
+
+    def clear(self):
+        """Drops every cached matrix"""
+        self._entries.clear()
+
+    def info(self):
+        """
+        Returns a dict with the cached keys, their total size in bytes, the
+        size limit and the hit/miss counts
+        """
+        return {
+            'keys' : list(self._entries),
+            'nbytes' : self.nbytes,
+            'limit' : self.limit,
+            'hits' : self.hits,
+            'misses' : self.misses,
+        }
+
+def _first_cell(egg):
+    """Returns the dict of the first presented item"""
+    if getattr(egg, 'arrays', None) is not None:
+        return egg.arrays.cell('pres', 0, 0, 0)
+    return egg.pres.loc[0][0].values[0]
+
+def _recmat_exact_arrays(arrays):
+    recmat = arrays.recall_matrix()
+    cols = max(arrays.shape[2], recmat.shape[1])
+    result = np.full((recmat.shape[0], cols), np.nan)
+    result[:, :recmat.shape[1]] = recmat
+    return result
 
 def _recmat_exact(presented, recalled, features):
-    lists = presented.index.to_numpy()
+    """
+    Builds the exact-match recall matrix for every list at once
+
+    Presented and recalled items are factorized together into integer codes,
+    recalled items are left-aligned (missing recalls are dropped), and the
+    first presentation position of each recalled code is looked up with array
+    operations.  Unmatched recalls (intrusions) and padding are NaN.
+    """
     cols = max(presented.shape[1], recalled.shape[1])
-    result = np.empty((presented.shape[0], cols))*np.nan
-    for li, l in enumerate(lists):
-        p_list = presented.loc[l]
-        r_list = recalled.loc[l]
-        for i, feature in enumerate(features):
-            get_feature = lambda x: np.array(x[feature]) if not np.array(pd.isnull(x['item'])).any() else np.nan
-            p = np.vstack(p_list.apply(get_feature).to_numpy())
-            r = r_list.dropna().apply(get_feature).to_numpy()
-            r = np.vstack(list(filter(lambda x: (x is not np.nan) and (np.size(x) > 0), r)))
-            try:
-                m = [np.where((p==x).all(axis=1))[0] for x in r]
-            except AttributeError:
-                m = []
-            result[li, :len(m)] = [x[0]+1 if len(x)>0 else np.nan for x in m]
+    result = np.full((presented.shape[0], cols), np.nan)
+    if presented.size == 0 or recalled.size == 0:
+        return result
+
+    p_items = _get_items(presented.to_numpy())
+    r_items = _get_items(recalled.to_numpy())
+    p_valid = ~_items_missing(p_items)
+    r_valid = ~_items_missing(r_items)
+
+    keys = np.concatenate([p_items[p_valid], r_items[r_valid]])
+    try:
+        codes = pd.factorize(keys)[0]
+    except TypeError:
+        # unhashable items (e.g. lists) are compared by value
+        codes = pd.factorize(_intern_keys(keys))[0]
+
+    p_codes = np.full(p_items.shape, -1, dtype=np.int64)
+    p_codes[p_valid] = codes[:p_valid.sum()]
+    r_codes = np.full(r_items.shape, -1, dtype=np.int64)
+    r_codes[r_valid] = codes[p_valid.sum():]
+
+    # left-align the recalls so that dropped (missing) items leave no gaps
+    order = np.argsort(~r_valid, axis=1, kind='stable')
+    r_codes = np.take_along_axis(r_codes, order, axis=1)
+
+    pos = match_positions(p_codes, r_codes).astype(np.float64)
+    pos[pos == 0] = np.nan
+    result[:, :pos.shape[1]] = pos
     return result
 
-def _recmat_smooth(presented, recalled, features, distance, match):
+_get_items = np.frompyfunc(lambda x: x['item'] if isinstance(x, dict) else np.nan, 1, 1)
+_intern_keys = np.frompyfunc(_intern_key, 1, 1)
 
-    if match == 'best':
-        func = np.argmax
-    elif match == 'smooth':
-        func = np.nanmean
+def _items_missing(items):
+    return np.frompyfunc(lambda x: bool(np.array(pd.isnull(x)).any()), 1, 1)(items).astype(bool)
 
-    simmtx = _similarity_smooth(presented, recalled, features, distance)
+def _recmat_smooth(egg, features, distance, match, max_bytes=MAX_BYTES,
+                   dtype=np.float64):
 
+    simmtx = _similarity_smooth(egg, features, distance, max_bytes=max_bytes,
+                                dtype=dtype)
 
     if match == 'best':
-        recmat = np.atleast_3d([func(s, 1) for s in simmtx]).astype(np.float64)
+        # most similar presented item for every recall of every list at once
+        with np.errstate(invalid='ignore'):
+            recmat = np.atleast_3d(np.argmax(simmtx, 2)).astype(np.float64)
         recmat+=1
         recmat[np.isnan(simmtx).any(2)]=np.nan
     elif match == 'smooth':
-        recmat = np.atleast_3d([func(s, 0) for s in simmtx]).astype(np.float64)
-
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            recmat = np.atleast_3d(np.nanmean(simmtx, 1)).astype(np.float64)
 
     return recmat
 
-def _similarity_smooth(presented, recalled, features, distance):
-    lists = presented.index.to_numpy()
-    res = np.empty((len(lists), len(features), recalled.iloc[0].shape[0], presented.iloc[0].shape[0]))*np.nan
-    for li, l in enumerate(lists):
-        p_list = presented.loc[l]
-        r_list = recalled.loc[l]
-        for i, feature in enumerate(features):
-            get_feature = lambda x: np.array(x[feature]) if np.array(pd.notna(x['item'])).any() else np.nan
-            p = np.vstack(p_list.apply(get_feature).to_numpy())
-            r = r_list.dropna().apply(get_feature).to_numpy()
-            r = np.vstack(list(filter(lambda x: (x is not np.nan) and (np.size(x) > 0), r)))
-            tmp = 1 - cdist(r, p, distance)
-            res[li, i, :tmp.shape[0], :] =  tmp
-    if distance == 'correlation':
-        return np.nanmean(res, 1)
-    else:
-        return np.mean(res, 1)
+def _feature_tensor(egg, which, feature, dtype=np.float64):
+    """
+    Returns a (n_lists, width, n_dims) float array of a feature for presented
+    (which='pres') or recalled (which='rec') items.  Missing items are NaN;
+    recalled items are left-aligned.
+    """
+    if getattr(egg, 'arrays', None) is not None:
+        return egg.arrays.feature_tensor(which, feature, dtype=dtype)
+
+    df = egg.pres if which == 'pres' else egg.rec
+    cells = df.to_numpy()
+    rows = []
+    for row in cells:
+        vals = [np.ravel(np.asarray(x[feature], dtype=np.float64))
+                if isinstance(x, dict) and np.array(pd.notna(x['item'])).any() else None
+                for x in row]
+        if which == 'rec':
+            vals = [v for v in vals if v is not None and v.size > 0]
+        rows.append(vals)
+    n_dims = next((v.size for vals in rows for v in vals if v is not None), 1)
+    out = np.full((cells.shape[0], cells.shape[1], n_dims), np.nan, dtype=dtype)
+    for li, vals in enumerate(rows):
+        for k, v in enumerate(vals):
+            if v is not None:
+                out[li, k] = v
+    return out
+
+def _batched_distance(r, p, distance):
+    """
+    Distances between every recalled (r: lists x recalls x dims) and presented
+    (p: lists x items x dims) vector of each list.  Returns None if the metric
+    has no batched implementation.
+    """
+    if distance in ['euclidean', 'sqeuclidean']:
+        # |r - p|^2 = |r|^2 + |p|^2 - 2 r.p, as batched matrix products
+        sq = np.einsum('rkd,rkd->rk', r, r)[:, :, None] + \
+             np.einsum('rld,rld->rl', p, p)[:, None, :] - \
+             2 * np.matmul(r, np.swapaxes(p, 1, 2))
+        sq = np.maximum(sq, 0, out=sq, where=~np.isnan(sq))
+        return sq if distance == 'sqeuclidean' else np.sqrt(sq)
+    elif distance in ['cityblock', 'chebyshev']:
+        diff = np.abs(r[:, :, None, :] - p[:, None, :, :])
+        return diff.sum(-1) if distance == 'cityblock' else diff.max(-1)
+    elif distance in ['cosine', 'correlation']:
+        if distance == 'correlation':
+            r = r - r.mean(-1, keepdims=True)
+            p = p - p.mean(-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dot = np.einsum('rkd,rld->rkl', r, p)
+            norms = np.sqrt(np.einsum('rkd,rkd->rk', r, r))[:, :, None] * \
+                    np.sqrt(np.einsum('rld,rld->rl', p, p))[:, None, :]
+            return np.clip(1 - dot / norms, 0, 2)
+    return None
+
+def _chunk_similarity(r, p, distance):
+    """1 - distance for a chunk of lists, NaN wherever an item is missing"""
+    out = _batched_distance(r, p, distance)
+    if out is not None:
+        return 1 - out
+    # metrics without a batched form (e.g. callables) fall back to cdist per list
+    out = np.full((r.shape[0], r.shape[1], p.shape[1]), np.nan, dtype=r.dtype)
+    for li in range(r.shape[0]):
+        keep = ~np.isnan(r[li]).all(1)
+        if keep.any():
+            out[li, keep] = 1 - cdist(r[li][keep], p[li], distance)
+    return out
+
+def _similarity_smooth(egg, features, distance, max_bytes=MAX_BYTES,
+                       dtype=np.float64):
+    """
+    Similarity between recalled and presented items, averaged over features
+
+    Lists are stacked into (lists, recalls, items, dims) tensors and processed
+    in chunks of rows so that the temporaries stay under max_bytes.
+
+    Returns
+    ----------
+    similarity : np.ndarray
+        (n_lists, n_recalls, n_items) array
+    """
+    tensors = [(_feature_tensor(egg, 'pres', f, dtype=dtype),
+                _feature_tensor(egg, 'rec', f, dtype=dtype)) for f in features]
+    n_lists, n_pres = tensors[0][0].shape[:2]
+    n_rec = tensors[0][1].shape[1]
+    itemsize = np.dtype(dtype).itemsize
+    n_dims = max(p.shape[2] for p, r in tensors)
+    row_bytes = max(1, 3 * n_rec * n_pres * n_dims * itemsize)
+    step = max(1, int(max_bytes // row_bytes))
+
+    res = np.empty((n_lists, n_rec, n_pres), dtype=dtype)
+    for start in range(0, n_lists, step):
+        rows = slice(start, start + step)
+        total = None
+        count = None
+        for p, r in tensors:
+            sim = _chunk_similarity(r[rows], p[rows], distance)
+            if distance == 'correlation':
+                # average over features ignoring NaNs
+                valid = ~np.isnan(sim)
+                sim = np.where(valid, sim, 0)
+                total = sim if total is None else total + sim
+                count = valid.astype(dtype) if count is None else count + valid
+            else:
+                total = sim if total is None else total + sim
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if distance == 'correlation':
+                res[rows] = np.where(count > 0, total / count, np.nan)
+            else:
+                res[rows] = total / len(tensors)
+    return res
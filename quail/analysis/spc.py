@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 from .recmat import recall_matrix
+from ..helpers import get_list_lengths
 
 
 def spc_helper(egg, match='exact', distance='euclidean',
@@ -33,31 +34,23 @@ def spc_helper(egg, match='exact', distance='euclidean',
 
     """
 
-    def get_list_length(list_idx):
-        """Get actual list length by counting non-nan items"""
-        pres_row = egg.pres.iloc[list_idx]
-        length = 0
-        for item in pres_row:
-            if isinstance(item, dict) and 'item' in item:
-                if not (isinstance(item['item'], float) and pd.isna(item['item'])):
-                    length += 1
-                else:
-                    break
-            else:
-                break
-        return length
-
-    def spc(lst, list_idx):
-        actual_length = get_list_length(list_idx)
-        # Initialize with NaN for all positions
-        d = np.full(len(egg.pres.values[0]), np.nan, dtype=float)
-        # Set valid positions to 0
-        d[:actual_length] = 0
-        # Mark recalled positions as 1
-        inds = np.array(lst[~np.isnan(lst)]).astype(int)
-        valid_inds = inds[(inds >= 1) & (inds <= actual_length)]
-        d[valid_inds - 1] = 1
-        return d
+    result = spc_rows(egg, match=match, distance=distance, features=features)
+    return np.nanmean(result, 0)
+
+def spc_rows(egg, match='exact', distance='euclidean', features=None):
+    """
+    Computes the serial position curve of every list of an egg at once
+
+    Positions past the end of a (shorter) list are NaN.  Parameters are the
+    same as spc_helper.
+
+    Returns
+    ----------
+    rows : numpy array
+      one row per list (lists x list_length), 1 where the item presented at a
+      given position was recalled and 0 otherwise
+
+    """
 
     opts = dict(match=match, distance=distance, features=features)
     if match == 'exact':
@@ -65,9 +58,26 @@ def spc_helper(egg, match='exact', distance='euclidean',
     recmat = recall_matrix(egg, **opts)
 
     if match in ['exact', 'best']:
-        result = [spc(lst, i) for i, lst in enumerate(recmat)]
+        return _position_rows(_positions(recmat), get_list_lengths(egg),
+                              egg.list_length)
     elif match == 'smooth':
-        result = np.nanmean(recmat, 2)
+        return np.nanmean(recmat, 2)
     else:
         raise ValueError('Match must be set to exact, best or smooth.')
-    return np.nanmean(result, 0)
+
+def _positions(recmat):
+    """Drops the trailing axis of best-match recall matrices"""
+    return recmat[:, :, 0] if recmat.ndim == 3 else recmat
+
+def _position_rows(positions, lengths, list_length):
+    """
+    Returns a (lists x list_length) array that is 0 up to the length of each
+    list, NaN past it, and 1 at the given (1-indexed) presentation positions
+    """
+    lengths = np.asarray(lengths)[:, None]
+    rows = np.where(np.arange(list_length) < lengths, 0., np.nan)
+    positions = np.asarray(positions, dtype=float).reshape(len(rows), -1)
+    hit = (positions >= 1) & (positions <= lengths)
+    r, c = np.nonzero(hit)
+    rows[r, positions[r, c].astype(int) - 1] = 1
+    return rows
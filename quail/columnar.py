@@ -0,0 +1,1069 @@
+#!/usr/bin/env python
+"""
+Columnar, array-backed storage for Egg data
+
+Instead of holding one Python dict per presented/recalled item, an
+`EggArrays` instance interns every item into a shared vocabulary and stores
+the data as typed NumPy arrays:
+
+- item codes: int32 arrays of shape (n_subjects, n_lists, width), where -1
+  marks a missing (padded) cell
+- recall positions: int32 array with the 1-based presentation position of
+  each recalled item (0 for intrusions and padding)
+- features: one `FeatureColumn` per feature (numeric, vector, categorical
+  codes, or a generic object fallback)
+
+`EggArrays.save` writes these arrays to a directory of .npy files plus a
+small JSON header, which `EggArrays.load` memory-maps back.
+"""
+import json
+import numbers
+import os
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+import six
+
+_KINDS = ('numeric', 'vector', 'categorical', 'object')
+
+# on-disk directory format
+FORMAT_NAME = 'quail-columnar-egg'
+FORMAT_VERSION = 1
+_HEADER = 'header.json'
+_EXTRAS = 'extras.pkl'
+
+
+def _is_missing(x):
+    """True for None/NaN scalars (the representation of a padded cell)"""
+    if x is None:
+        return True
+    if isinstance(x, (float, np.floating)):
+        return bool(np.isnan(x))
+    return False
+
+
+def _intern_key(x):
+    """Returns a hashable key for an item (items may be lists/arrays)"""
+    try:
+        hash(x)
+        return x
+    except TypeError:
+        return ('__array__', tuple(np.ravel(np.asarray(x)).tolist()))
+
+
+def match_positions(pres_codes, rec_codes):
+    """
+    Finds the presentation position of every recalled item
+
+    Parameters
+    ----------
+    pres_codes : np.ndarray
+        (n_rows, list_length) array of interned item codes, -1 for missing
+
+    rec_codes : np.ndarray
+        (n_rows, n_recalls) array of interned item codes, -1 for missing
+
+    Returns
+    ----------
+    positions : np.ndarray
+        int32 (n_rows, n_recalls) array holding the 1-based position of the
+        first presented item matching each recall, or 0 if there was no match
+
+    """
+    pres_codes = np.asarray(pres_codes)
+    rec_codes = np.asarray(rec_codes)
+    n_rows, width = pres_codes.shape
+    result = np.zeros(rec_codes.shape, dtype=np.int32)
+    if pres_codes.size == 0 or rec_codes.size == 0:
+        return result
+
+    # one key per (row, item) so that a single sorted index covers every list
+    n_codes = np.int64(max(pres_codes.max(), rec_codes.max()) + 1)
+    valid = pres_codes >= 0
+    rows = np.broadcast_to(np.arange(n_rows, dtype=np.int64)[:, None], pres_codes.shape)[valid]
+    pos = np.broadcast_to(np.arange(width, dtype=np.int32)[None, :], pres_codes.shape)[valid]
+    keys = rows * n_codes + pres_codes[valid]
+
+    # keep the first presentation of each item (sort by key, then position)
+    order = np.lexsort((pos, keys))
+    keys, pos = keys[order], pos[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    keys, pos = keys[first], pos[first]
+    if len(keys) == 0:
+        return result
+
+    rec_keys = np.arange(n_rows, dtype=np.int64)[:, None] * n_codes + rec_codes
+    idx = np.clip(np.searchsorted(keys, rec_keys), 0, len(keys) - 1)
+    found = (keys[idx] == rec_keys) & (rec_codes >= 0)
+    result[found] = pos[idx[found]] + 1
+    return result
+
+
+class FeatureColumn(object):
+    """
+    Typed storage for a single stimulus feature
+
+    Parameters
+    ----------
+    kind : str
+        One of 'numeric' (scalar numbers), 'vector' (fixed-length numeric
+        arrays), 'categorical' (strings, stored as int32 codes) or 'object'
+        (anything else)
+
+    data : np.ndarray
+        The feature values.  Shape is (n_subjects, n_lists, width) plus a
+        trailing dimension for vector features.  Categorical features store
+        codes into `categories`.
+
+    mask : np.ndarray
+        Boolean (n_subjects, n_lists, width) array, True where the item has
+        this feature
+
+    categories : np.ndarray or None
+        Category labels (categorical features only)
+
+    """
+
+    def __init__(self, kind, data, mask, categories=None):
+        if kind not in _KINDS:
+            raise ValueError('Feature kind must be one of ' + ', '.join(_KINDS))
+        self.kind = kind
+        self.data = data
+        self.mask = mask
+        self.categories = categories
+
+    @classmethod
+    def from_values(cls, shape, positions, values):
+        """
+        Builds a typed column from flat cell positions and raw values
+        """
+        mask = np.zeros(shape, dtype=bool)
+        mask.flat[positions] = True
+
+        if all(isinstance(v, six.string_types) for v in values):
+            categories, codes = {}, np.empty(len(values), dtype=np.int32)
+            for i, v in enumerate(values):
+                codes[i] = categories.setdefault(v, len(categories))
+            data = np.full(shape, -1, dtype=np.int32)
+            data.flat[positions] = codes
+            cats = np.empty(len(categories), dtype=object)
+            cats[:] = list(categories)
+            return cls('categorical', data, mask, cats)
+
+        if all(isinstance(v, (numbers.Number, np.number)) for v in values):
+            arr = np.asarray(values)
+            if arr.dtype.kind in 'biuf':
+                data = np.zeros(shape, dtype=arr.dtype)
+                data.flat[positions] = arr
+                return cls('numeric', data, mask)
+
+        try:
+            arr = np.asarray(values)
+        except ValueError:
+            arr = None
+        if arr is not None and arr.ndim == 2 and arr.dtype.kind in 'biuf':
+            data = np.zeros(shape + (arr.shape[1],), dtype=arr.dtype)
+            data.reshape(-1, arr.shape[1])[positions] = arr
+            return cls('vector', data, mask)
+
+        data = np.empty(shape, dtype=object)
+        flat = data.reshape(-1)
+        for p, v in zip(positions, values):
+            flat[p] = v
+        return cls('object', data, mask)
+
+    def take(self, subjects, lists):
+        """Returns the column restricted to the given subject/list positions"""
+        ix = np.ix_(subjects, lists)
+        return FeatureColumn(self.kind, self.data[ix], self.mask[ix], self.categories)
+
+    def decode(self, index=Ellipsis):
+        """
+        Returns an object array of the original feature values (None where
+        the feature is absent)
+        """
+        mask = self.mask[index]
+        out = np.empty(mask.shape, dtype=object)
+        if self.kind == 'categorical':
+            codes = self.data[index]
+            out[mask] = self.categories[codes[mask]]
+        elif self.kind == 'vector':
+            vals = self.data[index]
+            flat = out.reshape(-1)
+            for i in np.flatnonzero(mask):
+                flat[i] = vals.reshape(-1, vals.shape[-1])[i]
+        elif self.kind == 'numeric':
+            vals = self.data[index]
+            flat = out.reshape(-1)
+            flat[np.flatnonzero(mask)] = vals[mask].tolist()
+        else:
+            out[mask] = self.data[index][mask]
+        return out
+
+    def dense(self, index=Ellipsis, dtype=np.float64):
+        """
+        Returns the feature as a float array with a trailing feature
+        dimension (NaN where the feature is absent)
+        """
+        mask = self.mask[index]
+        if self.kind == 'numeric':
+            out = self.data[index].astype(dtype)[..., None]
+        elif self.kind == 'vector':
+            out = self.data[index].astype(dtype)
+        else:
+            vals = self.decode(index)[mask]
+            arr = np.asarray(list(vals), dtype=dtype)
+            arr = arr.reshape(len(vals), -1)
+            out = np.zeros(mask.shape + (arr.shape[1],), dtype=dtype)
+            out[mask] = arr
+        out[~mask] = np.nan
+        return out
+
+    @property
+    def nbytes(self):
+        n = self.data.nbytes + self.mask.nbytes
+        if self.kind == 'object':
+            n += sum(np.asarray(v).nbytes for v in self.data[self.mask])
+        return n
+
+    def to_dict(self):
+        return {'kind': self.kind, 'data': self.data, 'mask': self.mask,
+                'categories': self.categories}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['kind'], d['data'], d['mask'], d.get('categories'))
+
+
+class EggArrays(object):
+    """
+    Columnar storage engine for Egg data
+
+    Parameters
+    ----------
+    vocab : np.ndarray
+        Object array of unique items.  Item codes index into this array.
+
+    pres_codes : np.ndarray
+        int32 (n_subjects, n_lists, list_length) array of presented item codes
+
+    rec_codes : np.ndarray
+        int32 (n_subjects, n_lists, n_recalls) array of recalled item codes
+
+    pres_features : dict
+        Maps feature names to `FeatureColumn` instances for presented items
+
+    rec_features : dict
+        Maps feature names to `FeatureColumn` instances for recalled items
+
+    subjects : array-like
+        Subject index labels
+
+    lists : array-like
+        List index labels
+
+    rec_pos : np.ndarray (optional)
+        Recall positions (see `match_positions`).  Computed if not passed.
+
+    """
+
+    def __init__(self, vocab, pres_codes, rec_codes, pres_features=None,
+                 rec_features=None, subjects=None, lists=None, rec_pos=None):
+        self.vocab = vocab
+        self.pres_codes = pres_codes
+        self.rec_codes = rec_codes
+        self.pres_features = pres_features if pres_features is not None else {}
+        self.rec_features = rec_features if rec_features is not None else {}
+        n_subjects, n_lists = pres_codes.shape[:2]
+        self.subjects = np.arange(n_subjects) if subjects is None else np.asarray(subjects)
+        self.lists = np.arange(n_lists) if lists is None else np.asarray(lists)
+        if rec_pos is None:
+            rec_pos = match_positions(self._rows(pres_codes), self._rows(rec_codes))
+            rec_pos = rec_pos.reshape(rec_codes.shape)
+        self.rec_pos = rec_pos
+
+    @property
+    def shape(self):
+        """(n_subjects, n_lists, list_length)"""
+        return self.pres_codes.shape
+
+    @property
+    def n_rows(self):
+        return self.pres_codes.shape[0] * self.pres_codes.shape[1]
+
+    @property
+    def feature_names(self):
+        return list(self.pres_features)
+
+    @property
+    def pres_lengths(self):
+        """Number of presented items in each list (rows in subject-major order)"""
+        valid = self._rows(self.pres_codes) >= 0
+        return np.where(valid.all(1), valid.shape[1], np.argmin(valid, 1))
+
+    @property
+    def rec_lengths(self):
+        """Number of recalled items in each list"""
+        return (self._rows(self.rec_codes) >= 0).sum(1)
+
+    @property
+    def nbytes(self):
+        n = self.pres_codes.nbytes + self.rec_codes.nbytes + self.rec_pos.nbytes
+        n += sum(c.nbytes for c in self.pres_features.values())
+        n += sum(c.nbytes for c in self.rec_features.values())
+        return n
+
+    def _rows(self, arr):
+        """Flattens the subject and list dimensions into one row dimension"""
+        return arr.reshape((-1,) + arr.shape[2:])
+
+    def _side(self, which):
+        if which == 'pres':
+            return self.pres_codes, self.pres_features
+        elif which == 'rec':
+            return self.rec_codes, self.rec_features
+        raise ValueError("which must be 'pres' or 'rec'")
+
+    @classmethod
+    def from_nested(cls, pres, rec, features=None, subjects=None, lists=None):
+        """
+        Builds columnar storage from nested lists
+
+        Parameters
+        ----------
+        pres : list (subjects) of lists (lists) of lists (items)
+            Presented items as strings/numbers or dicts with an 'item' key
+
+        rec : list (subjects) of lists (lists) of lists (items)
+            Recalled items, same format as pres
+
+        features : list (subjects) of lists (lists) of lists of dicts (optional)
+            Legacy features argument, merged into the presented items
+
+        Returns
+        ----------
+        arrays : EggArrays
+            The columnar representation of the data
+
+        """
+        vocab = _Vocab()
+        pres_codes, pres_features = _encode(pres, vocab, features=features,
+                                            compact=False)
+        rec_codes, rec_features = _encode(rec, vocab, compact=True,
+                                          n_lists=pres_codes.shape[1])
+        return cls(vocab.array(), pres_codes, rec_codes, pres_features,
+                   rec_features, subjects=subjects, lists=lists)
+
+    @classmethod
+    def from_frames(cls, pres, rec):
+        """
+        Builds columnar storage from multi-indexed DataFrames of dicts (the
+        representation used by `Egg.pres` and `Egg.rec`)
+        """
+        subjects = pres.index.levels[0].values
+        lists = pres.index.levels[1].values
+
+        def nest(df):
+            out = [[[] for _ in lists] for _ in subjects]
+            s_codes, l_codes = df.index.codes
+            for row, s, l in zip(df.to_numpy(), s_codes, l_codes):
+                out[s][l] = list(row)
+            return out
+
+        return cls.from_nested(nest(pres), nest(rec), subjects=subjects,
+                               lists=lists)
+
+    @classmethod
+    def from_arrays(cls, pres, rec, features=None, subjects=None, lists=None,
+                    validate=True):
+        """
+        Builds columnar storage from arrays of items, without any per-item
+        Python work for strings and numbers
+
+        Parameters
+        ----------
+        pres : array-like
+            (n_subjects, n_lists, list_length) array of presented items
+            (hashable scalars, e.g. strings or numbers), None or NaN for
+            missing cells.  A 2D array is a single subject.
+
+        rec : array-like
+            (n_subjects, n_lists, n_recalls) array of recalled items, same
+            format as pres
+
+        features : dict (optional)
+            Maps feature names to arrays of the shape of pres (numbers,
+            strings or objects), or with one more dimension for vector
+            features
+
+        subjects, lists : array-like (optional)
+            Subject and list index labels
+
+        validate : bool
+            If True (default), checks the shapes and feature names and
+            left-aligns the recalls.  Pass False for input known to be
+            consistent, with recalls already left-aligned.
+
+        Returns
+        ----------
+        arrays : EggArrays
+            The columnar representation of the data
+
+        """
+        pres, rec = np.asarray(pres), np.asarray(rec)
+        features = {k: np.asarray(v) for k, v in (features or {}).items()}
+        if pres.ndim == 2:
+            pres, rec = pres[np.newaxis], rec[np.newaxis]
+            features = {k: v[np.newaxis] for k, v in features.items()}
+        if validate:
+            if pres.ndim != 3 or rec.ndim != 3:
+                raise ValueError('pres and rec must be 3D arrays (subjects, '
+                                 'lists, items).')
+            if pres.shape[:2] != rec.shape[:2]:
+                raise ValueError('pres and rec must have the same number of '
+                                 'subjects and lists.')
+            for name, values in features.items():
+                if name == 'item':
+                    raise ValueError("'item' is not a valid feature name.")
+                if values.shape[:3] != pres.shape or values.ndim > 4:
+                    raise ValueError('Feature ' + str(name) + ' must have the '
+                                     'shape of pres ' + str(pres.shape) + '.')
+
+        # intern the items of both sides at once, in order of appearance
+        codes, vocab = pd.factorize(np.concatenate([pres.ravel(), rec.ravel()]))
+        pres_codes = codes[:pres.size].astype(np.int32).reshape(pres.shape)
+        rec_codes = codes[pres.size:].astype(np.int32).reshape(rec.shape)
+        if validate:
+            # recalls are left-aligned, as for the other constructors
+            order = np.argsort(rec_codes < 0, axis=2, kind='stable')
+            rec_codes = np.take_along_axis(rec_codes, order, 2)
+            rec_codes = rec_codes[:, :, :(rec_codes >= 0).sum(2).max(initial=0)]
+        present = pres_codes >= 0
+
+        pres_features = {name: _column(values, present)
+                         for name, values in features.items()}
+        rec_features = {}
+        if 'Temporal' not in pres_features:
+            pres_features['Temporal'] = _temporal(present)
+            rec_features['Temporal'] = _temporal(rec_codes >= 0)
+
+        return cls(np.asarray(vocab, dtype=object), pres_codes, rec_codes,
+                   pres_features, rec_features, subjects=subjects, lists=lists)
+
+    @classmethod
+    def from_long(cls, df, subjname='Subject', listname='List', phase='Phase',
+                  item='item', position=None, features=None, validate=True):
+        """
+        Builds columnar storage from a long (tidy) table with one row per
+        presented or recalled item
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The data
+
+        subjname, listname : str
+            Columns with the subject and list labels
+
+        phase : str
+            Column with 'pres' for presented items and 'rec' for recalled
+            items
+
+        item : str
+            Column with the items
+
+        position : str or None
+            Column with the (0-based) position of each item in its list, or
+            in its recall sequence.  If None, rows are taken in the order of
+            the table.
+
+        features : list or None
+            Columns with features of the presented items (default: all other
+            columns)
+
+        validate : bool
+            If True (default), checks the columns of the table.  Also passed
+            to from_arrays.
+
+        Returns
+        ----------
+        arrays : EggArrays
+            The columnar representation of the data
+
+        """
+        used = [subjname, listname, phase, item, position]
+        if validate:
+            missing = [str(c) for c in used + (features or [])
+                       if c is not None and c not in df.columns]
+            if missing:
+                raise ValueError('Columns not found: ' + ', '.join(missing))
+            if not df[phase].isin(['pres', 'rec']).all():
+                raise ValueError('The ' + str(phase) + " column must only hold "
+                                 "'pres' and 'rec'.")
+        if features is None:
+            features = [c for c in df.columns if c not in used]
+
+        s_codes, subjects = pd.factorize(df[subjname], sort=True)
+        l_codes, lists = pd.factorize(df[listname], sort=True)
+        if position is None:
+            positions = df.groupby([df[subjname], df[listname], df[phase]],
+                                   sort=False).cumcount().to_numpy()
+        else:
+            positions = df[position].to_numpy().astype(np.int64)
+
+        def place(values, rows):
+            """Scatters the values of the given rows into a 3D array"""
+            width = int(positions[rows].max(initial=-1)) + 1
+            shape = (len(subjects), len(lists), width)
+            if values.dtype.kind in 'biuf':
+                out = np.zeros(shape, dtype=values.dtype)
+            else:
+                out = np.full(shape, None, dtype=object)
+            out[s_codes[rows], l_codes[rows], positions[rows]] = values[rows]
+            return out
+
+        is_pres = (df[phase] == 'pres').to_numpy()
+        items = df[item].to_numpy().astype(object)
+        return cls.from_arrays(place(items, is_pres), place(items, ~is_pres),
+                               features={name: place(df[name].to_numpy(), is_pres)
+                                         for name in features},
+                               subjects=subjects, lists=lists, validate=validate)
+
+    @classmethod
+    def concatenate(cls, arrays):
+        """
+        Stacks the subjects of several EggArrays, in one pass over each array
+
+        Subjects are renumbered from 0 and lists from 0 within each subject
+        (as stack_eggs does).  Eggs with fewer lists or shorter lists are
+        padded with missing items, vocabularies and feature categories are
+        merged, and features missing from some eggs are absent for their
+        items.
+
+        Parameters
+        ----------
+        arrays : list of EggArrays
+            The data to stack
+
+        Returns
+        ----------
+        arrays : EggArrays
+            The stacked data
+
+        """
+        arrays = list(arrays)
+        if not arrays:
+            raise ValueError('Nothing to concatenate.')
+        n_lists = max(a.shape[1] for a in arrays)
+        width = (n_lists, max(a.shape[2] for a in arrays))
+        rec_width = (n_lists, max(a.rec_codes.shape[2] for a in arrays))
+
+        vocab = _Vocab()
+        pres_codes, rec_codes, rec_pos = [], [], []
+        for a in arrays:
+            # the last entry maps missing items (-1) to themselves
+            remap = np.array([vocab.code(v) for v in a.vocab] + [-1], dtype=np.int32)
+            pres_codes.append(_pad(remap[a.pres_codes], width, -1))
+            rec_codes.append(_pad(remap[a.rec_codes], rec_width, -1))
+            rec_pos.append(_pad(a.rec_pos, rec_width, 0))
+
+        pres_features = _concat_features([a.pres_features for a in arrays],
+                                         [c.shape for c in pres_codes])
+        rec_features = _concat_features([a.rec_features for a in arrays],
+                                        [c.shape for c in rec_codes])
+        return cls(vocab.array(), np.concatenate(pres_codes),
+                   np.concatenate(rec_codes), pres_features, rec_features,
+                   rec_pos=np.concatenate(rec_pos))
+
+    def take(self, subjects=None, lists=None):
+        """
+        Returns a new EggArrays restricted to the given subject/list positions
+        """
+        subjects = np.arange(self.shape[0]) if subjects is None else np.asarray(subjects, dtype=int)
+        lists = np.arange(self.shape[1]) if lists is None else np.asarray(lists, dtype=int)
+        ix = np.ix_(subjects, lists)
+        return EggArrays(self.vocab, self.pres_codes[ix], self.rec_codes[ix],
+                         {k: v.take(subjects, lists) for k, v in self.pres_features.items()},
+                         {k: v.take(subjects, lists) for k, v in self.rec_features.items()},
+                         subjects=self.subjects[subjects], lists=self.lists[lists],
+                         rec_pos=self.rec_pos[ix])
+
+    def index(self):
+        """Returns the (Subject, List) MultiIndex of the rows"""
+        return pd.MultiIndex.from_product([self.subjects, self.lists],
+                                          names=['Subject', 'List'])
+
+    def items(self, which='pres'):
+        """Object array of items (NaN for missing cells)"""
+        codes, _ = self._side(which)
+        out = np.empty(codes.shape, dtype=object)
+        out[:] = np.nan
+        valid = codes >= 0
+        out[valid] = self.vocab[codes[valid]]
+        return out
+
+    def recall_matrix(self):
+        """The exact-match recall matrix (NaN where nothing matched)"""
+        pos = self._rows(self.rec_pos).astype(np.float64)
+        pos[pos == 0] = np.nan
+        return pos
+
+    def feature_tensor(self, which, feature, dtype=np.float64):
+        """
+        Returns a (n_rows, width, n_dims) float array for a feature.  The
+        pseudo-feature 'item' returns the items themselves.
+        """
+        codes, columns = self._side(which)
+        if feature == 'item':
+            vals = self._rows(self.items(which))
+            mask = self._rows(codes) >= 0
+            sample = [np.ravel(np.asarray(v, dtype=dtype)) for v in vals[mask]]
+            n_dims = len(sample[0]) if sample else 1
+            out = np.full(mask.shape + (n_dims,), np.nan, dtype=dtype)
+            if sample:
+                out[mask] = np.vstack(sample)
+            return out
+        return self._rows(columns[feature].dense(dtype=dtype))
+
+    def feature_values(self, which, feature, row):
+        """Decoded values of a feature for the items in one list (row)"""
+        codes, columns = self._side(which)
+        s, l = divmod(row, codes.shape[1])
+        column = columns[feature]
+        vals = column.decode((s, l))
+        return vals[column.mask[s, l]]
+
+    def cell(self, which, s, l, k):
+        """Returns the dict representation of a single item"""
+        codes, columns = self._side(which)
+        code = codes[s, l, k]
+        cell = {'item': self.vocab[code] if code >= 0 else np.nan}
+        for name, column in columns.items():
+            if column.mask[s, l, k]:
+                cell[name] = column.decode((s, l, k))[()]
+        return cell
+
+    def item_frame(self, which='pres'):
+        """DataFrame of items, indexed by (Subject, List)"""
+        return pd.DataFrame(self._rows(self.items(which)), index=self.index())
+
+    def feature_frame(self, which='pres', features=None):
+        """
+        DataFrame of feature dicts, indexed by (Subject, List).  If features
+        is None, all features are included.
+        """
+        codes, columns = self._side(which)
+        names = [f for f in (columns if features is None else features) if f in columns]
+        decoded = [self._rows(columns[f].decode()) for f in names]
+        masks = [self._rows(columns[f].mask) for f in names]
+        rows = np.empty(self._rows(codes).shape, dtype=object)
+        for i, j in np.ndindex(*rows.shape):
+            rows[i, j] = {f: d[i, j] for f, d, m in zip(names, decoded, masks) if m[i, j]}
+        return pd.DataFrame(rows, index=self.index())
+
+    def to_frame(self, which='pres'):
+        """
+        DataFrame of item dicts (the legacy `Egg.pres`/`Egg.rec` layout)
+        """
+        frame = self.feature_frame(which)
+        items = self._rows(self.items(which))
+        values = frame.to_numpy()
+        for i, j in np.ndindex(*values.shape):
+            cell = {'item': items[i, j]}
+            cell.update(values[i, j])
+            values[i, j] = cell
+        return pd.DataFrame(values, index=self.index())
+
+    def to_dict(self):
+        """Serializable dict of the underlying arrays"""
+        return {
+            'vocab': self.vocab,
+            'pres_codes': self.pres_codes,
+            'rec_codes': self.rec_codes,
+            'rec_pos': self.rec_pos,
+            'pres_features': {k: v.to_dict() for k, v in self.pres_features.items()},
+            'rec_features': {k: v.to_dict() for k, v in self.rec_features.items()},
+            'subjects': self.subjects,
+            'lists': self.lists,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['vocab'], d['pres_codes'], d['rec_codes'],
+                   {k: FeatureColumn.from_dict(v) for k, v in d['pres_features'].items()},
+                   {k: FeatureColumn.from_dict(v) for k, v in d['rec_features'].items()},
+                   subjects=d['subjects'], lists=d['lists'],
+                   rec_pos=d.get('rec_pos'))
+
+    def save(self, path, header=None):
+        """
+        Writes the arrays to a directory
+
+        Each array is stored as a .npy file, so that it can be memory-mapped
+        when loaded.  The directory also holds a JSON header (format version,
+        shape, features and the `header` fields).  Header values that can't
+        be written as JSON (e.g. custom distance functions) are pickled to a
+        separate file.
+
+        Parameters
+        ----------
+        path : str
+            Directory to write.  An existing columnar egg directory is
+            replaced.
+
+        header : dict (optional)
+            Extra fields to store (e.g. meta, dist_funcs and groupings)
+
+        """
+        arrays = {name: getattr(self, name) for name in
+                  ['vocab', 'pres_codes', 'rec_codes', 'rec_pos', 'subjects', 'lists']}
+        features = {}
+        for which in ['pres', 'rec']:
+            features[which] = []
+            for i, (name, column) in enumerate(self._side(which)[1].items()):
+                prefix = '%s_feature_%d_' % (which, i)
+                entry = {'name': name, 'kind': column.kind,
+                         'data': prefix + 'data', 'mask': prefix + 'mask'}
+                arrays[prefix + 'data'] = column.data
+                arrays[prefix + 'mask'] = column.mask
+                if column.categories is not None:
+                    entry['categories'] = prefix + 'categories'
+                    arrays[prefix + 'categories'] = column.categories
+                features[which].append(entry)
+
+        write_directory(path, arrays, header=header, shape=list(self.shape),
+                        features=features)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Loads arrays written by `EggArrays.save`
+
+        Parameters
+        ----------
+        path : str
+            Directory written by `EggArrays.save`
+
+        mmap_mode : str or None
+            Memory-map mode of the numeric arrays (see numpy.load).  With the
+            default ('r') data is only read from disk when it is accessed.
+            Object arrays (vocabulary, labels, object features) are always
+            read in full.
+
+        Returns
+        ----------
+        arrays : EggArrays
+            The loaded arrays
+
+        header : dict
+            The extra fields passed to `EggArrays.save`
+
+        """
+        info, arrays, header = read_directory(path, mmap_mode=mmap_mode)
+        features = {}
+        for which in ['pres', 'rec']:
+            features[which] = {}
+            for entry in info['features'][which]:
+                categories = arrays[entry['categories']] if 'categories' in entry else None
+                features[which][entry['name']] = FeatureColumn(
+                    entry['kind'], arrays[entry['data']], arrays[entry['mask']], categories)
+
+        return cls(arrays['vocab'], arrays['pres_codes'], arrays['rec_codes'],
+                   features['pres'], features['rec'], subjects=arrays['subjects'],
+                   lists=arrays['lists'], rec_pos=arrays['rec_pos']), header
+
+
+def write_directory(path, arrays, header=None, format=FORMAT_NAME,
+                    version=FORMAT_VERSION, **info):
+    """
+    Writes named arrays to a directory, one .npy file each, plus a JSON header
+
+    Header values that can't be written as JSON (e.g. custom distance
+    functions) are pickled to a separate file.
+
+    Parameters
+    ----------
+    path : str
+        Directory to write.  An existing directory of the same format is
+        replaced.
+
+    arrays : dict
+        Maps names to the arrays to write
+
+    header : dict (optional)
+        Extra fields to store (e.g. meta, dist_funcs and groupings)
+
+    format, version : str, int
+        Format name and version written to the header
+
+    **info
+        Other (JSON serializable) entries of the header
+
+    """
+    fields, extras = {}, {}
+    for key, value in (header or {}).items():
+        # values that don't survive a JSON round trip are pickled
+        try:
+            encoded = json.loads(json.dumps(value, default=_json_default))
+            same = bool(encoded == value)
+        except (TypeError, ValueError):
+            same = False
+        if same:
+            fields[key] = encoded
+        else:
+            extras[key] = value
+    extras_bytes = pickle.dumps(extras) if extras else None
+
+    # the header is encoded before anything is written, so that a header
+    # that can't be saved doesn't leave a partial directory behind
+    content = {'format': format, 'version': version,
+               'arrays': {name: name for name in arrays}}
+    content.update(info)
+    content.update({'fields': fields, 'extras': sorted(extras)})
+    content = json.dumps(content, indent=1, default=_json_default)
+
+    if os.path.exists(path):
+        if not os.path.isfile(os.path.join(path, _HEADER)):
+            raise ValueError('Cannot overwrite ' + str(path) +
+                             ': not a columnar egg directory.')
+        shutil.rmtree(path)
+    os.makedirs(path)
+    if extras_bytes is not None:
+        with open(os.path.join(path, _EXTRAS), 'wb') as f:
+            f.write(extras_bytes)
+
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        np.save(os.path.join(path, name + '.npy'), arr,
+                allow_pickle=arr.dtype == object)
+
+    with open(os.path.join(path, _HEADER), 'w') as f:
+        f.write(content)
+
+
+def read_directory(path, mmap_mode='r', format=FORMAT_NAME,
+                   version=FORMAT_VERSION):
+    """
+    Reads a directory written by `write_directory`
+
+    Returns the JSON header, a dict of the .npy arrays of the directory
+    (numeric arrays are memory-mapped with the given mmap_mode, object arrays
+    are read in full) and the extra header fields.
+    """
+    info = read_header(path, format=format, version=version)
+
+    def read(name):
+        fname = os.path.join(path, name + '.npy')
+        try:
+            return np.load(fname, mmap_mode=mmap_mode)
+        except ValueError:
+            # object arrays can't be memory-mapped
+            return np.load(fname, allow_pickle=True)
+
+    arrays = {name[:-4]: read(name[:-4]) for name in sorted(os.listdir(path))
+              if name.endswith('.npy')}
+    header = dict(info['fields'])
+    if info['extras']:
+        with open(os.path.join(path, _EXTRAS), 'rb') as f:
+            header.update(pickle.load(f))
+    return info, arrays, header
+
+
+def read_header(path, format=FORMAT_NAME, version=FORMAT_VERSION):
+    """
+    Reads and checks the JSON header of a columnar egg directory
+    """
+    with open(os.path.join(path, _HEADER)) as f:
+        info = json.load(f)
+    if info.get('format') != format:
+        raise ValueError(str(path) + ' is not a ' + format + ' directory.')
+    if info.get('version', 0) > version:
+        raise ValueError('Format %s version %s is not supported by this '
+                         'version of quail (max %d).'
+                         % (format, info.get('version'), version))
+    return info
+
+
+def _json_default(x):
+    """Converts NumPy scalars/arrays for json.dumps"""
+    if isinstance(x, (np.generic, np.ndarray)):
+        return x.tolist()
+    raise TypeError(repr(x) + ' is not JSON serializable')
+
+
+class _Vocab(object):
+    """Interns items into consecutive integer codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.items = []
+
+    def code(self, item):
+        key = _intern_key(item)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.items)
+            self.items.append(item)
+        return code
+
+    def array(self):
+        out = np.empty(len(self.items), dtype=object)
+        out[:] = self.items if self.items else []
+        return out
+
+
+def _column(values, present):
+    """
+    Typed column of a feature given as an array of the shape of the items
+    (with a trailing dimension for vector features)
+    """
+    if values.dtype.kind in 'biuf':
+        kind = 'numeric' if values.ndim == present.ndim else 'vector'
+        return FeatureColumn(kind, values, present.copy())
+    mask = present & ~pd.isnull(values)
+    if (values.dtype.kind in 'US' or
+            pd.api.types.infer_dtype(values[mask], skipna=True) == 'string'):
+        codes, categories = pd.factorize(values[mask])
+        data = np.full(present.shape, -1, dtype=np.int32)
+        data[mask] = codes
+        return FeatureColumn('categorical', data, mask,
+                             np.asarray(categories, dtype=object))
+    return FeatureColumn.from_values(present.shape, np.flatnonzero(mask),
+                                     list(values[mask]))
+
+
+def _pad(arr, shape, fill):
+    """
+    Pads the list and item dimensions of a (subjects, lists, items, ...)
+    array to shape
+    """
+    if arr.shape[1:3] == tuple(shape):
+        return arr
+    out = np.full((arr.shape[0],) + tuple(shape) + arr.shape[3:], fill, dtype=arr.dtype)
+    out[:, :arr.shape[1], :arr.shape[2]] = arr
+    return out
+
+
+def _concat_features(columns, shapes):
+    """
+    Stacks the feature columns of several eggs (dicts of FeatureColumn, one
+    per egg), given the padded shapes of their items
+    """
+    names = []
+    for cols in columns:
+        names.extend(name for name in cols if name not in names)
+
+    out = {}
+    for name in names:
+        cols = [c.get(name) for c in columns]
+        present = [c for c in cols if c is not None]
+        kinds = set(c.kind for c in present)
+        dims = set(c.data.shape[3:] for c in present)
+        masks = [_pad(c.mask, shape[1:], False) if c is not None else
+                 np.zeros(shape, dtype=bool) for c, shape in zip(cols, shapes)]
+        mask = np.concatenate(masks)
+        kind = kinds.pop() if len(kinds) == 1 else None
+
+        if kind == 'categorical':
+            categories = _Vocab()
+            data = []
+            for c, shape in zip(cols, shapes):
+                if c is None:
+                    data.append(np.full(shape, -1, dtype=np.int32))
+                    continue
+                remap = np.array([categories.code(v) for v in c.categories] + [-1],
+                                 dtype=np.int32)
+                data.append(_pad(remap[c.data], shape[1:], -1))
+            out[name] = FeatureColumn(kind, np.concatenate(data), mask,
+                                      categories.array())
+        elif kind in ['numeric', 'vector'] and len(dims) == 1:
+            dtype = np.result_type(*[c.data.dtype for c in present])
+            trailing = dims.pop()
+            data = [_pad(c.data.astype(dtype, copy=False), shape[1:], 0)
+                    if c is not None else np.zeros(shape + trailing, dtype=dtype)
+                    for c, shape in zip(cols, shapes)]
+            out[name] = FeatureColumn(kind, np.concatenate(data), mask)
+        else:
+            # object features, or kinds differing between eggs
+            values = np.concatenate([
+                _pad(c.decode(), shape[1:], None) if c is not None else
+                np.full(shape, None, dtype=object) for c, shape in zip(cols, shapes)])
+            out[name] = FeatureColumn.from_values(
+                mask.shape, np.flatnonzero(mask), list(values[mask]))
+    return out
+
+
+def _temporal(present):
+    """The Temporal feature: the position of each item in its list"""
+    data = np.broadcast_to(np.arange(present.shape[2], dtype=np.int64),
+                           present.shape).copy()
+    return FeatureColumn('numeric', data, present.copy())
+
+
+def _encode(data, vocab, features=None, compact=False, n_lists=None):
+    """
+    Interns the items of a nested list into `vocab` and collects features
+
+    Items with missing labels are skipped when `compact` is True (recalls), so
+    that recalled items are always left-aligned.
+    """
+    n_subjects = len(data)
+    n_lists = max([len(sub) for sub in data] + [n_lists or 0])
+    rows = [[[] for _ in range(n_lists)] for _ in range(n_subjects)]
+    feats = {}
+    order = []
+    for s, sub in enumerate(data):
+        for l, lst in enumerate(sub):
+            kept = rows[s][l]
+            flist = features[s][l] if features is not None and len(features[s]) > l else None
+            for k, cell in enumerate(lst):
+                if isinstance(cell, dict):
+                    item = cell.get('item', k)
+                    extra = cell
+                else:
+                    item, extra = cell, None
+                if flist is not None and k < len(flist) and flist[k]:
+                    extra = dict(extra or {})
+                    extra.update(flist[k])
+                if not isinstance(item, (list, tuple, np.ndarray)) and _is_missing(item):
+                    if compact:
+                        continue
+                    kept.append((None, extra))
+                    continue
+                kept.append((item, extra))
+
+    width = max([len(l) for sub in rows for l in sub] + [0])
+    shape = (n_subjects, n_lists, width)
+    codes = np.full(shape, -1, dtype=np.int32)
+    add_temporal = None
+    for s in range(n_subjects):
+        for l in range(n_lists):
+            for k, (item, extra) in enumerate(rows[s][l]):
+                flat = (s * n_lists + l) * width + k
+                if item is not None:
+                    codes[s, l, k] = vocab.code(item)
+                if add_temporal is None:
+                    add_temporal = not (extra and 'Temporal' in extra)
+                if extra:
+                    for name, value in extra.items():
+                        if name == 'item':
+                            continue
+                        if name not in feats:
+                            feats[name] = ([], [])
+                            order.append(name)
+                        feats[name][0].append(flat)
+                        feats[name][1].append(value)
+                if add_temporal and item is not None:
+                    if 'Temporal' not in feats:
+                        feats['Temporal'] = ([], [])
+                        order.append('Temporal')
+                    feats['Temporal'][0].append(flat)
+                    feats['Temporal'][1].append(k)
+
+    columns = {}
+    for name in order:
+        positions, values = feats[name]
+        columns[name] = FeatureColumn.from_values(shape, np.asarray(positions, dtype=np.int64), values)
+    return codes, columns
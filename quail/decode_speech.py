@@ -9,13 +9,6 @@ import time
 import warnings
 import pandas as pd
 
-# optional imports for speech decoding
-try:
-    import whisper
-    HAS_WHISPER = True
-except ImportError:
-    HAS_WHISPER = False
-
 
 def decode_speech(path, model_size='base', save=False, return_raw=False, **kwargs):
     """
@@ -46,7 +39,10 @@ def decode_speech(path, model_size='base', save=False, return_raw=False, **kwarg
         The results of the speech decoding.
     """
     
-    if not HAS_WHISPER:
+    # whisper pulls in torch, so it is only imported when decoding
+    try:
+        import whisper
+    except ImportError:
         raise ImportError("openai-whisper not installed. pip install openai-whisper")
 
     # Load model
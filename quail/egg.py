@@ -4,15 +4,19 @@ from builtins import str
 from builtins import object
 import pickle
 import time
-import joblib
 import inspect
 import warnings
 import pandas as pd
 import numpy as np
-from .analysis.recmat import recall_matrix
+from .analysis.recmat import recall_matrix, RecallMatrixCache
+from .analysis.diststore import distance_store
+from .analysis import executor
 from .analysis.analysis import analyze
-from .plot import plot
-from .helpers import list2pd, default_dist_funcs, crack_egg, fill_missing, merge_pres_feats, df2list
+from .helpers import list2pd, default_dist_funcs, crack_egg, stack_eggs, fill_missing, merge_pres_feats, df2list, get_index_levels, _crack_opts, _label_positions, _stack_meta
+from .columnar import EggArrays, write_directory
+
+# on-disk directory format of FriedEgg results
+FRIED_FORMAT_NAME = 'quail-columnar-fegg'
 
 class Egg(object):
     """
@@ -87,6 +91,14 @@ class Egg(object):
         matrix (optional).  If list_length is not passed, the length of the
         presented lists is assumed to be the length of the first list passed.
 
+    backend : str
+        Storage engine for the data. 'pandas' (default) stores pres and rec as
+        DataFrames of dicts. 'columnar' stores interned item codes, recall
+        positions and typed per-feature NumPy arrays (see
+        `quail.columnar.EggArrays`), which uses far less memory for large
+        datasets. With the columnar backend, the pres and rec DataFrames are
+        only built if they are accessed.
+
     Attributes
     ----------
 
@@ -127,7 +139,15 @@ class Egg(object):
     def __init__(self, pres=None, rec=None, features=None, dist_funcs=None,
                  meta=None, subjgroup=None, subjname='Subject', listgroup=None,
                  listname='List', date_created=None, recmat=None,
-                 list_length=None):
+                 list_length=None, backend='pandas'):
+
+        if backend not in ['pandas', 'columnar']:
+            raise ValueError("backend must be 'pandas' or 'columnar'")
+        self.backend = backend
+        self._arrays = None
+        self._pres = None
+        self._rec = None
+        self.recmat_cache = RecallMatrixCache()
 
         # handle if recmat is passed
         if recmat is not None:
@@ -154,16 +174,22 @@ class Egg(object):
                 self.dist_funcs = dist_funcs or {}
 
             # Assign directly
-            self.pres = pres.map(lambda x: {'item': np.nan} if pd.isnull(x) else x)
-            self.rec = rec.map(lambda x: {'item': np.nan} if pd.isnull(x) else x)
-            self.feature_names = list(self.get_pres_features()[0][0][0]) if len(pres) > 0 else []
+            if backend == 'columnar':
+                self._arrays = EggArrays.from_frames(pres, rec)
+            else:
+                self.pres = pres.map(lambda x: {'item': np.nan} if pd.isnull(x) else x)
+                self.rec = rec.map(lambda x: {'item': np.nan} if pd.isnull(x) else x)
+            if self._arrays is not None:
+                self.feature_names = [k for k in self._arrays.feature_names if k in self.dist_funcs]
+            else:
+                self.feature_names = list(self.get_pres_features()[0][0][0]) if len(pres) > 0 else []
             self.subjgroup = subjgroup
             self.subjname = subjname
             self.listgroup = listgroup
             self.listname = listname
-            self.n_subjects = len(self.pres.index.levels[0].values)
-            self.n_lists = len(self.pres.index.levels[1].values)
-            self.list_length = len(self.pres.columns)
+            self.n_subjects = len(pres.index.levels[0].values)
+            self.n_lists = len(pres.index.levels[1].values)
+            self.list_length = len(pres.columns)
 
             if meta is None:
                 self.meta = {}
@@ -189,6 +215,19 @@ class Egg(object):
         pres = fill_missing(pres)
         rec = fill_missing(rec)
 
+        if backend == 'columnar':
+            # intern items and type features directly, without dict wrapping
+            if features is not None:
+                if not all(isinstance(item, list) for sub in features for item in sub):
+                    features = [features]
+                features = fill_missing(features)
+            self._arrays = EggArrays.from_nested(pres, rec, features=features)
+            self.dist_funcs = default_dist_funcs(dist_funcs, self._arrays.cell('pres', 0, 0, 0))
+            self.feature_names = [k for k in self._arrays.feature_names if k in self.dist_funcs]
+            self._set_attrs(subjgroup, subjname, listgroup, listname, meta,
+                            date_created)
+            return
+
         # if pres is strings, reformat
         if len(pres)>0 and len(pres[0])>0 and len(pres[0][0])>0 and type(pres[0][0][0]) is not dict:
              pres = [[[{'item' : x} for x in y] for y in z] for z in pres]
@@ -229,13 +268,22 @@ class Egg(object):
         self.pres = list2pd(pres).map(lambda x: {'item' : np.nan} if pd.isnull(x) else x)
         self.feature_names = list(self.get_pres_features()[0][0][0])
         self.rec = list2pd(rec).map(lambda x: {'item' : np.nan} if pd.isnull(x) else x)
+        self._set_attrs(subjgroup, subjname, listgroup, listname, meta,
+                        date_created)
+
+    def _set_attrs(self, subjgroup, subjname, listgroup, listname, meta,
+                   date_created):
+        """Attaches grouping, size and meta attributes"""
         self.subjgroup=subjgroup
         self.subjname=subjname
         self.listgroup=listgroup
         self.listname=listname
-        self.n_subjects = len(self.pres.index.levels[0].values)
-        self.n_lists = len(self.pres.index.levels[1].values)
-        self.list_length = len(self.pres.columns)
+        if self._arrays is not None:
+            self.n_subjects, self.n_lists, self.list_length = self._arrays.shape
+        else:
+            self.n_subjects = len(self.pres.index.levels[0].values)
+            self.n_lists = len(self.pres.index.levels[1].values)
+            self.list_length = len(self.pres.columns)
 
         if meta is None:
             self.meta = {}
@@ -247,10 +295,212 @@ class Egg(object):
         else:
             self.date_created = date_created
 
+    @classmethod
+    def _from_columnar(cls, arrays, dist_funcs=None, subjgroup=None,
+                       subjname='Subject', listgroup=None, listname='List',
+                       meta=None, date_created=None):
+        """
+        Creates a columnar egg directly from an EggArrays instance
+        """
+        egg = cls.__new__(cls)
+        egg.backend = 'columnar'
+        egg._arrays = arrays
+        egg._pres = None
+        egg._rec = None
+        egg.recmat_cache = RecallMatrixCache()
+        egg.dist_funcs = default_dist_funcs(dist_funcs, arrays.cell('pres', 0, 0, 0))
+        egg.feature_names = [k for k in arrays.feature_names if k in egg.dist_funcs]
+        egg._set_attrs(subjgroup, subjname, listgroup, listname, meta,
+                       date_created)
+        return egg
+
+    @classmethod
+    def _from_frames(cls, pres, rec, dist_funcs=None, **kwargs):
+        """
+        Creates a pandas egg directly from pres/rec DataFrames of item dicts
+        (missing items already filled in), without checking every cell
+        """
+        egg = cls.__new__(cls)
+        egg.backend = 'pandas'
+        egg._arrays = None
+        egg._pres = pres
+        egg._rec = rec
+        egg.recmat_cache = RecallMatrixCache()
+        egg.dist_funcs = default_dist_funcs(dist_funcs, pres.iloc[0, 0])
+        egg.feature_names = [k for k in pres.iloc[0, 0] if k in egg.dist_funcs]
+        egg._set_attrs(kwargs.get('subjgroup'), kwargs.get('subjname', 'Subject'),
+                       kwargs.get('listgroup'), kwargs.get('listname', 'List'),
+                       kwargs.get('meta'), kwargs.get('date_created'))
+        return egg
+
+    @classmethod
+    def from_arrays(cls, pres, rec, features=None, dist_funcs=None,
+                    subjects=None, lists=None, validate=True,
+                    backend='columnar', **kwargs):
+        """
+        Creates an egg from arrays of items in one vectorized pass
+
+        This is much faster than the default constructor for large datasets,
+        which checks and wraps every item in a dict.
+
+        Parameters
+        ----------
+        pres : array-like
+            (subjects x lists x items) array of presented items (hashable
+            scalars such as strings or numbers), None or NaN for missing
+            cells.  A 2D array is a single subject.
+
+        rec : array-like
+            (subjects x lists x recalls) array of recalled items, same format
+            as pres
+
+        features : dict (optional)
+            Maps feature names to arrays of the shape of pres (with one more
+            dimension for vector features)
+
+        dist_funcs : dict (optional)
+            Distance functions of the features (see Egg)
+
+        subjects, lists : array-like (optional)
+            Subject and list labels
+
+        validate : bool
+            If True (default), the shapes of the arrays and the feature names
+            are checked and the recalls are left-aligned.  Pass False to skip
+            these passes for input known to be consistent.
+
+        backend : str
+            'columnar' (default) or 'pandas' (built from the columnar data)
+
+        **kwargs
+            Other Egg arguments (meta, subjgroup, subjname, listgroup,
+            listname, date_created)
+
+        Returns
+        ----------
+        egg : quail.Egg
+            The egg
+        """
+        arrays = EggArrays.from_arrays(pres, rec, features=features,
+                                       subjects=subjects, lists=lists,
+                                       validate=validate)
+        return cls._from_arrays(arrays, dist_funcs, backend, **kwargs)
+
+    @classmethod
+    def from_long_dataframe(cls, df, subjname='Subject', listname='List',
+                            phase='Phase', item='item', position=None,
+                            features=None, dist_funcs=None, validate=True,
+                            backend='columnar', **kwargs):
+        """
+        Creates an egg from a long (tidy) table with one row per presented or
+        recalled item
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The data
+
+        subjname, listname : str
+            Columns with the subject and list labels (also used as the
+            names of the subject and list grouping variables)
+
+        phase : str
+            Column with 'pres' for presented items and 'rec' for recalled
+            items
+
+        item : str
+            Column with the items
+
+        position : str or None
+            Column with the (0-based) position of each item in its list, or in
+            its recall sequence.  If None, rows are taken in the order of the
+            table.
+
+        features : list or None
+            Columns with features of the presented items (default: all other
+            columns)
+
+        dist_funcs, validate, backend, **kwargs
+            See Egg.from_arrays
+
+        Returns
+        ----------
+        egg : quail.Egg
+            The egg
+        """
+        arrays = EggArrays.from_long(df, subjname=subjname, listname=listname,
+                                     phase=phase, item=item, position=position,
+                                     features=features, validate=validate)
+        kwargs.update({'subjname' : subjname, 'listname' : listname})
+        return cls._from_arrays(arrays, dist_funcs, backend, **kwargs)
+
+    @classmethod
+    def _from_arrays(cls, arrays, dist_funcs, backend, **kwargs):
+        """Egg of an EggArrays instance, with either backend"""
+        if backend not in ['pandas', 'columnar']:
+            raise ValueError("backend must be 'pandas' or 'columnar'")
+        egg = cls._from_columnar(arrays, dist_funcs, **kwargs)
+        if backend == 'pandas':
+            egg._pres = arrays.to_frame('pres')
+            egg._rec = arrays.to_frame('rec')
+            egg._arrays = None
+            egg.backend = 'pandas'
+        return egg
+
+    def __setstate__(self, state):
+        # eggs pickled by older versions stored pres/rec as plain attributes
+        for key in ['pres', 'rec']:
+            if key in state:
+                state['_' + key] = state.pop(key)
+        state.setdefault('_arrays', None)
+        state.setdefault('backend', 'pandas')
+        state.setdefault('recmat_cache', RecallMatrixCache())
+        self.__dict__.update(state)
+
+    @property
+    def pres(self):
+        """DataFrame of presented items (built on access for columnar eggs)"""
+        if self._pres is None and self._arrays is not None:
+            self._pres = self._arrays.to_frame('pres')
+        return self._pres
+
+    @pres.setter
+    def pres(self, value):
+        if self._arrays is not None:
+            self._arrays = EggArrays.from_frames(value, self.rec)
+        self._pres = value
+        self.clear_recall_cache()
+        distance_store.discard(self)
+
+    @property
+    def rec(self):
+        """DataFrame of recalled items (built on access for columnar eggs)"""
+        if self._rec is None and self._arrays is not None:
+            self._rec = self._arrays.to_frame('rec')
+        return self._rec
+
+    @rec.setter
+    def rec(self, value):
+        if self._arrays is not None:
+            self._arrays = EggArrays.from_frames(self.pres, value)
+        self._rec = value
+        self.clear_recall_cache()
+        distance_store.discard(self)
+
+    @property
+    def arrays(self):
+        """
+        The columnar storage of the egg (an EggArrays instance), or None for
+        eggs using the pandas backend
+        """
+        return self._arrays
+
     def get_pres_items(self):
         """
         Returns a df of presented items
         """
+        if self._arrays is not None:
+            return self._arrays.item_frame('pres')
         return self.pres.map(lambda x: x['item'])
 
     def get_pres_features(self, features=None):
@@ -261,12 +511,16 @@ class Egg(object):
             features = self.dist_funcs.keys()
         elif not isinstance(features, list):
             features = [features]
+        if self._arrays is not None:
+            return self._arrays.feature_frame('pres', list(features))
         return self.pres.map(lambda x: {k:v for k,v in x.items() if k in features} if x is not None else None)
 
     def get_rec_items(self):
         """
         Returns a df of recalled items
         """
+        if self._arrays is not None:
+            return self._arrays.item_frame('rec')
         return self.rec.map(lambda x: x['item'] if x is not None else x)
 
     def get_rec_features(self, features=None):
@@ -277,9 +531,60 @@ class Egg(object):
             features = self.dist_funcs.keys()
         elif not isinstance(features, list):
             features = [features]
+        if self._arrays is not None:
+            return self._arrays.feature_frame('rec')
         return self.rec.map(lambda x: {k:v for k,v in x.items() if k != 'item'} if x is not None else None)
 
 
+    def get_recall_matrix(self, match='exact', distance='euclidean',
+                          features=None):
+        """
+        Returns the (cached) recall matrix of the egg
+
+        Recall matrices are memoized per (match, distance, features), so
+        running several analyses on the same egg only matches presented and
+        recalled items once.  The cache is cleared when pres or rec are
+        reassigned; call clear_recall_cache after modifying them in place
+        (this also drops the copy of the egg shared with worker processes).
+
+        Parameters
+        ----------
+        match : str (exact, best or smooth)
+            Matching approach to compute recall matrix (see
+            quail.analysis.recmat.recall_matrix)
+
+        distance : str
+            The distance function used to compare presented and recalled items
+            (best and smooth matching only)
+
+        features : str or list
+            Features used to compare items (best and smooth matching only)
+
+        Returns
+        ----------
+        recmat : np.ndarray
+            Read-only recall matrix
+        """
+        return recall_matrix(self, match=match, distance=distance,
+                             features=features)
+
+    def recall_cache_info(self):
+        """
+        Returns the keys, size in bytes, size limit and hit/miss counts of the
+        recall matrix cache
+        """
+        return self.recmat_cache.info()
+
+    def clear_recall_cache(self):
+        """
+        Drops all cached recall matrices, and the copy of the egg shared with
+        worker processes
+        """
+        cache = getattr(self, 'recmat_cache', None)
+        if cache is not None:
+            cache.clear()
+        executor.discard(self)
+
     def info(self):
         """
         Print info about the data egg
@@ -290,12 +595,15 @@ class Egg(object):
         print('Date created: ' + str(self.date_created))
         print('Meta data: ' + str(self.meta))
 
-    def save(self, fname, compression='zlib'):
+    def save(self, fname, compression='zlib', format='joblib'):
         """
         Save method for the Egg object
 
-        The data will be saved as a 'egg' file, which is a dictionary containing
-        the elements of a Egg saved using `joblib`.
+        By default, the data will be saved as a 'egg' file, which is a
+        dictionary containing the elements of a Egg saved using `joblib`.  With
+        format='columnar', the egg is saved as a directory of NumPy arrays
+        (item codes, recall positions and features) plus a JSON header, which
+        `quail.load` memory-maps instead of unpickling.
 
         Parameters
         ----------
@@ -306,13 +614,17 @@ class Egg(object):
 
         compression : str
             options: https://joblib.readthedocs.io/en/latest/generated/joblib.dump.html
+            (joblib format only)
+
+        format : str
+            'joblib' (default) or 'columnar'
 
         """
 
-        # put egg vars into a dict
-        egg = {
-            'pres' : df2list(self.pres),
-            'rec' : df2list(self.rec),
+        if format not in ['joblib', 'columnar']:
+            raise ValueError("Format must be 'joblib' or 'columnar'.")
+
+        header = {
             'dist_funcs' : self.dist_funcs,
             'subjgroup' : self.subjgroup,
             'subjname' : self.subjname,
@@ -326,7 +638,25 @@ class Egg(object):
         if fname[-4:]!='.egg':
             fname+='.egg'
 
+        if format == 'columnar':
+            arrays = self.arrays
+            if arrays is None:
+                arrays = EggArrays.from_frames(self.pres, self.rec)
+            arrays.save(fname, header=header)
+            return
+
+        # put egg vars into a dict
+        if self._arrays is not None:
+            egg = {'columnar' : self._arrays.to_dict()}
+        else:
+            egg = {
+                'pres' : df2list(self.pres),
+                'rec' : df2list(self.rec),
+            }
+        egg.update(header)
+
         # save
+        import joblib
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             joblib.dump(egg, fname, compress=compression)
@@ -350,6 +680,28 @@ class Egg(object):
         """
         return crack_egg(self, subjects, lists)
 
+    def view(self, subjects=None, lists=None):
+        """
+        Returns a lightweight, read-only view of a subset of the subjects/lists
+
+        Unlike crack, no new egg is built: the view slices the parent's data
+        on access and shares its cached recall matrices.
+
+        Parameters
+        ----------
+        subjects : list
+            List of subject idxs
+
+        lists : list
+            List of lists idxs
+
+        Returns
+        ----------
+        view : EggView
+            View over the selected subjects and lists
+        """
+        return EggView(self, subjects, lists)
+
     def to_dict(self):
         egg_dict = {
             'pres' : self.pres.to_dict(orient='records'),
@@ -370,6 +722,238 @@ class Egg(object):
         """
         return analyze(self, analysis=analysis, **kwargs)
 
+class EggView(Egg):
+    """
+    Read-only view of a subset of the subjects and lists of an egg
+
+    A view exposes the same accessors as an Egg (pres, rec, arrays, get_*,
+    analyze, crack...) but does not copy or rebuild the parent's data: the
+    presented/recalled items are sliced from the parent on first access and
+    recall matrices cached on the parent are shared.  Use crack to get an
+    independent (modifiable) egg instead.
+
+    Parameters
+    ----------
+    egg : quail.Egg
+        Parent egg
+
+    subjects : list
+        List of subject idxs (default: all subjects)
+
+    lists : list
+        List of lists idxs (default: all lists)
+
+    """
+
+    def __init__(self, egg, subjects=None, lists=None):
+        all_subjects, all_lists = [l.tolist() for l in get_index_levels(egg)]
+        if subjects is None:
+            subjects = all_subjects
+        elif type(subjects) is not list:
+            subjects = [subjects]
+        if lists is None:
+            lists = all_lists
+        elif type(lists) is not list:
+            lists = [lists]
+
+        self.parent = egg
+        self.backend = egg.backend
+        self._subj_pos = _label_positions(all_subjects, subjects, 'Subject')
+        self._list_pos = _label_positions(all_lists, lists, 'List')
+        if egg.arrays is not None:
+            self.rows = (self._subj_pos[:, None] * len(all_lists) +
+                         self._list_pos).ravel()
+        else:
+            rows = egg.pres.index.get_indexer(
+                pd.MultiIndex.from_product([subjects, lists]))
+            self.rows = rows[rows >= 0]
+        self._arrays = None
+        self._pres = None
+        self._rec = None
+        self._recmat_cache = None
+
+        opts = _crack_opts(egg, self._subj_pos, self._list_pos)
+        self.dist_funcs = egg.dist_funcs
+        self.feature_names = egg.feature_names
+        self.subjgroup = opts.get('subjgroup')
+        self.subjname = opts.get('subjname', 'Subject')
+        self.listgroup = opts.get('listgroup')
+        self.listname = opts.get('listname', 'List')
+        self.meta = egg.meta
+        self.date_created = egg.date_created
+        self.n_subjects = len(subjects)
+        self.n_lists = len(lists)
+        self.list_length = egg.list_length
+
+    def _take(self, frame):
+        frame = frame.iloc[self.rows]
+        frame.index = frame.index.remove_unused_levels()
+        return frame
+
+    @property
+    def pres(self):
+        """DataFrame of presented items of the view (read-only)"""
+        if self._pres is None:
+            if self.arrays is not None and self.parent._pres is None:
+                self._pres = self.arrays.to_frame('pres')
+            else:
+                self._pres = self._take(self.parent.pres)
+        return self._pres
+
+    @property
+    def rec(self):
+        """DataFrame of recalled items of the view (read-only)"""
+        if self._rec is None:
+            if self.arrays is not None and self.parent._rec is None:
+                self._rec = self.arrays.to_frame('rec')
+            else:
+                self._rec = self._take(self.parent.rec)
+        return self._rec
+
+    @property
+    def arrays(self):
+        """Columnar storage of the view, or None for pandas eggs"""
+        if self._arrays is None and self.parent.arrays is not None:
+            self._arrays = self.parent.arrays.take(self._subj_pos, self._list_pos)
+        return self._arrays
+
+    @property
+    def recmat_cache(self):
+        """Recall matrix cache, seeded with the rows cached on the parent"""
+        if self._recmat_cache is None:
+            self._recmat_cache = self.parent.recmat_cache.take(self.rows)
+        return self._recmat_cache
+
+class EggCollection(object):
+    """
+    Lazy collection of eggs, analyzed, cracked and saved as one egg
+
+    The eggs are not copied or stacked: analyses stream over them one at a
+    time (see quail.analyze), with subjects numbered across the eggs and
+    eggs with fewer lists padded with empty lists, as in stack_eggs.  Use
+    stack to build the stacked egg.
+
+    Parameters
+    ----------
+    eggs : list of quail.Egg
+        The eggs of the collection
+
+    meta : str
+        How the meta data of the eggs combine, 'concatenate' (default) or
+        'separate' (see stack_eggs)
+
+    subjgroup : list of strings or ints (optional)
+        Grouping of the subjects of all the eggs
+
+    Attributes
+    ----------
+    n_subjects : int
+        Number of subjects of all the eggs
+
+    n_lists : int
+        Largest number of lists per subject
+
+    list_length : int
+        Largest list length
+
+    """
+
+    def __init__(self, eggs, meta='concatenate', subjgroup=None):
+        self.eggs = list(eggs)
+        if not self.eggs:
+            raise ValueError('An EggCollection needs at least one egg.')
+        self._combine = meta
+        self.meta = _stack_meta(self.eggs, meta)
+        self.subjgroup = subjgroup
+        self.dist_funcs = self.eggs[0].dist_funcs
+        self.feature_names = self.eggs[0].feature_names
+        self.n_subjects = sum(egg.n_subjects for egg in self.eggs)
+        self.n_lists = max(egg.n_lists for egg in self.eggs)
+        self.list_length = max(egg.list_length for egg in self.eggs)
+
+    def __iter__(self):
+        return iter(self.eggs)
+
+    def __len__(self):
+        return len(self.eggs)
+
+    def info(self):
+        """
+        Print info about the collection
+        """
+        print('Number of eggs: ' + str(len(self.eggs)))
+        print('Number of subjects: ' + str(self.n_subjects))
+        print('Number of lists per subject: ' + str(self.n_lists))
+        print('Number of words per list: ' + str(self.list_length))
+        print('Meta data: ' + str(self.meta))
+
+    def analyze(self, analysis=None, **kwargs):
+        """
+        Calls analyze function, streaming over the eggs
+        """
+        return analyze(self, analysis=analysis, **kwargs)
+
+    def crack(self, subjects=None, lists=None):
+        """
+        Returns a collection of a subset of the subjects/lists of the eggs
+
+        Parameters
+        ----------
+        subjects : list
+            Positions of the subjects in the collection (0 to n_subjects - 1,
+            the subject numbers of the stacked egg)
+
+        lists : list
+            Positions of the lists of each subject (the list numbers of the
+            stacked egg)
+
+        Returns
+        ----------
+        collection : EggCollection
+            Collection of the cracked eggs, in the order of the eggs
+        """
+        if subjects is not None and type(subjects) is not list:
+            subjects = [subjects]
+        if lists is not None and type(lists) is not list:
+            lists = [lists]
+        subjects = np.arange(self.n_subjects) if subjects is None else np.asarray(subjects)
+        if ((subjects < 0) | (subjects >= self.n_subjects)).any():
+            raise ValueError('Subjects must be between 0 and ' +
+                             str(self.n_subjects - 1) + '.')
+
+        cracked = []
+        offset = 0
+        for egg in self.eggs:
+            all_subjects, all_lists = get_index_levels(egg)
+            local = np.sort(subjects[(subjects >= offset) &
+                                     (subjects < offset + egg.n_subjects)]) - offset
+            offset += egg.n_subjects
+            if len(local) == 0:
+                continue
+            egg_lists = None if lists is None else \
+                [all_lists[l] for l in lists if l < len(all_lists)]
+            cracked.append(crack_egg(egg, subjects=all_subjects[local].tolist(),
+                                     lists=egg_lists))
+
+        subjgroup = None
+        if self.subjgroup is not None:
+            subjgroup = [self.subjgroup[s] for s in np.sort(subjects)]
+        return EggCollection(cracked, meta=self._combine, subjgroup=subjgroup)
+
+    def stack(self):
+        """
+        Returns the stacked egg (see stack_eggs)
+        """
+        egg = stack_eggs(self.eggs, meta=self._combine)
+        egg.subjgroup = self.subjgroup
+        return egg
+
+    def save(self, fname, compression='zlib', format='joblib'):
+        """
+        Saves the collection as one egg (see Egg.save)
+        """
+        self.stack().save(fname, compression=compression, format=format)
+
 class FriedEgg(object):
     """
     Object containing results of a quail analyses
@@ -412,9 +996,11 @@ class FriedEgg(object):
     """
 
     def __init__(self, data=None, analysis=None, list_length=None, n_lists=None,
-                 n_subjects=None, position=None, date_created=None, meta=None):
+                 n_subjects=None, position=None, date_created=None, meta=None,
+                 tensor=None):
 
-        self.data=data
+        self._data = data
+        self._tensor = tensor
         self.analysis=analysis
         self.list_length=list_length
         self.n_lists=n_lists
@@ -427,7 +1013,106 @@ class FriedEgg(object):
         else:
             self.date_created = date_created
 
+    @classmethod
+    def from_tensor(cls, values, groups, lists, columns=None, present=None,
+                    names=('Subject', 'List'), **kwargs):
+        """
+        Creates a FriedEgg from a dense (groups x lists x results) array
+
+        Parameters
+        ----------
+        values : np.ndarray
+            3D array of results, NaN for (group, list) pairs without results
+
+        groups, lists : array-like
+            Labels of the first two axes (subject and list groups)
+
+        columns : array-like (optional)
+            Labels of the results (default: 0 to values.shape[2] - 1)
+
+        present : np.ndarray (optional)
+            (groups x lists) boolean array, True for the (group, list) pairs
+            that have results (default: all of them)
+
+        names : tuple of str
+            Names of the group and list axes
+
+        **kwargs
+            Other FriedEgg arguments (analysis, list_length, ...)
+
+        Returns
+        ----------
+        fried_egg : quail.FriedEgg
+            The results
+        """
+        values = np.asarray(values)
+        if present is None:
+            present = np.ones(values.shape[:2], dtype=bool)
+        if columns is None:
+            columns = np.arange(values.shape[2])
+        return cls(tensor={'values' : values, 'present' : np.asarray(present),
+                           'groups' : np.asarray(groups), 'lists' : np.asarray(lists),
+                           'columns' : np.asarray(columns), 'names' : list(names)},
+                   **kwargs)
+
+    def __setstate__(self, state):
+        # fried eggs pickled by older versions only stored the DataFrame
+        if 'data' in state:
+            state['_data'] = state.pop('data')
+        state.setdefault('_tensor', None)
+        self.__dict__.update(state)
+
+    @property
+    def data(self):
+        """
+        Results as a DataFrame indexed by (group, list), built from the tensor
+        on first access
+        """
+        if self._data is None and self._tensor is not None:
+            self._data = _tensor_frame(self._tensor)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._tensor = None
+
+    @property
+    def tensor(self):
+        """
+        Dict of the dense results: values (groups x lists x results), present
+        (groups x lists), groups, lists, columns (labels) and names (of the
+        group and list axes)
+        """
+        if self._tensor is None:
+            self._tensor = _frame_tensor(self._data)
+        return self._tensor
+
+    def to_numpy(self):
+        """
+        Returns the (groups x lists x results) array of results, without
+        copying it (NaN for pairs without results)
+        """
+        return self.tensor['values']
+
+    def to_xarray(self):
+        """
+        Returns the results as an xarray.DataArray, which shares the
+        underlying array
+        """
+        try:
+            import xarray as xr
+        except ImportError:
+            raise ImportError("xarray not installed. pip install xarray")
+        t = self.tensor
+        return xr.DataArray(t['values'], dims=t['names'] + ['result'],
+                            coords={t['names'][0] : t['groups'],
+                                    t['names'][1] : t['lists'],
+                                    'result' : t['columns']},
+                            name=self.analysis)
+
     def plot(self, **kwargs):
+        from .plot import plot
         return plot(self, **kwargs)
 
     def get_data(self):
@@ -436,12 +1121,14 @@ class FriedEgg(object):
         """
         return self.data.copy()
 
-    def save(self, fname, compression='zlib'):
+    def save(self, fname, compression='zlib', format='joblib'):
         """
         Save method for the FriedEgg object
 
-        The data will be saved as a 'fegg' file, which is a dictionary containing
-        the elements of a FriedEgg saved using `joblib`.
+        By default, the data will be saved as a 'fegg' file, which is a
+        dictionary containing the elements of a FriedEgg saved using `joblib`.
+        With format='columnar', the results are saved as a directory of NumPy
+        arrays plus a JSON header, which `quail.load` memory-maps.
 
         Parameters
         ----------
@@ -451,12 +1138,18 @@ class FriedEgg(object):
             it will be appended.
 
         compression : str
-        options: https://joblib.readthedocs.io/en/latest/generated/joblib.dump.html
+            options: https://joblib.readthedocs.io/en/latest/generated/joblib.dump.html
+            (joblib format only)
+
+        format : str
+            'joblib' (default) or 'columnar'
 
         """
 
+        if format not in ['joblib', 'columnar']:
+            raise ValueError("Format must be 'joblib' or 'columnar'.")
+
         egg = {
-            'data' : self.data,
             'analysis' : self.analysis,
             'list_length' : self.list_length,
             'n_lists' : self.n_lists,
@@ -465,11 +1158,60 @@ class FriedEgg(object):
             'date_created' : self.date_created,
             'meta' : getattr(self, 'meta', None)
         }
-        
+
         # Ensure extension is present
         if not fname.endswith('.fegg'):
             fname += '.fegg'
 
+        if format == 'columnar':
+            t = self.tensor
+            # names go in the header, which pickles what JSON can't hold
+            # (e.g. the bytes subjname of the example data)
+            write_directory(fname, {k : t[k] for k in
+                                    ['values', 'present', 'groups', 'lists', 'columns']},
+                            header=dict(egg, names=list(t['names'])),
+                            format=FRIED_FORMAT_NAME)
+            return
+
+        if self._tensor is not None:
+            egg['tensor'] = self._tensor
+        else:
+            egg['data'] = self._data
+
+        import joblib
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             joblib.dump(egg, fname, compress=compression)
+
+
+def _tensor_frame(tensor):
+    """
+    DataFrame (one row per (group, list) pair with results) of a FriedEgg
+    tensor
+    """
+    present = tensor['present']
+    group_idx, list_idx = np.nonzero(present)
+    index = pd.MultiIndex.from_arrays([tensor['groups'][group_idx],
+                                       tensor['lists'][list_idx]],
+                                      names=tensor['names'])
+    return pd.DataFrame(tensor['values'][present], index=index,
+                        columns=tensor['columns'])
+
+
+def _frame_tensor(data):
+    """
+    FriedEgg tensor of a DataFrame indexed by (group, list)
+    """
+    if not isinstance(data, pd.DataFrame) or data.index.nlevels != 2:
+        raise ValueError('The results are not a DataFrame indexed by '
+                         '(group, list).')
+    index = data.index.remove_unused_levels()
+    group_codes, groups = pd.factorize(index.get_level_values(0))
+    list_codes, lists = pd.factorize(index.get_level_values(1))
+    values = np.full((len(groups), len(lists), data.shape[1]), np.nan)
+    values[group_codes, list_codes] = data.to_numpy(dtype=float)
+    present = np.zeros((len(groups), len(lists)), dtype=bool)
+    present[group_codes, list_codes] = True
+    return {'values' : values, 'present' : present,
+            'groups' : np.asarray(groups), 'lists' : np.asarray(lists),
+            'columns' : np.asarray(data.columns), 'names' : list(index.names)}
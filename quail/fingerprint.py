@@ -4,15 +4,17 @@ from __future__ import print_function
 from builtins import zip
 from builtins import range
 from builtins import object
+import time
+import warnings
 import numpy as np
 from scipy.spatial.distance import cdist
-import warnings
-from joblib import Parallel, delayed
-import multiprocessing
+from collections import deque
 from .egg import Egg
 from .helpers import default_dist_funcs, parse_egg, shuffle_egg
 from .analysis.analysis import _analyze_chunk
 from .analysis.clustering import fingerprint_helper, _get_weights
+from .analysis.diststore import distance_store
+from .analysis.executor import BACKENDS, get_executor, get_n_jobs, run_chunks
 from .distance import dist_funcs as builtin_dist_funcs
 
 class Fingerprint(object):
@@ -24,6 +26,9 @@ class Fingerprint(object):
     What is a 'stimulus feature dimension' you ask? It is simply an attribute of
     the stimulus, such as its color, category, spatial location etc.
 
+    The fingerprint keeps the sum and the number of the clustering scores of
+    each feature, so that updating it only costs the analysis of the new lists.
+
     Parameters
     ----------
 
@@ -39,12 +44,21 @@ class Fingerprint(object):
 
     n : int
         a counter specifying how many lists went into estimating the current
-        fingerprint (initialize to 0)
+        fingerprint (initialize to 0).  A state passed in counts as n lists
+        when it is updated.
 
     permute : bool
         A boolean flag specifying whether to use permutations to compute the
         fingerprint (default: True)
 
+    decay : float or None
+        If set (between 0 and 1), the state is an exponentially weighted
+        average of the updates, with weight decay for the newest one, instead
+        of the average over all lists (default: None)
+
+    history_size : int or None
+        Number of past updates kept in history (default: None, all of them)
+
 
     dist_funcs : dict (optional)
         A dictionary of custom distance functions for stimulus features.  Each
@@ -58,9 +72,26 @@ class Fingerprint(object):
     """
 
     def __init__(self, init=None, features='all', state=None, n=0,
-                 permute=False, nperms=1000, parallel=False):
-
-        self.history = []
+                 permute=False, nperms=1000, parallel=False, decay=None,
+                 history_size=None):
+
+        if decay is not None and not 0 < decay <= 1:
+            raise ValueError('decay must be between 0 and 1.')
+
+        self.decay = decay
+        self.history = deque(maxlen=history_size)
+        self.state = state
+        self.features = None if state is None else getattr(state, 'index', None)
+        self.n = 0
+        self.sums = None
+        self.counts = None
+
+        if state is not None and n:
+            # the state passed in stands for n lists
+            sums = np.asarray(state, dtype=float) * n
+            self.sums = np.nan_to_num(sums)
+            self.counts = np.where(np.isnan(sums), 0, n)
+            self.n = n
 
         if init is not None:
             data = _analyze_chunk(init,
@@ -70,15 +101,8 @@ class Fingerprint(object):
                                 permute=permute,
                                 n_perms=nperms,
                                 parallel=parallel)
-            self.state = np.mean(data, 0)
-            self.features = data.columns.values.tolist()
-            self.history.append(self.state)
-            n+=1
-        else:
-            self.state = state
-            self.features = None if state is None else getattr(state, 'index', None)
-
-        self.n = n
+            self.features = data['columns'].tolist()
+            self._fold(data['values'][data['present']])
 
     def update(self, egg, permute=False, nperms=1000,
                  parallel=False):
@@ -93,29 +117,92 @@ class Fingerprint(object):
         ----------
         None
         """
-
-        # increment n
-        self.n+=1
-
-        next_weights = np.nanmean(_analyze_chunk(egg,
+        data = _analyze_chunk(egg,
                           analysis=fingerprint_helper,
                           analysis_type='fingerprint',
                           pass_features=True,
                           permute=permute,
                           n_perms=nperms,
-                          parallel=parallel).values, 0)
+                          parallel=parallel)
+        if self.features is None:
+            self.features = data['columns'].tolist()
+        self._fold(data['values'][data['present']])
 
-        if self.state is not None:
-
-            # multiply states by n
-            c = self.state*self.n
+    def merge(self, other):
+        """
+        In-place method that adds the lists of another fingerprint, e.g. one
+        built from another shard of the data
 
-            # update state
-            self.state = np.nansum(np.array([c, next_weights]), axis=0)/(self.n+1)
+        Parameters
+        ----------
+        other : quail.Fingerprint
+            Fingerprint to merge in.  With decay, the states are averaged,
+            weighted by their number of lists.
 
+        Returns
+        ----------
+        None
+        """
+        if other.sums is None:
+            return
+        if (self.features is not None and other.features is not None and
+                list(self.features) != list(other.features)):
+            raise ValueError('Fingerprints must have the same features to be '
+                             'merged.')
+        if self.features is None:
+            self.features = other.features
+
+        if self.sums is None:
+            self.sums = other.sums.copy()
+            self.counts = other.counts.copy()
+            self.state = np.array(other.state, dtype=float)
         else:
-
-            self.state = next_weights
+            if self.decay is not None:
+                states = np.array([self.state, other.state], dtype=float)
+                weights = np.array([self.counts, other.counts], dtype=float)
+                weights[np.isnan(states)] = 0
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    self.state = np.nansum(states * weights, 0) / weights.sum(0)
+            self.sums = self.sums + other.sums
+            self.counts = self.counts + other.counts
+            if self.decay is None:
+                self.state = self.mean()
+        self.n += other.n
+        self.history.extend(other.history)
+
+    def mean(self):
+        """
+        Returns the average clustering score of each feature over all lists
+        (NaN for features never scored)
+        """
+        if self.sums is None:
+            return None
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sums / self.counts
+
+    def _fold(self, scores):
+        """Adds the (lists x features) clustering scores of new lists"""
+        scores = np.atleast_2d(np.asarray(scores, dtype=float))
+        valid = ~np.isnan(scores)
+        if self.sums is None:
+            self.sums = np.zeros(scores.shape[1])
+            self.counts = np.zeros(scores.shape[1], dtype=int)
+        self.sums = self.sums + np.where(valid, scores, 0).sum(0)
+        self.counts = self.counts + valid.sum(0)
+        self.n += len(scores)
+
+        # average of this update
+        with np.errstate(invalid='ignore', divide='ignore'):
+            next_weights = np.where(valid, scores, 0).sum(0) / valid.sum(0)
+
+        if self.decay is None or self.state is None:
+            self.state = self.mean() if self.decay is None else next_weights
+        else:
+            state = np.asarray(self.state, dtype=float)
+            blended = (1 - self.decay) * state + self.decay * next_weights
+            # features missing on either side keep the other value
+            self.state = np.where(np.isnan(state), next_weights,
+                                  np.where(np.isnan(next_weights), state, blended))
 
         # update the history
         self.history.append(next_weights)
@@ -193,6 +280,11 @@ class OptimalPresenter(object):
         
         self.strategy = strategy
 
+        # list kept by prepare and durations of recent reorderings
+        self._prepared = None
+        self._backend = ('loky', -1)
+        self._latencies = {}
+
     def set_params(self, name, value):
         """
         Sets a parameter to a particular value
@@ -213,7 +305,7 @@ class OptimalPresenter(object):
         self.strategy = strategy
 
     def order(self, egg, method='permute', nperms=2500, strategy=None,
-              distfun='correlation', fingerprint=None):
+              distfun='correlation', fingerprint=None, time_budget_ms=None):
         """
         Reorders a list of stimuli to match a fingerprint
 
@@ -246,78 +338,141 @@ class OptimalPresenter(object):
             None, the list will be reordered according to the fingerprint
             attached to the presenter object.
 
+        time_budget_ms : float or None
+            Time budget in milliseconds for scoring permutations. Only used if
+            method='permute'. Permutations are scored in batches until nperms
+            is reached or the next batch would not fit in the budget (at least
+            one batch is always scored). If None, all nperms permutations are
+            scored. (default: None)
+
         Returns
         ----------
         egg : quail.Egg
             Egg re-sorted to match fingerprint
         """
+        return self._order(self._prepare(egg), method, nperms, strategy,
+                           distfun, fingerprint, time_budget_ms, 'loky', -1)
 
-        def order_perm(self, egg, dist_dict, strategy, nperm, distperm,
-                       fingerprint):
-            """
-            This function re-sorts a list by computing permutations of a given
-            list and choosing the one that maximizes/minimizes variance.
-            """
+    def prepare(self, egg, backend='loky', n_jobs=-1):
+        """
+        Keeps a list ready to be reordered repeatedly with order_next
 
-            # parse egg
-            pres, rec, features, dist_funcs = parse_egg(egg)
+        The list is parsed and the distances between its items are computed
+        once, and the worker pool used by the 'best_stick' and 'best_choice'
+        methods is started, so that order_next only pays for the reordering.
+        The workers receive the list, its distances and the parameters of
+        the presenter (alpha, tau and the fingerprint features) once; call
+        prepare again after changing them.
 
-            # length of list
-            pres_len = len(pres)
+        Parameters
+        ----------
+        egg : quail.Egg
+            Egg holding the list to reorder
 
-            weights = []
-            orders = []
-            for i in range(nperms):
-                x = rand_perm(pres, features, dist_dict, dist_funcs)
-                weights.append(x[0])
-                orders.append(x[1])
-            weights = np.array(weights)
-            orders = np.array(orders)
+        backend : str
+            Execution backend of the 'best_stick' and 'best_choice' methods:
+            'serial', 'threads', 'processes' or 'loky' (default: loky)
 
-            # find the closest (or farthest)
-            if strategy=='stabilize':
-                closest = orders[np.nanargmin(cdist(np.array(fingerprint, ndmin=2), weights, distperm)),:].astype(int).tolist()
-            elif strategy=='destabilize':
-                closest = orders[np.nanargmax(cdist(np.array(fingerprint, ndmin=2), weights, distperm)),:].astype(int).tolist()
+        n_jobs : int
+            Number of workers (-1 for all cores)
 
-            # return a re-sorted egg
-            return Egg(pres=[list(pres[closest])], rec=[list(pres[closest])], features=[list(features[closest])])
-
-        def order_best_stick(self, egg, dist_dict, strategy, nperms, distfun,
-                             fingerprint):
+        Returns
+        ----------
+        presenter : quail.OptimalPresenter
+            The presenter itself
+        """
+        if backend not in BACKENDS:
+            raise ValueError('Backend not recognized. Choose one of the following: '
+                             + ', '.join(BACKENDS))
+        self._prepared = self._prepare(egg)
+        self._backend = (backend, n_jobs)
+        if backend != 'serial':
+            # start the workers now rather than on the first request
+            n_workers = get_n_jobs(n_jobs)
+            list(get_executor(backend, n_workers).map(abs, range(n_workers)))
+        return self
+
+    def order_next(self, method='permute', nperms=2500, strategy=None,
+                   distfun='correlation', fingerprint=None, time_budget_ms=None):
+        """
+        Reorders the list kept by prepare
 
-            # parse egg
-            pres, rec, features, dist_funcs = parse_egg(egg)
+        Takes the same arguments as order, without the egg.  The time taken
+        by each call is recorded (see latency).
 
-            results = Parallel(n_jobs=multiprocessing.cpu_count())(
-            delayed(stick_perm)(self, egg, dist_dict, strategy) for i in range(nperms))
+        Returns
+        ----------
+        egg : quail.Egg
+            Egg re-sorted to match fingerprint
+        """
+        if self._prepared is None:
+            raise ValueError('No list to reorder, call prepare(egg) first.')
+        return self._order(self._prepared, method, nperms, strategy, distfun,
+                           fingerprint, time_budget_ms, *self._backend)
 
-            weights = np.array([x[0] for x in results])
-            orders = np.array([x[1] for x in results])
+    def latency(self):
+        """
+        Returns the latency of the recent calls to order and order_next
 
-            # find the closest (or farthest)
-            if strategy=='stabilize':
-                closest = orders[np.nanargmin(cdist(np.array(fingerprint, ndmin=2), weights, distfun)),:].astype(int).tolist()
-            elif strategy=='destabilize':
-                closest = orders[np.nanargmax(cdist(np.array(fingerprint, ndmin=2), weights, distfun)),:].astype(int).tolist()
+        Returns
+        ----------
+        latency : dict
+            For each method, a dict with the number of calls recorded ('n')
+            and the median ('p50') and 99th percentile ('p99') of their
+            duration, in milliseconds
+        """
+        return {method : {'n' : len(times),
+                          'p50' : np.percentile(times, 50),
+                          'p99' : np.percentile(times, 99)}
+                for method, times in self._latencies.items()}
 
-            # return a re-sorted egg
-            return Egg(pres=[list(pres[closest])], rec=[list(pres[closest])], features=[list(features[closest])], dist_funcs=dist_funcs)
+    def _prepare(self, egg):
+        """Parses a list and computes the distances between its items"""
+        pres, rec, features, dist_funcs = parse_egg(egg)
+        distances = compute_distances(egg)
+        return {'egg' : egg, 'pres' : pres, 'features' : features,
+                'dist_funcs' : dist_funcs, 'distances' : distances,
+                'shared' : _PreparedList(self, features, distances)}
 
-        def order_best_choice(self, egg, dist_dict, nperms, distfun,
-                              fingerprint):
+    def _order(self, prepared, method, nperms, strategy, distfun, fingerprint,
+               time_budget_ms, backend, n_jobs):
+        """Reorders a parsed list, recording how long it took"""
+        start = time.time()
 
-            # get strategy
+        # if strategy is not set explicitly, default to the class strategy
+        if strategy is None:
             strategy = self.strategy
 
-            # parse egg
-            pres, rec, features, dist_funcs = parse_egg(egg)
+        if fingerprint is None:
+            fingerprint = self.get_params('fingerprint').state
+        elif isinstance(fingerprint, Fingerprint):
+            fingerprint = fingerprint.state
 
-            results = Parallel(n_jobs=multiprocessing.cpu_count())(
-            delayed(choice_perm)(self, egg, dist_dict) for i in range(nperms))
+        pres, features = prepared['pres'], prepared['features']
+        dist_funcs, distances = prepared['dist_funcs'], prepared['distances']
 
-            weights = np.array([x[0] for x in results])
-            orders = np.array([x[1] for x in results])
+        if (strategy=='random') or (method=='random'):
+            method = 'random'
+            regg = shuffle_egg(prepared['egg'])
+        elif method=='stick':
+            order = _stick_order(self, features, distances, strategy, fingerprint)
+            regg = _reordered_egg(pres, features, dist_funcs, order)
+        else:
+            if method=='permute':
+                weights, orders = rand_perms(distances, nperms, time_budget_ms)
+            elif method in ['best_stick', 'best_choice']:
+                perm = stick_perm if method=='best_stick' else choice_perm
+                # the prepared list is sent to the workers once; each task
+                # only carries the method and the target fingerprint
+                results = run_chunks(_run_perm, prepared['shared'],
+                                     [(perm, strategy, fingerprint)]*nperms,
+                                     backend=backend, n_jobs=n_jobs)
+                weights = np.array([x[0] for x in results])
+                orders = np.array([x[1] for x in results])
+            else:
+                raise ValueError('Method not recognized. Choose one of the '
+                                 'following: permute, stick, best_stick, '
+                                 'best_choice, random')
 
             # find the closest (or farthest)
             if strategy=='stabilize':
@@ -326,39 +481,24 @@ class OptimalPresenter(object):
                 closest = orders[np.nanargmax(cdist(np.array(fingerprint, ndmin=2), weights, distfun)),:].astype(int).tolist()
 
             # return a re-sorted egg
-            return Egg(pres=[list(pres[closest])], rec=[list(pres[closest])], features=[list(features[closest])], dist_funcs=dist_funcs)
+            regg = Egg(pres=[list(pres[closest])], rec=[list(pres[closest])],
+                       features=[list(features[closest])],
+                       dist_funcs=None if method=='permute' else dist_funcs)
 
-        # if strategy is not set explicitly, default to the class strategy
-        if strategy is None:
-            strategy = self.strategy
+        self._latencies.setdefault(method, deque(maxlen=1000)).append(
+            (time.time() - start) * 1000)
+        return regg
 
-        dist_dict = compute_distances_dict(egg)
-
-        if fingerprint is None:
-            fingerprint = self.get_params('fingerprint').state
-        elif isinstance(fingerprint, Fingerprint):
-            fingerprint = fingerprint.state
-        else:
-            print('using custom fingerprint')
-
-        if (strategy=='random') or (method=='random'):
-            return shuffle_egg(egg)
-        elif method=='permute':
-            return order_perm(self, egg, dist_dict, strategy, nperms, distfun,
-                              fingerprint) #
-        elif method=='stick':
-            return order_stick(self, egg, dist_dict, strategy, fingerprint) #
-        elif method=='best_stick':
-            return order_best_stick(self, egg, dist_dict, strategy, nperms,
-                                    distfun, fingerprint) #
-        elif method=='best_choice':
-            return order_best_choice(self, egg, dist_dict, nperms,
-                                     fingerprint) #
-
-def order_stick(presenter, egg, dist_dict, strategy, fingerprint):
+def order_stick(presenter, egg, distances, strategy, fingerprint):
     """
     Reorders a list according to strategy
     """
+    pres, rec, features, dist_funcs = parse_egg(egg)
+    order = _stick_order(presenter, features, distances, strategy, fingerprint)
+    return _reordered_egg(pres, features, dist_funcs, order)
+
+def _stick_order(presenter, features, distances, strategy, fingerprint):
+    """Order of the items of a list picked by order_stick"""
 
     def compute_feature_stick(features, weights, alpha):
         '''create a 'stick' of feature weights'''
@@ -369,91 +509,50 @@ def order_stick(presenter, egg, dist_dict, strategy, fingerprint):
 
         return feature_stick
 
-    def reorder_list(egg, feature_stick, dist_dict, tau):
-        # parse egg
-        pres, rec, features, dist_funcs = parse_egg(egg)
-
-        # turn pres and features into np arrays
-        pres_arr = np.array(pres)
-        features_arr = np.array(features)
-
-        # starting with a random word
-        reordered_list = []
-        reordered_features = []
+    def reorder_list(features, feature_stick, distances, tau):
+        # rows of the distance tensor
+        feature_names = _feature_names(features)
 
         # start with a random choice
-        idx = np.random.choice(len(pres), 1)[0]
-
-        # original inds
-        inds = list(range(len(pres)))
+        first = np.random.choice(len(features), 1)[0]
 
         # keep track of the indices
-        inds_used = [idx]
-
-        # get the word
-        current_word = pres[idx]
-
-        # get the features dict
-        current_features = features[idx]
-
-        # append that word to the reordered list
-        reordered_list.append(current_word)
-
-        # append the features to the reordered list
-        reordered_features.append(current_features)
+        order = [first]
+        used = np.zeros(len(features), dtype=bool)
+        used[first] = True
 
         # loop over the word list
-        for i in range(len(pres)-1):
+        for i in range(len(features)-1):
 
             # sample from the stick
             feature_sample = feature_stick[np.random.choice(len(feature_stick), 1)[0]]
 
             # indices left
-            inds_left = [ind for ind in inds if ind not in inds_used]
-
-            # make a copy of the words filtering out the already used ones
-            words_left = pres[inds_left]
-
-            # get word distances for the word
-            dists_left = np.array([dist_dict[current_word][word][feature_sample] for word in words_left])
+            inds_left = np.flatnonzero(~used)
 
-            # features left
-            features_left = features[inds_left]
+            # get distances to the first word
+            dists_left = distances[feature_names.index(feature_sample), first, inds_left]
 
             # normalize distances
             dists_left_max = np.max(dists_left)
             if dists_left_max>0:
-                dists_left_norm = dists_left/np.max(dists_left)
-            else:
-                dists_left_norm = dists_left
-
-            # get the min
-            dists_left_min = np.min(-dists_left_norm)
+                dists_left = dists_left/dists_left_max
 
             # invert the word distances to turn distance->similarity
-            dists_left_inv = - dists_left_norm - dists_left_min + .01
+            dists_left_inv = - dists_left + np.max(dists_left) + .01
 
             # create a word stick
-            words_stick = []
-            for word, dist in zip(words_left, dists_left_inv):
-                words_stick+=[word]*int(np.power(dist,tau)*100)
-
-            next_word = np.random.choice(words_stick)
+            inds_stick = np.repeat(inds_left,
+                                   (np.power(dists_left_inv, tau)*100).astype(int))
 
-            next_word_idx = np.where(pres==next_word)[0]
+            idx = np.random.choice(inds_stick)
+            order.append(idx)
+            used[idx] = True
 
-            inds_used.append(next_word_idx)
-
-            reordered_list.append(next_word)
-            reordered_features.append(features[next_word_idx][0])
-
-        return Egg(pres=[reordered_list], rec=[reordered_list], features=[[reordered_features]], dist_funcs=dist_funcs)
-
-    # parse egg
-    pres, rec, features, dist_funcs = parse_egg(egg)
+        return np.array(order)
 
     # get params needed for list reordering
-    features = presenter.get_params('fingerprint').get_features()
+    feature_list = presenter.get_params('fingerprint').get_features()
     alpha = presenter.get_params('alpha')
     tau = presenter.get_params('tau')
     weights = fingerprint
@@ -463,151 +562,133 @@ def order_stick(presenter, egg, dist_dict, strategy, fingerprint):
         weights = 1 - weights
 
     # compute feature stick
-    feature_stick = compute_feature_stick(features, weights, alpha)
+    feature_stick = compute_feature_stick(feature_list, weights, alpha)
 
     # reorder list
-    return reorder_list(egg, feature_stick, dist_dict, tau)
+    return reorder_list(features, feature_stick, distances, tau)
 
-def order_choice(presenter, egg, dist_dict, fingerprint):
+def order_choice(presenter, egg, distances, fingerprint):
+    """
+    Reorders a list by iteratively selecting words that get closer to the
+    target fingerprint
+    """
+    pres, rec, features, dist_funcs = parse_egg(egg)
+    order = _choice_order(presenter, distances, fingerprint)
+    return _reordered_egg(pres, features, dist_funcs, order)
 
-    # get strategy
-    strategy = presenter.strategy
+def _choice_order(presenter, distances, fingerprint):
+    """Order of the items of a list picked by order_choice"""
 
     # get tau
     tau = presenter.get_params('tau')
 
-    # get number of features
-    nfeats = len(presenter.get_params('fingerprint').features)
-
-    # parse egg
-    pres, rec, features, dist_funcs = parse_egg(egg)
+    # number of items
+    n_items = distances.shape[1]
 
     # start with a random word
-    idx = np.random.choice(len(pres), 1)[0]
-
-    # original inds
-    inds = list(range(len(pres)))
+    idx = np.random.choice(n_items, 1)[0]
 
     # keep track of the indices
-    inds_used = [idx]
-
-    # get the word
-    current_word = pres[idx]
-
-    # get the features dict
-    current_features = features[idx]
-
-    # append that word to the reordered list
-    reordered_list = [current_word]
-
-    # append the features to the reordered list
-    reordered_features = [current_features]
+    order = [idx]
+    used = np.zeros(n_items, dtype=bool)
+    used[idx] = True
 
     # loop over the word list
-    for i in range(len(pres)-1):
+    for i in range(n_items-1):
 
         # indices left
-        inds_left = [ind for ind in inds if ind not in inds_used]
-
-        # make a copy of the words filtering out the already used ones
-        words_left = pres[inds_left]
-
-        # features left
-        features_left = features[inds_left]
-
-        # get weights if each word was added
-        idx=0
-        weights = np.zeros((len(words_left), nfeats))
-        for word, feat in zip(words_left, features_left):
-            weights[idx,:]=compute_feature_weights_dict(
-                list(pres),
-                reordered_list+[word],
-                reordered_features+[feat],
-                dist_dict)
-            idx+=1
-
-        # print(weights)
-        # print(cdist(np.array(fingerprint, ndmin=2), weights, 'euclidean'))
-
-        # pick the closest (or farthest)
-        # if strategy is 'stabilize':
-        # pick = np.argmin(cdist(np.array(fingerprint, ndmin=2), weights, 'euclidean'))
-        stick = []
-        dist = cdist(np.array(fingerprint, ndmin=2), weights, 'correlation').reshape(len(words_left), 1)
-        for idx, val in enumerate(dist):
-            for i in range(int((val*tau)*100)):
-                stick.append(idx)
+        inds_left = np.flatnonzero(~used)
+
+        # get weights if each word was added, scoring all candidates at once
+        candidates = np.column_stack([np.tile(order, (len(inds_left), 1)), inds_left])
+        weights = _order_scores(distances, candidates)
+
+        # sample the next word, favoring the candidates farthest from the
+        # target fingerprint
+        dist = cdist(np.array(fingerprint, ndmin=2), weights, 'correlation')[0]
+        counts = np.nan_to_num(dist*tau*100).astype(int)
+        if counts.sum() == 0:
+            # no usable distances (e.g. flat weights), pick at random
+            counts[:] = 1
+        stick = np.repeat(np.arange(len(inds_left)), counts)
         pick = np.random.choice(stick, 1)[0]
-        # elif strategy is 'destabilize':
-        #     pick = np.argmin(cdist(np.array(fingerprint, ndmin=2), weights, 'euclidean'))
-
-        # get the next word
-        next_word = words_left[pick]
-
-        # and the idx of the next word
-        next_word_idx = np.where(pres==next_word)[0]
-
-        # append it to the inds already used
-        inds_used.append(next_word_idx)
 
         # update the list
-        reordered_list.append(next_word)
-        reordered_features.append(features[next_word_idx][0])
-
-    return Egg(pres=[reordered_list], rec=[reordered_list], features=[[reordered_features]], dist_funcs=dist_funcs)
+        idx = inds_left[pick]
+        order.append(idx)
+        used[idx] = True
 
-# function to run 1 perm for parallel list re-sorting function
-def rand_perm(pres, features, dist_dict, dist_funcs):
+    return np.array(order)
 
-    # seed RNG
-    np.random.seed()
+def _reordered_egg(pres, features, dist_funcs, order):
+    """Egg presenting (and recalling) the items of a list in a new order"""
+    return Egg(pres=[list(pres[order])], rec=[list(pres[order])],
+               features=[[list(features[order])]], dist_funcs=dist_funcs)
 
-    # shuffle inds
-    idx = np.random.permutation(len(pres))
+def rand_perms(distances, nperms, time_budget_ms=None, batch_size=256):
+    """
+    Computes the clustering scores of random orders of a list
 
-    # shuffled pres
-    pres_perm = list(pres[idx])
+    Parameters
+    ----------
+    distances : np.ndarray
+        (features x items x items) array of distances (see compute_distances)
 
-    # shuffled features
-    features_perm = list(features[idx])
+    nperms : int
+        Number of random orders to score
 
-    # compute weights
-    weights = compute_feature_weights_dict(pres_perm, pres_perm, features_perm, dist_dict)
+    time_budget_ms : float or None
+        If set, stop early when the next batch of orders would not be scored
+        within this many milliseconds (at least one batch is scored)
 
-    # save out the order
-    orders = idx
+    batch_size : int
+        Largest number of orders scored at once.  Batches start small and
+        double in size, so that short budgets are not overrun by a single
+        batch.
 
-    return weights, orders
+    Returns
+    ----------
+    weights : np.ndarray
+        (orders x features) array of clustering scores
 
-def stick_perm(presenter, egg, dist_dict, strategy):
+    orders : np.ndarray
+        (orders x items) array of item indices
+    """
+    start = time.time()
+    n_items = distances.shape[1]
+    weights, orders = [], []
+    size, done = min(32, batch_size), 0
+    while done < nperms:
+        size = min(size, nperms - done)
+        idx = np.random.rand(size, n_items).argsort(1)
+        weights.append(_order_scores(distances, idx))
+        orders.append(idx)
+        done += size
+
+        if time_budget_ms is not None:
+            # assume the time per order stays the same for the next batch
+            elapsed = (time.time() - start) * 1000
+            if elapsed * (1 + 2 * size / done) > time_budget_ms:
+                break
+        size = min(2 * size, batch_size)
+
+    return np.concatenate(weights), np.concatenate(orders)
+
+def stick_perm(presenter, features, distances, strategy, fingerprint):
     """Computes weights for one reordering using stick-breaking method"""
 
     # seed RNG
     np.random.seed()
 
-    # unpack egg
-    egg_pres, egg_rec, egg_features, egg_dist_funcs = parse_egg(egg)
-
     # reorder
-    regg = order_stick(presenter, egg, dist_dict, strategy)
-
-    # unpack regg
-    regg_pres, regg_rec, regg_features, regg_dist_funcs = parse_egg(regg)
-
-    # # get the order
-    regg_pres = list(regg_pres)
-    egg_pres = list(egg_pres)
-    idx = [egg_pres.index(r) for r in regg_pres]
+    idx = _stick_order(presenter, features, distances, strategy, fingerprint)
 
     # compute weights
-    weights = compute_feature_weights_dict(list(regg_pres), list(regg_pres), list(regg_features), dist_dict)
+    weights = _order_scores(distances, idx[np.newaxis])[0]
 
-    # save out the order
-    orders = idx
+    return weights, idx
 
-    return weights, orders
-
-def choice_perm(presenter, egg, dist_dict):
+def choice_perm(presenter, features, distances, strategy, fingerprint):
     """
     Reorder a list by iteratively selecting words that get closer to the
     target fingerprint
@@ -615,56 +696,72 @@ def choice_perm(presenter, egg, dist_dict):
     # seed RNG
     np.random.seed()
 
-    strategy = presenter.strategy
-
-    # unpack egg
-    egg_pres, egg_rec, egg_features, egg_dist_funcs = parse_egg(egg)
-
     # reorder
-    regg = order_choice(presenter, egg, dist_dict)
-
-    # unpack regg
-    regg_pres, regg_rec, regg_features, regg_dist_funcs = parse_egg(regg)
-
-    # get the order
-    regg_pres = list(regg_pres)
-    egg_pres = list(egg_pres)
-    idx = [egg_pres.index(r) for r in regg_pres]
+    idx = _choice_order(presenter, distances, fingerprint)
 
     # compute weights
-    weights = compute_feature_weights_dict(list(regg_pres), list(regg_pres), list(regg_features), dist_dict)
+    weights = _order_scores(distances, idx[np.newaxis])[0]
 
-    # save out the order
-    orders = idx
+    return weights, idx
 
-    return weights, orders
+class _PreparedList(object):
+    """
+    Features and distances of a list to reorder, with a copy of the presenter
+    parameters, shared with the workers of run_chunks
+    """
 
-def compute_distances_dict(egg):
-    """ Creates a nested dict of distances """
-    pres, rec, features, dist_funcs = parse_egg(egg)
-    pres_list = list(pres)
-    features_list = list(features)
+    def __init__(self, presenter, features, distances):
+        self.params = dict(presenter.params)
+        self.features = features
+        self.distances = distances
 
-    # initialize dist dict
-    distances = {}
+    def get_params(self, name):
+        return self.params[name]
 
-    # for each word in the list
-    for idx1, item1 in enumerate(pres_list):
 
-        distances[item1]={}
+def _run_perm(prepared, task):
+    """Runs one stick_perm or choice_perm for run_chunks"""
+    perm, strategy, fingerprint = task
+    return perm(prepared, prepared.features, prepared.distances, strategy,
+                fingerprint)
 
-        # for each word in the list
-        for idx2, item2 in enumerate(pres_list):
+def _feature_names(feature_list):
+    """Features scored by the presenter, i.e. all but the item itself"""
+    if len(feature_list) == 0:
+        return []
+    return [f for f in feature_list[0] if f != 'item']
 
-            distances[item1][item2]={}
+def compute_distances(egg):
+    """
+    Computes the distances between the presented items of a list
 
-            # for each feature in dist_funcs
-            for feature in dist_funcs:
-                distances[item1][item2][feature] = builtin_dist_funcs[dist_funcs[feature]](features_list[idx1][feature],features_list[idx2][feature])
+    Parameters
+    ----------
+    egg : quail.Egg
+        Egg holding a single list
 
+    Returns
+    ----------
+    distances : np.ndarray
+        (features x items x items) array of distances, with one row for each
+        feature of the presented items but the item itself (in the order of
+        the feature dicts) and items in presentation order
+    """
+    pres, rec, features, dist_funcs = parse_egg(egg)
+    features_list = list(features)
+    feature_names = _feature_names(features_list)
+
+    # distances for each feature, drawn from the shared distance store
+    distances = np.zeros((len(feature_names), len(pres), len(pres)))
+    for i, feature in enumerate(feature_names):
+        metric = builtin_dist_funcs[dist_funcs[feature]]
+        dist = distance_store.value_distances(
+            feature, metric, [f[feature] for f in features_list])
+        if dist is not None:
+            distances[i] = dist
     return distances
 
-def compute_feature_weights_dict(pres_list, rec_list, feature_list, dist_dict):
+def compute_feature_weights(pres_list, rec_list, feature_list, distances):
     """
     Compute clustering scores along a set of feature dimensions
 
@@ -676,8 +773,9 @@ def compute_feature_weights_dict(pres_list, rec_list, feature_list, dist_dict):
         list of recalled words
     feature_list : list
         list of feature dicts for presented words
-    distances : dict
-        dict of distance matrices for each feature
+    distances : np.ndarray
+        (features x items x items) array of distances between the items of
+        pres_list, in that order (see compute_distances)
 
     Returns
     ----------
@@ -685,69 +783,122 @@ def compute_feature_weights_dict(pres_list, rec_list, feature_list, dist_dict):
         list of clustering scores for each feature dimension
     """
 
-    # initialize the weights object for just this list
-    weights = {}
-    
-    # Filter features to those present in both pres_list features and supported by logic
-    valid_features = []
-    if len(feature_list) > 0:
-        for f in feature_list[0]:
-            # heuristic: check if f indicates a feature key we care about
-            if f != 'item':
-                 valid_features.append(f)
-
-    for feature in valid_features:
-        weights[feature] = []
-
     # return default list if there is not enough data to compute the fingerprint
     if len(rec_list) < 2:
         print('Not enough recalls to compute fingerprint, returning default fingerprint.. (everything is .5)')
-        for feature in valid_features:
-            weights[feature] = .5
-        return [weights[key] for key in weights]
-
-    # initialize past word list
-    past_words = []
-    past_idxs = []
-
-    # loop over words
-    for i in range(len(rec_list)-1):
+        return [.5] * len(_feature_names(feature_list))
 
-        # grab current word
-        c = rec_list[i]
+    # positions of the recalled words in the encoding list (-1 for intrusions)
+    index = {}
+    for i, word in enumerate(pres_list):
+        index.setdefault(word, i)
+    order = np.array([[index.get(word, -1) for word in rec_list]])
 
-        # grab the next word
-        n = rec_list[i + 1]
+    return list(_order_scores(distances, order)[0])
 
-        # if both recalled words are in the encoding list and haven't been recalled before
-        if (c in pres_list and n in pres_list) and (c not in past_words and n not in past_words):
-
-            # for each feature
-            for feature in valid_features:
-
-                # get the distance vector for the current word
-                # dists = [dist_dict[c][j][feature] for j in dist_dict[c]]
-                # distance between current and next word
-                c_dist = dist_dict[c][n][feature]
+def compute_distances_dict(egg):
+    """
+    Creates a nested dict of distances (deprecated, use compute_distances)
 
-                # filter dists removing the words that have already been recalled
-                # dists_filt = np.array([dist for idx, dist in enumerate(dists) if idx not in past_idxs])
-                dists_filt = [dist_dict[c][j][feature] for j in dist_dict[c] if j not in past_words]
+    Returns
+    ----------
+    distances : dict
+        distances[item1][item2][feature] is the distance between two presented
+        items along a feature
+    """
+    warnings.warn('compute_distances_dict is deprecated, use compute_distances',
+                  DeprecationWarning, stacklevel=2)
+    pres, rec, features, dist_funcs = parse_egg(egg)
+    feature_names = _feature_names(list(features))
+    distances = compute_distances(egg)
+    return {item1 : {item2 : {feature : distances[f, i, j]
+                              for f, feature in enumerate(feature_names)}
+                     for j, item2 in enumerate(pres)}
+            for i, item1 in enumerate(pres)}
 
-                # get indices
-                avg_rank = np.mean(np.where(np.sort(dists_filt)[::-1] == c_dist)[0]+1)
+def compute_feature_weights_dict(pres_list, rec_list, feature_list, dist_dict):
+    """
+    Compute clustering scores along a set of feature dimensions, given a
+    nested dict of distances (deprecated, use compute_feature_weights)
+    """
+    warnings.warn('compute_feature_weights_dict is deprecated, use '
+                  'compute_feature_weights', DeprecationWarning, stacklevel=2)
+    return compute_feature_weights(pres_list, rec_list, feature_list,
+                                   _dict_distances(pres_list, feature_list, dist_dict))
 
-                # compute the weight
-                weights[feature].append(avg_rank / len(dists_filt))
+def rand_perm(pres, features, dist_dict, dist_funcs):
+    """
+    Computes the clustering scores of one random order of a list (deprecated,
+    use rand_perms)
+    """
+    warnings.warn('rand_perm is deprecated, use rand_perms',
+                  DeprecationWarning, stacklevel=2)
+    weights, orders = rand_perms(_dict_distances(list(pres), list(features),
+                                                 dist_dict), 1)
+    return list(weights[0]), orders[0]
+
+def _dict_distances(pres_list, feature_list, dist_dict):
+    """(features x items x items) array of a nested dict of distances"""
+    return np.array([[[dist_dict[item1][item2][feature] for item2 in pres_list]
+                      for item1 in pres_list]
+                     for feature in _feature_names(feature_list)]).reshape(
+                         -1, len(pres_list), len(pres_list))
+
+def _order_scores(distances, orders):
+    """
+    Clustering scores of many recall sequences at once
 
-            # keep track of what has been recalled already
-            past_idxs.append(pres_list.index(c))
-            past_words.append(c)
+    Parameters
+    ----------
+    distances : np.ndarray
+        (features x items x items) array of distances between the presented
+        items
 
-    # average over the cluster scores for a particular dimension
-    for feature in weights:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=RuntimeWarning)
-            weights[feature] = np.nanmean(weights[feature])
+    orders : np.ndarray
+        (sequences x recalls) array of the presented positions of the
+        recalled items (-1 for intrusions)
 
-    return [weights[key] for key in weights]
+    Returns
+    ----------
+    weights : np.ndarray
+        (sequences x features) array of clustering scores
+    """
+    distances = np.asarray(distances, dtype=float)
+    orders = np.atleast_2d(np.asarray(orders, dtype=int))
+    n_seqs, n_recs = orders.shape
+    n_features, n_items = distances.shape[:2]
+    rows = np.arange(n_seqs)
+
+    totals = np.zeros((n_features, n_seqs))
+    counts = np.zeros((n_features, n_seqs))
+    recalled = np.zeros((n_seqs, n_items), dtype=bool)
+    for t in range(n_recs - 1):
+        c, n = orders[:, t], orders[:, t + 1]
+
+        # transitions between presented words that haven't been recalled before
+        valid = (c >= 0) & (n >= 0)
+        valid[valid] &= ~recalled[rows[valid], c[valid]] & ~recalled[rows[valid], n[valid]]
+        if not valid.any():
+            continue
+        c, n, seqs = c[valid], n[valid], rows[valid]
+
+        # rank of the transition among the words not recalled yet (the
+        # current one included), averaged over ties, with NaN distances
+        # ranked first
+        dists = distances[:, c, :]
+        target = distances[:, c, n][:, :, np.newaxis]
+        left = ~recalled[seqs][np.newaxis]
+        n_greater = (((dists > target) | np.isnan(dists)) & left).sum(2)
+        n_equal = ((dists == target) & left).sum(2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rank = np.where(n_equal > 0, n_greater + (n_equal + 1) / 2, np.nan)
+            score = rank / left.sum(2)
+
+        scored = ~np.isnan(score)
+        totals[:, seqs] += np.where(scored, score, 0)
+        counts[:, seqs] += scored
+        recalled[seqs, c] = True
+
+    # average over the cluster scores of each dimension
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (totals / counts).T
@@ -52,28 +52,32 @@ def list2pd(all_data, subjindex=None, listindex=None):
     return pd.concat(subs_list_of_dfs)
 
 def format2tidy(df, subjname, listname, subjgroup, analysis=None, position=0):
-    melted_df = pd.melt(df.T)
-    # Get the actual column name for subjects (first column after melt)
-    # This may be 'Subject' or the actual index level name from the DataFrame
+    """
+    Long format of analysis results: one row per (group, list, column) with
+    the group label of subjgroup (indexed by order of appearance) in subjname
+    """
+    # rows of df, repeated once per column, then the values row by row (as
+    # melting the transposed frame would)
+    names = [name if name is not None else 'variable_' + str(i)
+             for i, name in enumerate(df.index.names)]
+    melted_df = df.index.repeat(df.shape[1]).to_frame(index=False, name=names)
+    melted_df['value'] = df.to_numpy().ravel()
     subject_col = melted_df.columns[0]
-    melted_df[subjname]=""
-    for idx,sub in enumerate(melted_df[subject_col].unique()):
-        melted_df.loc[melted_df[subject_col]==sub,subjname]=subjgroup[idx]
+    codes = pd.factorize(melted_df[subject_col])[0]
+    melted_df[subjname] = np.asarray(list(subjgroup), dtype=object)[codes]
+    n = df.shape[0]
     if analysis=='spc':
-        base = list(df.columns)
-        melted_df['Position'] = base * int(melted_df.shape[0] / len(base))
+        melted_df['Position'] = np.tile(df.columns.values, n)
         melted_df.columns = ['Subject', listname, 'Proportion Recalled', subjname, 'Position']
     elif analysis in ['pfr', 'pnr']:
-        base = list(df.columns)
-        melted_df['Position'] = base * int(melted_df.shape[0] / len(base))
+        melted_df['Position'] = np.tile(df.columns.values, n)
         melted_df.columns = ['Subject', listname, 'Probability of Recall: Position ' + str(position), subjname, 'Position']
     elif analysis=='lagcrp':
         base = list(range(int(-len(df.columns.values)/2),int(len(df.columns.values)/2)+1))
-        melted_df['Position'] = base * int(melted_df.shape[0] / len(base))
+        melted_df['Position'] = np.tile(base, n)
         melted_df.columns = ['Subject', listname, 'Conditional Response Probability', subjname, 'Position']
     elif analysis=='fingerprint' or analysis=='fingerprint_temporal':
-        base = list(df.columns.values)
-        melted_df['Feature'] = base * int(melted_df.shape[0] / len(base))
+        melted_df['Feature'] = np.tile(df.columns.values, n)
         melted_df.columns = ['Subject', listname, 'Clustering Score', subjname, 'Feature']
     elif analysis=='accuracy':
         melted_df.columns = ['Subject', listname, 'Accuracy', subjname]
@@ -81,6 +85,94 @@ def format2tidy(df, subjname, listname, subjgroup, analysis=None, position=0):
         melted_df.columns = ['Subject', listname, 'Temporal clustering score', subjname]
     return melted_df
 
+def summarize_tidy(data, y, by, interval='ci', level=95, n_boot=1000,
+                   random_state=None):
+    """
+    Mean of a column of a tidy frame and its interval, for each group of rows
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Tidy data, e.g. from format2tidy
+
+    y : str
+        Column to summarize (missing values are ignored)
+
+    by : list of str
+        Columns to group rows by.  Groups are kept in order of appearance.
+
+    interval : str or None
+        'ci' (t-distribution confidence interval of the mean, default), 'se'
+        (mean +/- standard error), 'sd' (mean +/- standard deviation),
+        'bootstrap' (percentile interval of bootstrapped means) or None
+
+    level : float
+        Confidence level of 'ci' and 'bootstrap' intervals, in percent
+
+    n_boot : int
+        Number of bootstrap samples
+
+    random_state : int, RandomState or None
+        Seed of the bootstrap samples
+
+    Returns
+    ----------
+    summary : pd.DataFrame
+        One row per group, with the by columns, the mean (named y), the
+        bounds of the interval ('low' and 'high', NaN if interval is None or
+        there are too few values) and the number of values ('n')
+    """
+    from scipy.stats import t
+
+    data = data[data[y].notna()]
+    grouped = data.groupby(by, sort=False)[y]
+    summary = grouped.agg(['mean', 'std', 'count'])
+    mean, n = summary['mean'].to_numpy(), summary['count'].to_numpy()
+    if interval == 'ci':
+        with np.errstate(invalid='ignore'):
+            half = t.ppf(.5 + level / 200., n - 1) * summary['std'].to_numpy() / np.sqrt(n)
+    elif interval == 'se':
+        half = summary['std'].to_numpy() / np.sqrt(n)
+    elif interval == 'sd':
+        half = summary['std'].to_numpy()
+    elif interval == 'bootstrap':
+        low, high = _bootstrap_interval(data[y].to_numpy(dtype=float),
+                                        grouped.ngroup().to_numpy(), len(n),
+                                        level, n_boot, random_state)
+        half = None
+    elif interval is None:
+        half = np.full(len(n), np.nan)
+    else:
+        raise ValueError("interval must be 'ci', 'se', 'sd', 'bootstrap' or None.")
+    if half is not None:
+        low, high = mean - half, mean + half
+    summary = summary.reset_index()
+    return pd.DataFrame(dict({col : summary[col] for col in by},
+                             **{y : mean, 'low' : low, 'high' : high, 'n' : n}))
+
+def _bootstrap_interval(values, codes, n_groups, level, n_boot, random_state):
+    """
+    Percentile interval of the bootstrapped means of the values of each group
+
+    All groups are resampled at once: each value is replaced by a random value
+    of its group, and the means are summed over the (sorted) groups, for a chunk of
+    bootstrap samples at a time
+    """
+    rng = random_state if isinstance(random_state, np.random.RandomState) \
+        else np.random.RandomState(random_state)
+    order = np.argsort(codes, kind='stable')
+    values, codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    means = np.empty((n_boot, n_groups))
+    chunk = max(1, min(n_boot, 10**7 // max(len(values), 1)))
+    for i in range(0, n_boot, chunk):
+        k = min(chunk, n_boot - i)
+        picks = starts[codes] + (rng.rand(k, len(values)) * counts[codes]).astype(int)
+        means[i:i + k] = np.add.reduceat(values[picks], starts, axis=1) / counts
+    alpha = (100 - level) / 2.
+    return np.percentile(means, alpha, axis=0), np.percentile(means, 100 - alpha, axis=0)
+
 def recmat2egg(recmat, list_length=None):
         """
         Creates egg data object from zero-indexed recall matrix
@@ -131,6 +223,11 @@ def stack_eggs(eggs, meta='concatenate'):
     '''
     Takes a list of eggs, stacks them and reindexes the subject number
 
+    The underlying tables (or arrays, for columnar eggs) are joined in one
+    operation, without rebuilding the egg item by item.  The stacked egg uses
+    the columnar backend if all the eggs do, and the pandas backend
+    otherwise.
+
     Parameters
     ----------
     eggs : list of Egg data objects
@@ -148,10 +245,26 @@ def stack_eggs(eggs, meta='concatenate'):
 
     '''
     from .egg import Egg
+    from .columnar import EggArrays
+
+    eggs = list(eggs)
+    if not eggs:
+        raise ValueError('Nothing to stack.')
+    new_meta = _stack_meta(eggs, meta)
+    dist_funcs = dict(eggs[0].dist_funcs)
 
-    pres = [egg.pres.loc[sub,:].values.tolist() for egg in eggs for sub in egg.pres.index.levels[0].values.tolist()]
-    rec = [egg.rec.loc[sub,:].values.tolist() for egg in eggs for sub in egg.rec.index.levels[0].values.tolist()]
+    if all(getattr(egg, 'arrays', None) is not None for egg in eggs):
+        return Egg._from_columnar(EggArrays.concatenate([egg.arrays for egg in eggs]),
+                                  dist_funcs=dist_funcs, meta=new_meta)
 
+    pres = _stack_frames([egg.pres for egg in eggs])
+    rec = _stack_frames([egg.rec for egg in eggs])
+    return Egg._from_frames(pres, rec, dist_funcs=dist_funcs, meta=new_meta)
+
+def _stack_meta(eggs, meta):
+    """
+    Combines the meta data of eggs for stack_eggs
+    """
     if meta == 'concatenate':
         new_meta = {}
         for egg in eggs:
@@ -165,7 +278,37 @@ def stack_eggs(eggs, meta='concatenate'):
     elif meta == 'separate':
         new_meta = list(egg.meta for egg in eggs)
 
-    return Egg(pres=pres, rec=rec, meta=new_meta)
+    return new_meta
+
+def _stack_frames(frames):
+    """
+    Concatenates (Subject, List) indexed DataFrames of item dicts, numbering
+    the subjects across frames and the lists of each subject from 0.
+    Subjects with fewer lists, and shorter lists, are padded with missing
+    items.
+    """
+    subjects = []
+    offset = 0
+    for df in frames:
+        index = df.index.remove_unused_levels()
+        subjects.append(np.asarray(index.codes[0], dtype=np.int64) + offset)
+        offset += len(index.levels[0])
+    subjects = np.concatenate(subjects)
+    order = np.argsort(subjects, kind='stable')
+    subjects = subjects[order]
+    lists = pd.Series(subjects).groupby(subjects).cumcount().to_numpy()
+
+    stacked = pd.concat(frames, ignore_index=True).iloc[order]
+    stacked.index = pd.MultiIndex.from_arrays([subjects, lists],
+                                              names=['Subject', 'List'])
+    full = pd.MultiIndex.from_product([range(offset), range(lists.max(initial=-1) + 1)],
+                                      names=['Subject', 'List'])
+    if len(full) != len(stacked):
+        stacked = stacked.reindex(full)
+    values = stacked.to_numpy(dtype=object)
+    missing = pd.isnull(values)
+    values[missing] = [{'item' : np.nan} for _ in range(missing.sum())]
+    return pd.DataFrame(values, index=stacked.index, columns=stacked.columns)
 
 def crack_egg(egg, subjects=None, lists=None):
     '''
@@ -196,16 +339,31 @@ def crack_egg(egg, subjects=None, lists=None):
         all_have_features=False
     opts = {}
 
+    all_subjects, all_lists = get_index_levels(egg)
+    all_subjects, all_lists = all_subjects.tolist(), all_lists.tolist()
+
     if subjects is None:
-        subjects = egg.pres.index.levels[0].values.tolist()
+        subjects = all_subjects
     elif type(subjects) is not list:
         subjects = [subjects]
 
     if lists is None:
-        lists = egg.pres.index.levels[1].values.tolist()
+        lists = all_lists
     elif type(lists) is not list:
         lists = [lists]
 
+    subj_pos = _label_positions(all_subjects, subjects, 'Subject')
+    list_pos = _label_positions(all_lists, lists, 'List')
+
+    if getattr(egg, 'arrays', None) is not None:
+        # columnar eggs are sliced without rebuilding nested lists
+        cracked = Egg._from_columnar(
+            egg.arrays.take(subj_pos, list_pos),
+            **_crack_opts(egg, subj_pos, list_pos))
+        rows = (subj_pos[:, None] * len(all_lists) + list_pos).ravel()
+        _crack_cache(egg, cracked, rows)
+        return cracked
+
     idx = pd.IndexSlice
     pres = egg.pres.loc[idx[subjects,lists],egg.pres.columns]
     rec = egg.rec.loc[idx[subjects,lists],egg.rec.columns]
@@ -217,19 +375,64 @@ def crack_egg(egg, subjects=None, lists=None):
         features = egg.features.loc[idx[subjects,lists],egg.features.columns]
         opts['features'] = [features.loc[sub,:].values.tolist() for sub in subjects]
 
+    opts.update(_crack_opts(egg, subj_pos, list_pos))
+
+    cracked = Egg(pres=pres, rec=rec, **opts)
+    _crack_cache(egg, cracked, egg.pres.index.get_indexer(
+        pd.MultiIndex.from_product([subjects, lists])))
+    return cracked
+
+def _crack_cache(egg, cracked, rows):
+    """
+    Hands the rows of the cached recall matrices of an egg to a cracked egg,
+    so analyses of the subset don't recompute them
+    """
+    cache = getattr(egg, 'recmat_cache', None)
+    if cache is not None and cache.info()['keys'] and (rows >= 0).all():
+        cracked.recmat_cache = cache.take(rows)
+
+def _label_positions(labels, selected, name='Subject'):
+    """
+    Positions of the selected labels among the index labels of an egg
+
+    Parameters
+    ----------
+    labels : list
+        Subject (or list) labels of the egg
+
+    selected : list
+        Labels to look up
+
+    name : str
+        Name of the index level, for the error message
+
+    Returns
+    ----------
+    positions : np.ndarray
+        Position of each selected label in labels
+
+    """
+    positions = pd.Index(labels).get_indexer(selected)
+    if (positions < 0).any():
+        missing = [l for l, p in zip(selected, positions) if p < 0]
+        raise ValueError('%s label(s) not found in egg: %s' % (name, missing))
+    return positions
+
+def _crack_opts(egg, subj_pos, list_pos):
+    """
+    Slices the optional fields (groupings, names, dist_funcs, meta) of an egg
+    for crack_egg, given the positions of the selected subjects and lists
+    """
+    opts = {}
+
     # Preserve listgroup if it exists
     if hasattr(egg, 'listgroup') and egg.listgroup is not None:
-        # Get list indices for slicing listgroup
-        all_lists = egg.pres.index.levels[1].values.tolist()
-        list_indices = [all_lists.index(l) for l in lists]
         # Slice listgroup for selected subjects and lists
         sliced_listgroup = []
-        all_subjects = egg.pres.index.levels[0].values.tolist()
-        for sub in subjects:
-            sub_idx = all_subjects.index(sub)
+        for sub_idx in subj_pos:
             if sub_idx < len(egg.listgroup):
                 sub_listgroup = egg.listgroup[sub_idx]
-                sliced_listgroup.append([sub_listgroup[i] for i in list_indices if i < len(sub_listgroup)])
+                sliced_listgroup.append([sub_listgroup[i] for i in list_pos if i < len(sub_listgroup)])
         if sliced_listgroup:
             opts['listgroup'] = sliced_listgroup
 
@@ -238,16 +441,51 @@ def crack_egg(egg, subjects=None, lists=None):
         opts['listname'] = egg.listname
     if hasattr(egg, 'subjgroup') and egg.subjgroup is not None:
         # Slice subjgroup for selected subjects
-        all_subjects = egg.pres.index.levels[0].values.tolist()
-        opts['subjgroup'] = [egg.subjgroup[all_subjects.index(s)] for s in subjects if all_subjects.index(s) < len(egg.subjgroup)]
+        opts['subjgroup'] = [egg.subjgroup[i] for i in subj_pos if i < len(egg.subjgroup)]
     if hasattr(egg, 'subjname') and egg.subjname is not None:
         opts['subjname'] = egg.subjname
     if hasattr(egg, 'dist_funcs') and egg.dist_funcs is not None:
         opts['dist_funcs'] = egg.dist_funcs
     if hasattr(egg, 'meta') and egg.meta is not None:
         opts['meta'] = egg.meta
+    return opts
+
+def get_index_levels(egg):
+    """
+    Returns the subject and list index labels of an egg
+
+    Columnar eggs answer from their arrays, so the pres DataFrame is not built
+    """
+    if getattr(egg, 'arrays', None) is not None:
+        return egg.arrays.subjects, egg.arrays.lists
+    return egg.pres.index.levels[0].values, egg.pres.index.levels[1].values
+
+def get_list_lengths(egg):
+    """
+    Returns the number of presented items in each list of an egg, counting
+    from the start of the list up to the first missing item
+
+    Parameters
+    ----------
+    egg : quail.Egg
+        Data to measure
+
+    Returns
+    ----------
+    lengths : np.ndarray
+        One length per row of egg.pres
+
+    """
+    if getattr(egg, 'arrays', None) is not None:
+        return egg.arrays.pres_lengths
+
+    def has_item(cell):
+        if isinstance(cell, dict) and 'item' in cell:
+            return not (isinstance(cell['item'], float) and pd.isna(cell['item']))
+        return False
 
-    return Egg(pres=pres, rec=rec, **opts)
+    present = np.frompyfunc(has_item, 1, 1)(egg.pres.values).astype(bool)
+    return np.cumprod(present, axis=1).sum(axis=1)
 
 def df2list(df):
     """
@@ -10,15 +10,10 @@ import pickle
 import os
 import pandas as pd
 import numpy as np
-import joblib
-from .egg import Egg, FriedEgg
+from .egg import Egg, FriedEgg, FRIED_FORMAT_NAME
+from .columnar import EggArrays, read_directory
 from .helpers import parse_egg, stack_eggs
 
-try:
-    from sqlalchemy import create_engine, MetaData, Table
-except:
-    pass
-
 def load(filepath, update=True):
     """
     Loads eggs, fried eggs ands example data
@@ -46,10 +41,10 @@ def load(filepath, update=True):
         return load_egg(fpath, update=False)
     elif filepath == 'naturalistic':
         fpath = os.path.dirname(os.path.abspath(__file__)) + '/data/naturalistic.egg'
-    elif filepath.split('.')[-1]=='egg':
-        return load_egg(filepath, update=update)
     elif filepath.split('.')[-1]=='fegg':
         return load_fegg(filepath, update=False)
+    elif filepath.split('.')[-1]=='egg' or os.path.isdir(filepath):
+        return load_egg(filepath, update=update)
     else:
         raise ValueError('Could not load file.')
 
@@ -57,6 +52,8 @@ def load_fegg(filepath, update=True):
     """
     Loads pickled egg
 
+    Results saved with format='columnar' (a directory) are memory-mapped.
+
     Parameters
     ----------
     filepath : str
@@ -71,6 +68,14 @@ def load_fegg(filepath, update=True):
         A loaded unpickled egg
 
     """
+    if os.path.isdir(filepath):
+        info, arrays, header = read_directory(filepath, format=FRIED_FORMAT_NAME)
+        if 'names' in info:
+            # written before the names moved to the header
+            header.setdefault('names', info['names'])
+        return FriedEgg.from_tensor(**dict(arrays, **header))
+
+    import joblib
     try:
         egg = FriedEgg(**joblib.load(filepath))
     except ValueError as e:
@@ -88,13 +93,16 @@ def load_egg(filepath, update=True):
     """
     Loads pickled egg
 
+    Eggs saved with format='columnar' (a directory) are memory-mapped, so
+    only the lists and features that are used get read from disk.
+
     Parameters
     ----------
     filepath : str
         Location of pickled egg
 
     update : bool
-        If true, updates egg to latest format
+        If true, updates egg to latest format (ignored for columnar eggs)
 
     Returns
     ----------
@@ -102,8 +110,18 @@ def load_egg(filepath, update=True):
         A loaded unpickled egg
 
     """
+    if os.path.isdir(filepath):
+        # columnar directory format: memory-mapped, already up to date
+        arrays, header = EggArrays.load(filepath, mmap_mode='r')
+        return Egg._from_columnar(arrays, **header)
+
+    import joblib
     try:
-        egg = Egg(**joblib.load(filepath))
+        egg = joblib.load(filepath)
+        if 'columnar' in egg:
+            egg = Egg._from_columnar(EggArrays.from_dict(egg.pop('columnar')), **egg)
+        else:
+            egg = Egg(**egg)
     except:
         # if error, try loading old format
         with open(filepath, 'rb') as f:
@@ -120,6 +138,55 @@ def load_egg(filepath, update=True):
     else:
         return egg
 
+def convert_egg(filepath, outpath):
+    """
+    Converts an egg file to the columnar directory format
+
+    Parameters
+    ----------
+    filepath : str
+        Location of the egg to convert
+
+    outpath : str
+        Location of the columnar egg directory to write ('.egg' is appended
+        if missing)
+
+    Returns
+    ----------
+    outpath : str
+        Location of the converted egg
+
+    """
+    if outpath[-4:] != '.egg':
+        outpath += '.egg'
+    if os.path.abspath(filepath) == os.path.abspath(outpath):
+        raise ValueError('Output path must differ from the input egg.')
+    egg = load_egg(filepath)
+    egg.save(outpath, format='columnar')
+    return outpath
+
+def load_shards(path):
+    """
+    Lazily loads the eggs stored in a directory, one at a time
+
+    Parameters
+    ----------
+    path : str
+        Directory of egg files (.egg files or columnar egg directories),
+        loaded in sorted order
+
+    Returns
+    ----------
+    shards : generator
+        Generator of Egg data objects, e.g. to pass to quail.analyze
+
+    """
+    if not os.path.isdir(path) or os.path.isfile(os.path.join(path, 'header.json')):
+        raise ValueError(str(path) + ' is not a directory of eggs.')
+    for name in sorted(os.listdir(path)):
+        if name[-4:] == '.egg':
+            yield load_egg(os.path.join(path, name))
+
 def loadEL(dbpath=None, recpath=None, remove_subs=None, wordpool=None, groupby=None, experiments=None,
     filters=None): # pragma: no cover
     '''
@@ -143,6 +210,7 @@ def loadEL(dbpath=None, recpath=None, remove_subs=None, wordpool=None, groupby=N
         data_column_name = 'datastring'
 
         # boilerplace sqlalchemy setup
+        from sqlalchemy import create_engine, MetaData, Table
         engine = create_engine(db_url)
         metadata = MetaData()
         metadata.bind = engine
@@ -194,6 +262,7 @@ def loadEL(dbpath=None, recpath=None, remove_subs=None, wordpool=None, groupby=N
         data_column_name = 'codeversion'
 
         # boilerplace sqlalchemy setup
+        from sqlalchemy import create_engine, MetaData, Table
         engine = create_engine(db_url)
         metadata = MetaData()
         metadata.bind = engine
@@ -575,6 +644,7 @@ def load_example_data(dataset='automatic'):
     assert dataset in ['automatic', 'manual', 'naturalistic', 'cmr', 'murd62', 'frfr'], \
         "Dataset can only be automatic, manual, naturalistic, cmr, murd62, or frfr"
 
+    import joblib
     if dataset == 'cmr':
         # open cmr egg (Polyn et al. 2009 data)
         egg = Egg(**joblib.load(os.path.dirname(os.path.abspath(__file__)) + '/data/cmr.egg'))
@@ -6,16 +6,30 @@ import seaborn as sns
 from .helpers import *
 import matplotlib.pyplot as plt
 import matplotlib as mpl
+from functools import partial
 
 mpl.rcParams['pdf.fonttype'] = 42
 
 # Default font sizes
 DEFAULT_LABEL_FONTSIZE = 14
 
+# results with more rows than this are plotted from their summary by default
+AGGREGATE_ROWS = 1000
+
+# swarm plots of more values than MAX_POINTS are drawn from a subsample of
+# SWARM_SAMPLE points (a seaborn swarm of a few hundred points already takes
+# about half a second), violin plots of more than MAX_VIOLIN_POINTS values
+# from binned KDEs
+SWARM_SAMPLE = 400
+MAX_POINTS = SWARM_SAMPLE
+MAX_VIOLIN_POINTS = 20000
+
 def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
          listname='List', subjconds=None, listconds=None, plot_type=None,
          plot_style=None, title=None, legend=None, xlim=None, ylim=None,
-         save_path=None, show=True, ax=None, **kwargs):
+         save_path=None, show=True, ax=None, aggregate=None, interval='ci',
+         level=95, max_points=MAX_POINTS, max_violin_points=MAX_VIOLIN_POINTS,
+         **kwargs):
     """
     General plot function that groups data by subject/list number and performs analysis.
 
@@ -78,6 +92,29 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
     ax : Matplotlib.Axes object or None
         A plot object to draw to. If None, a new one is created and returned.
 
+    aggregate : bool or None
+        If True, bar and line plots are drawn from the mean and interval of
+        each group, computed once (see quail.helpers.summarize_tidy), rather
+        than by seaborn, which bootstraps its confidence intervals on every
+        draw.  If None (default), results with more than AGGREGATE_ROWS rows
+        are aggregated.  Swarm and violin plots are not affected.
+
+    interval : str or None
+        Interval drawn around the means of aggregated plots: 'ci' (default),
+        'se', 'sd', 'bootstrap' or None
+
+    level : float
+        Confidence level of the interval, in percent (default 95)
+
+    max_points : int or None
+        Swarm plots of more values than this (default: SWARM_SAMPLE) are
+        drawn in a large data mode: a random subsample of SWARM_SAMPLE points
+        is shown, with the number of values of each group in the tick labels.
+        If None, seaborn is always used.
+
+    max_violin_points : int or None
+        Violin plots of more values than this are drawn from KDEs of the
+        values binned on a fixed grid.  If None, seaborn is always used.
 
     Returns
     ----------
@@ -88,6 +125,13 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
 
     sns.set_palette("viridis")
     plot_type = plot_type if plot_type is not None else 'list'
+    if aggregate is None:
+        aggregate = results.data.shape[0] > AGGREGATE_ROWS
+    if aggregate:
+        barplot = partial(_summary_barplot, interval=interval, level=level)
+        lineplot = partial(_summary_lineplot, interval=interval, level=level)
+    else:
+        barplot, lineplot = sns.barplot, sns.lineplot
     
     def plot_acc(data, plot_style, plot_type, listname, subjname, **kwargs):
 
@@ -96,11 +140,11 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plot_type = plot_type if plot_type is not None else 'list'
 
         if plot_style == 'bar':
-            plot_func = sns.barplot
+            plot_func = barplot
         elif plot_style == 'swarm':
-            plot_func = sns.swarmplot
+            plot_func = swarmplot
         elif plot_style == 'violin':
-            plot_func = sns.violinplot
+            plot_func = violinplot
 
         if plot_type == 'list':
             ax = plot_func(data=data, x=listname, y="Accuracy", hue=listname, legend=False, **kwargs)
@@ -120,11 +164,11 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plot_type = plot_type if plot_type is not None else 'list'
 
         if plot_style == 'bar':
-            plot_func = sns.barplot
+            plot_func = barplot
         elif plot_style == 'swarm':
-            plot_func = sns.swarmplot
+            plot_func = swarmplot
         elif plot_style == 'violin':
-            plot_func = sns.violinplot
+            plot_func = violinplot
 
         if plot_type == 'list':
             ax = plot_func(data=data, x=listname, y="Temporal clustering score", hue=listname, legend=False, **kwargs)
@@ -144,11 +188,11 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plot_type = plot_type if plot_type is not None else 'list'
 
         if plot_style == 'bar':
-            plot_func = sns.barplot
+            plot_func = barplot
         elif plot_style == 'swarm':
-            plot_func = sns.swarmplot
+            plot_func = swarmplot
         elif plot_style == 'violin':
-            plot_func = sns.violinplot
+            plot_func = violinplot
 
         if plot_type == 'list':
             ax = plot_func(data=tidy_data, x="Feature", y="Clustering Score", hue=listname, legend=legend, **kwargs)
@@ -168,11 +212,11 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plot_type = plot_type if plot_type is not None else 'list'
 
         if plot_style == 'bar':
-            plot_func = sns.barplot
+            plot_func = barplot
         elif plot_style == 'swarm':
-            plot_func = sns.swarmplot
+            plot_func = swarmplot
         elif plot_style == 'violin':
-            plot_func = sns.violinplot
+            plot_func = violinplot
 
         order = list(tidy_data['Feature'].unique())
         if plot_type == 'list':
@@ -191,9 +235,9 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plot_type = plot_type if plot_type is not None else 'list'
 
         if plot_type == 'subject':
-            ax = sns.lineplot(data = data, x="Position", y="Proportion Recalled", hue=subjname, **kwargs)
+            ax = lineplot(data = data, x="Position", y="Proportion Recalled", hue=subjname, **kwargs)
         elif plot_type == 'list':
-            ax = sns.lineplot(data = data, x="Position", y="Proportion Recalled", hue=listname, **kwargs)
+            ax = lineplot(data = data, x="Position", y="Proportion Recalled", hue=listname, **kwargs)
         ax.set_xlim(0, data['Position'].max())
 
         ax.set_ylabel("Proportion recalled", fontsize=DEFAULT_LABEL_FONTSIZE)
@@ -205,9 +249,9 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plot_type = plot_type if plot_type is not None else 'list'
 
         if plot_type == 'subject':
-            ax = sns.lineplot(data = data, x="Position", y='Probability of Recall: Position ' + str(position), hue=subjname, **kwargs)
+            ax = lineplot(data = data, x="Position", y='Probability of Recall: Position ' + str(position), hue=subjname, **kwargs)
         elif plot_type == 'list':
-            ax = sns.lineplot(data = data, x="Position", y='Probability of Recall: Position ' + str(position), hue=listname, **kwargs)
+            ax = lineplot(data = data, x="Position", y='Probability of Recall: Position ' + str(position), hue=listname, **kwargs)
         ax.set_xlim(0,list_length-1)
 
         ax.set_ylabel('Probability of recall: position ' + str(position), fontsize=DEFAULT_LABEL_FONTSIZE)
@@ -219,15 +263,15 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plot_type = plot_type if plot_type is not None else 'list'
 
         if plot_type == 'subject':
-            ax = sns.lineplot(data=data[data['Position']<0], x="Position", y="Conditional Response Probability", hue=subjname, legend=False, **kwargs)
+            ax = lineplot(data=data[data['Position']<0], x="Position", y="Conditional Response Probability", hue=subjname, legend=False, **kwargs)
             if 'ax' in kwargs:
                 del kwargs['ax']
-            sns.lineplot(data=data[data['Position']>0], x="Position", y="Conditional Response Probability", hue=subjname, ax=ax, legend=False, **kwargs)
+            lineplot(data=data[data['Position']>0], x="Position", y="Conditional Response Probability", hue=subjname, ax=ax, legend=False, **kwargs)
         elif plot_type == 'list':
-            ax = sns.lineplot(data=data[data['Position']<0], x="Position", y="Conditional Response Probability", hue=listname, legend=False, **kwargs)
+            ax = lineplot(data=data[data['Position']<0], x="Position", y="Conditional Response Probability", hue=listname, legend=False, **kwargs)
             if 'ax' in kwargs:
                 del kwargs['ax']
-            sns.lineplot(data=data[data['Position']>0], x="Position", y="Conditional Response Probability", hue=listname, ax=ax, legend=False, **kwargs)
+            lineplot(data=data[data['Position']>0], x="Position", y="Conditional Response Probability", hue=listname, ax=ax, legend=False, **kwargs)
         
         if legend:
             # Deduplicate legend
@@ -273,6 +317,12 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
     # convert to tiny and format for plotting
     tidy_data = format2tidy(results.data, subjname, listname, subjgroup, analysis=results.analysis, position=results.position)
 
+    swarmplot, violinplot = sns.swarmplot, sns.violinplot
+    if max_points is not None and len(tidy_data) > max_points:
+        swarmplot = partial(_sampled_swarmplot, n=SWARM_SAMPLE)
+    if max_violin_points is not None and len(tidy_data) > max_violin_points:
+        violinplot = _binned_violinplot
+
     # Auto-suppress legend if only one group
     # Auto-suppress legend if only one group and user didn't specify
     if legend is None:
@@ -330,3 +380,182 @@ def plot(results, subjgroup=None, subjname='Subject Group', listgroup=None,
         plt.savefig(save_path)
 
     return ax
+
+
+def _summary_barplot(data, x, y, hue=None, order=None, hue_order=None,
+                    palette=None, legend=True, ax=None, interval='ci',
+                    level=95, **kwargs):
+    """
+    Bar plot of the means of y (with error bars) for each x and hue level
+
+    Takes the main arguments of seaborn.barplot, but summarizes the data once
+    with quail.helpers.summarize_tidy.  Other keyword arguments are passed
+    to matplotlib's bar.
+    """
+    ax = ax if ax is not None else plt.gca()
+    by = [x] if hue is None or hue == x else [x, hue]
+    summary = summarize_tidy(data, y, by, interval=interval, level=level)
+    order, hue_levels, colors = _categorical_levels(summary, x, hue, order,
+                                                    hue_order, palette)
+    width = .8 / len(hue_levels)
+    kwargs.setdefault('error_kw', {'ecolor' : '.26'})
+    for i, level_ in enumerate(hue_levels):
+        rows = summary if level_ is None else summary[summary[hue] == level_]
+        rows = rows.set_index(x).reindex(order)
+        yerr = None
+        if interval is not None:
+            yerr = np.abs([rows[y] - rows['low'], rows['high'] - rows[y]])
+        ax.bar(np.arange(len(order)) - .4 + width * (i + .5), rows[y],
+               width=width, yerr=yerr, label=level_,
+               color=colors if hue == x else colors[i], **kwargs)
+    _categorical_axes(ax, x, y, order, hue if legend and len(by) == 2 else None)
+    return ax
+
+
+def _summary_lineplot(data, x, y, hue=None, hue_order=None, palette=None,
+                     legend=True, ax=None, interval='ci', level=95, **kwargs):
+    """
+    Line plot of the means of y (with an error band) over x, one line per hue
+    level
+
+    Takes the main arguments of seaborn.lineplot, but summarizes the data once
+    with quail.helpers.summarize_tidy.  Other keyword arguments are passed
+    to matplotlib's plot.
+    """
+    ax = ax if ax is not None else plt.gca()
+    by = [x] if hue is None else [hue, x]
+    summary = summarize_tidy(data, y, by, interval=interval, level=level)
+    hue_levels = [None]
+    if hue is not None:
+        hue_levels = hue_order if hue_order is not None else list(pd.unique(summary[hue]))
+    colors = sns.color_palette(palette, len(hue_levels))
+    for level_, color in zip(hue_levels, colors):
+        rows = summary if level_ is None else summary[summary[hue] == level_]
+        rows = rows.sort_values(x)
+        ax.plot(rows[x], rows[y], color=color, label=level_, **kwargs)
+        if interval is not None:
+            ax.fill_between(rows[x], rows['low'], rows['high'], color=color,
+                            alpha=.2, linewidth=0)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    if legend and hue is not None:
+        ax.legend(title=hue)
+    return ax
+
+
+def _sampled_swarmplot(data, x, y, hue=None, order=None, n=SWARM_SAMPLE,
+                       random_state=0, **kwargs):
+    """
+    seaborn.swarmplot of a random subsample of about n rows of data, taken
+    evenly from the x (and hue) groups.  The number of values of each x group
+    is added to its tick label.
+    """
+    by = [x] if hue is None or hue == x else [x, hue]
+    if data[y].isna().any():
+        data = data[data[y].notna()]
+    grouped = data.groupby(by, sort=False)
+    codes = grouped.ngroup().to_numpy()
+    sizes = np.bincount(codes)
+    # first rows of each group in a random order
+    rng = np.random.RandomState(random_state)
+    rows = rng.permutation(len(codes))
+    rows = rows[np.argsort(codes[rows], kind='stable')]
+    starts = np.cumsum(sizes) - sizes
+    keep = np.minimum(sizes, max(1, n // len(sizes)))
+    sample = data.iloc[np.concatenate([rows[a:a + k] for a, k in zip(starts, keep)])]
+    counts = data.groupby(x, sort=False).size()
+    order = order if order is not None else list(pd.unique(data[x]))
+    ax = sns.swarmplot(data=sample, x=x, y=y, hue=hue, order=order, **kwargs)
+    ax.set_xticks(np.arange(len(order)))
+    ax.set_xticklabels(['%s\nn=%d' % (label, counts.get(label, 0)) for label in order])
+    return ax
+
+
+def _binned_violinplot(data, x, y, hue=None, order=None, hue_order=None,
+                       palette=None, legend=True, ax=None, gridsize=200,
+                       cut=2, **kwargs):
+    """
+    Violin plot drawn from KDEs computed on a fixed grid
+
+    The values of all groups are binned on one grid at once and each
+    histogram is smoothed with a Gaussian of the Scott bandwidth of its group,
+    so the cost is linear in the number of values.  Each violin extends cut
+    bandwidths past its extreme values and has the same area, as seaborn's;
+    the inner box spans the quartiles, with whiskers to 1.5 IQR.  Other keyword arguments are passed to
+    matplotlib's fill_betweenx.
+    """
+    from scipy.ndimage import gaussian_filter1d
+
+    ax = ax if ax is not None else plt.gca()
+    by = [x] if hue is None or hue == x else [x, hue]
+    data = data[data[y].notna()]
+    values = data[y].to_numpy(dtype=float)
+    grouped = data.groupby(by, sort=False)[y]
+    codes = grouped.ngroup().to_numpy()
+    stats = grouped.agg(['std', 'count', 'min', 'max'])
+    quartiles = grouped.quantile([.25, .5, .75]).unstack()
+    bandwidth = (stats['std'] * stats['count'] ** -.2).fillna(0).to_numpy()
+    low = stats['min'].to_numpy() - cut * bandwidth
+    high = stats['max'].to_numpy() + cut * bandwidth
+    grid = np.linspace(low.min(), high.max(), gridsize)
+    step = grid[1] - grid[0] if high.max() > low.min() else 1.
+    bins = np.clip(np.round((values - grid[0]) / step).astype(int), 0, gridsize - 1)
+    hist = np.bincount(codes * gridsize + bins, minlength=len(stats) * gridsize)
+    density = hist.reshape(len(stats), gridsize) / (stats['count'].to_numpy()[:, np.newaxis] * step)
+    for i, bw in enumerate(bandwidth):
+        if bw > 0:
+            density[i] = gaussian_filter1d(density[i], bw / step, mode='constant')
+        density[i, (grid < low[i] - step / 2) | (grid > high[i] + step / 2)] = 0
+
+    order, hue_levels, colors = _categorical_levels(stats.reset_index(), x, hue, order,
+                                                    hue_order, palette)
+    width = .8 / len(hue_levels)
+    density *= width / 2 / density.max()
+    kwargs.setdefault('edgecolor', '.26')
+    labelled = set() if len(by) == 2 else {0}
+    for row, key in enumerate(stats.index):
+        key = key if isinstance(key, tuple) else (key,)
+        if key[0] not in order:
+            continue
+        i = hue_levels.index(key[1]) if len(by) == 2 else 0
+        center = order.index(key[0]) - .4 + width * (i + .5)
+        color = colors[order.index(key[0])] if hue == x else colors[i]
+        visible = density[row] > 0
+        ax.fill_betweenx(grid[visible], center - density[row, visible],
+                         center + density[row, visible], color=color,
+                         label=key[1] if i not in labelled else None, **kwargs)
+        labelled.add(i)
+        q1, median, q3 = quartiles.iloc[row]
+        whiskers = [max(q1 - 1.5 * (q3 - q1), stats['min'].iloc[row]),
+                    min(q3 + 1.5 * (q3 - q1), stats['max'].iloc[row])]
+        ax.plot([center, center], whiskers, color='.26', linewidth=1)
+        ax.plot([center, center], [q1, q3], color='.26', linewidth=4,
+                solid_capstyle='butt')
+        ax.plot(center, median, 'o', color='white', markersize=3)
+    _categorical_axes(ax, x, y, order, hue if legend and len(by) == 2 else None)
+    return ax
+
+
+def _categorical_levels(summary, x, hue, order, hue_order, palette):
+    """
+    Categories of x and hue (in order of appearance, unless given), and
+    their colors, desaturated as seaborn's
+    """
+    order = list(order) if order is not None else list(pd.unique(summary[x]))
+    hue_levels = [None]
+    if hue is not None and hue != x:
+        hue_levels = list(hue_order) if hue_order is not None else list(pd.unique(summary[hue]))
+    n_colors = len(order) if hue == x else len(hue_levels)
+    colors = [sns.desaturate(c, .75) for c in sns.color_palette(palette, n_colors)]
+    return order, hue_levels, colors
+
+
+def _categorical_axes(ax, x, y, order, legend_title=None):
+    """Ticks, labels and legend of a categorical plot"""
+    ax.set_xticks(np.arange(len(order)))
+    ax.set_xticklabels(order)
+    ax.set_xlim(-.5, len(order) - .5)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    if legend_title is not None:
+        ax.legend(title=legend_title)
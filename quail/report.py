@@ -0,0 +1,366 @@
+"""
+Batch rendering of per-group report figures
+
+`report` draws one figure per group (e.g. per subject) and per analysis, in
+a pool of workers.  The results are summarized once, for all groups, before
+rendering.  Each worker draws with the Agg canvas, without pyplot, and keeps
+one figure per analysis: only the data of its artists (lines, bars, error
+bars, title) is updated from one group to the next.
+"""
+from __future__ import division
+import io
+import os
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+from .analysis.executor import run_chunks
+
+LINE_ANALYSES = ['spc', 'pfr', 'pnr', 'lagcrp']
+BAR_ANALYSES = ['accuracy', 'temporal', 'fingerprint', 'fingerprint_temporal']
+
+YLABELS = {
+    'accuracy' : 'Accuracy',
+    'temporal' : 'Temporal clustering score',
+    'fingerprint' : 'Clustering score',
+    'fingerprint_temporal' : 'Clustering score',
+    'spc' : 'Proportion recalled',
+    'pfr' : 'Probability of recall: position 0',
+    'lagcrp' : 'Conditional response probability',
+}
+
+# figures kept by each worker, by layout
+_templates = {}
+
+
+def report(results, path, groups=None, fmt='png', figsize=(6, 4), dpi=100,
+           backend='processes', n_jobs=-1, chunksize=None, verbose=False):
+    """
+    Renders one figure per group and per analysis, in parallel
+
+    Each figure shows the results of one group for each list group (one line
+    or bar per list group), as quail.plot does for the whole results.  When
+    several result groups are pooled into one report (see groups), the mean
+    over the pooled groups is drawn, with its standard error.
+
+    Parameters
+    ----------
+    results : quail.FriedEgg or list of quail.FriedEgg
+        Analysis results, e.g. the spc, lagcrp, pfr and fingerprint of an
+        egg, with the same groups
+
+    path : str
+        Directory to write the figures to (created if needed), as
+        <group>_<analysis>.<fmt> files.  If path ends with '.zip', the
+        figures are written to one zip archive instead.
+
+    groups : list (optional)
+        Report label of each result group (in the order of the groups of the
+        results, like subjgroup).  By default there is one report per group.
+
+    fmt : str
+        Image format (any format supported by matplotlib's savefig)
+
+    figsize : tuple
+        Size of the figures, in inches
+
+    dpi : int
+        Resolution of the figures
+
+    backend : str
+        One of 'serial', 'threads', 'processes' (default) or 'loky'
+
+    n_jobs : int
+        Number of workers (-1 for all cores)
+
+    chunksize : int or None
+        Number of reports rendered per task (by default, about 4 tasks per
+        worker).  The results are sent to each worker only once.
+
+    verbose : bool
+        If True, prints the number of figures and the throughput
+
+    Returns
+    ----------
+    info : dict
+        The files written ('files', names relative to path), the number of
+        figures ('figures'), the elapsed time ('seconds') and the throughput
+        ('figures_per_second')
+    """
+    start = time.time()
+    if not isinstance(results, (list, tuple)):
+        results = [results]
+    archive = path.endswith('.zip')
+    panels = [_summarize(r, groups) for r in results]
+    keys = [p['key'] for p in panels]
+    if len(set(keys)) < len(keys):
+        raise ValueError('Results must be of different analyses.')
+    labels = panels[0]['labels']
+    for p in panels[1:]:
+        if not np.array_equal(p['labels'], labels):
+            raise ValueError('Results must have the same groups.')
+    if not archive:
+        os.makedirs(path, exist_ok=True)
+
+    payload = {
+        'panels' : panels,
+        'names' : [_filename(label) for label in labels],
+        'path' : None if archive else path,
+        'fmt' : fmt,
+        'figsize' : tuple(figsize),
+        'dpi' : dpi,
+    }
+    rendered = [f for files in run_chunks(_render_report, payload,
+                                          list(range(len(labels))),
+                                          backend=backend, n_jobs=n_jobs,
+                                          chunksize=chunksize)
+                for f in files]
+
+    if archive:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+            for name, data in rendered:
+                zf.writestr(name, data)
+        files = [name for name, _ in rendered]
+    else:
+        files = rendered
+
+    seconds = time.time() - start
+    info = {
+        'files' : files,
+        'figures' : len(files),
+        'seconds' : seconds,
+        'figures_per_second' : len(files) / seconds if seconds > 0 else np.inf,
+    }
+    if verbose:
+        print('Rendered %d figures in %.2f s (%.1f figures/s)'
+              % (len(files), seconds, info['figures_per_second']))
+    return info
+
+
+def _summarize(results, groups):
+    """
+    Means and standard errors of the results of each report group, as
+    (reports x lists x results) arrays, and the layout of their figures
+    """
+    analysis = results.analysis
+    if analysis not in LINE_ANALYSES + BAR_ANALYSES:
+        raise ValueError('Did not recognize analysis.')
+    tensor = results.tensor
+    values = np.asarray(tensor['values'], dtype=float)
+    if groups is None:
+        codes, labels = np.arange(len(values)), np.asarray(tensor['groups'])
+    else:
+        if len(groups) != len(values):
+            raise ValueError('groups must have one label per result group.')
+        codes, labels = pd.factorize(np.asarray(list(groups), dtype=object))
+        labels = np.asarray(labels)
+
+    # sums over the result groups of each report
+    shape = (len(labels),) + values.shape[1:]
+    n, total, squares = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    valid = ~np.isnan(values)
+    np.add.at(n, codes, valid)
+    np.add.at(total, codes, np.where(valid, values, 0))
+    np.add.at(squares, codes, np.where(valid, values, 0) ** 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        sem = np.sqrt(np.maximum(squares - n * mean ** 2, 0) / (n - 1) / n)
+
+    key = analysis
+    if analysis == 'pnr':
+        key += str(results.position)
+    columns = np.asarray(tensor['columns'])
+    if analysis == 'lagcrp':
+        columns = np.arange(len(columns)) - len(columns) // 2
+    elif analysis in LINE_ANALYSES:
+        columns = np.arange(len(columns))
+    return {
+        'key' : key,
+        'analysis' : analysis,
+        'ylabel' : YLABELS.get(analysis, 'Probability of recall: position '
+                               + str(results.position)),
+        'labels' : labels,
+        'lists' : list(np.asarray(tensor['lists'])),
+        'listname' : tensor['names'][1],
+        'columns' : list(columns),
+        'mean' : mean,
+        'sem' : sem,
+    }
+
+
+def _filename(label):
+    """File name prefix of a report label"""
+    return str(label).replace(os.sep, '_')
+
+
+def _render_report(payload, r):
+    """
+    Renders the figures of report r (in a worker).  Returns the file names
+    written, or (name, bytes) pairs for archives.
+    """
+    rendered = []
+    for panel in payload['panels']:
+        template = _get_template(panel, payload['figsize'], payload['dpi'])
+        name = '%s_%s.%s' % (payload['names'][r], panel['key'], payload['fmt'])
+        template.update(panel['mean'][r], panel['sem'][r], str(panel['labels'][r]))
+        if payload['path'] is None:
+            buf = io.BytesIO()
+            template.save(buf, payload['fmt'])
+            rendered.append((name, buf.getvalue()))
+        else:
+            template.save(os.path.join(payload['path'], name), payload['fmt'])
+            rendered.append(name)
+    return rendered
+
+
+def _get_template(panel, figsize, dpi):
+    """Figure of a panel layout, created once per process"""
+    key = (panel['analysis'], panel['ylabel'], tuple(panel['lists']),
+           tuple(panel['columns']), figsize, dpi)
+    if key not in _templates:
+        _templates[key] = FigureTemplate(panel, figsize, dpi)
+    return _templates[key]
+
+
+class FigureTemplate(object):
+    """
+    Figure of one analysis whose artists are updated for each report
+
+    Parameters
+    ----------
+    panel : dict
+        Layout of the figure: analysis, ylabel, lists, listname and columns
+
+    figsize : tuple
+        Size of the figure, in inches
+
+    dpi : int
+        Resolution of the figure
+
+    """
+
+    def __init__(self, panel, figsize=(6, 4), dpi=100):
+        import seaborn as sns
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection
+
+        self.analysis = panel['analysis']
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        ax = self.ax = self.fig.add_subplot(111)
+        lists, columns = panel['lists'], panel['columns']
+        colors = sns.color_palette('viridis', len(lists))
+        self.x = np.asarray(columns)
+
+        if self.analysis in LINE_ANALYSES:
+            self.lines, self.bands = [], []
+            for lst, color in zip(lists, colors):
+                self.lines.append(ax.plot(self.x, np.zeros(len(self.x)), color=color,
+                                          label=str(lst))[0])
+                self.bands.append(ax.fill_between(self.x, 0, 0, color=color,
+                                                  alpha=.2, linewidth=0))
+            if self.analysis == 'lagcrp':
+                ax.set_xlim(-5, 5)
+                ax.set_xlabel('Lag')
+            else:
+                ax.set_xlim(0, max(len(self.x) - 1, 1))
+                ax.set_xlabel('Position')
+        else:
+            # bars of each column, dodged by list
+            width = .8 / len(lists)
+            self.bars = []
+            for i, (lst, color) in enumerate(zip(lists, colors)):
+                pos = np.arange(len(columns)) - .4 + width * (i + .5)
+                self.bars.append(ax.bar(pos, np.zeros(len(columns)), width=width,
+                                        color=sns.desaturate(color, .75),
+                                        label=str(lst)))
+            self.errors = LineCollection([], colors='.26')
+            ax.add_collection(self.errors)
+            if self.analysis in ['fingerprint', 'fingerprint_temporal']:
+                ax.set_xticks(np.arange(len(columns)))
+                ax.set_xticklabels([str(c) for c in columns])
+                ax.set_xlabel('Feature')
+            else:
+                ax.set_xticks([])
+                ax.set_xlabel(panel['listname'])
+            ax.set_xlim(-.5, len(columns) - .5)
+        ax.set_ylim(0, 1)
+        ax.set_ylabel(panel['ylabel'], fontsize=14)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        if len(lists) > 1:
+            ax.legend(title=panel['listname'])
+        self.title = ax.set_title('')
+
+        # the axes are drawn once; the artists updated for each report are
+        # drawn over a copy of them
+        if self.analysis in LINE_ANALYSES:
+            self.dynamic = self.bands + self.lines
+        else:
+            self.dynamic = [bar for bars in self.bars for bar in bars] + [self.errors]
+        if ax.get_legend() is not None:
+            self.dynamic.append(ax.get_legend())
+        self.dynamic.append(self.title)
+        for artist in self.dynamic:
+            artist.set_animated(True)
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+
+    def update(self, mean, sem, title):
+        """
+        Sets the data of the figure
+
+        Parameters
+        ----------
+        mean, sem : np.ndarray
+            (lists x results) means and standard errors (NaN to hide)
+
+        title : str
+            Title of the figure
+        """
+        self.title.set_text(title)
+        if self.analysis in LINE_ANALYSES:
+            low, high = mean - sem, mean + sem
+            if self.analysis == 'lagcrp':
+                # no line through lag 0
+                mean = np.where(self.x == 0, np.nan, mean)
+            for line, band, m, lo, hi in zip(self.lines, self.bands, mean, low, high):
+                line.set_ydata(m)
+                ok = ~np.isnan(lo) & ~np.isnan(hi)
+                band.set_verts([np.concatenate([
+                    np.column_stack([self.x[ok], lo[ok]]),
+                    np.column_stack([self.x[ok], hi[ok]])[::-1]])] if ok.any() else [])
+        else:
+            segments = []
+            for bars, m, s in zip(self.bars, mean, sem):
+                for bar, height, err in zip(bars, m, s):
+                    bar.set_height(0 if np.isnan(height) else height)
+                    if not np.isnan(err):
+                        x = bar.get_x() + bar.get_width() / 2
+                        segments.append([(x, height - err), (x, height + err)])
+            self.errors.set_segments(segments)
+
+    def save(self, fname, fmt='png'):
+        """
+        Writes the figure to a file name or file object.  PNG images are
+        drawn over the background of the template; other formats are drawn
+        in full.
+        """
+        if fmt != 'png':
+            for artist in self.dynamic:
+                artist.set_animated(False)
+            try:
+                self.fig.savefig(fname, format=fmt)
+            finally:
+                for artist in self.dynamic:
+                    artist.set_animated(True)
+            return
+        from PIL import Image
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+        for artist in self.dynamic:
+            self.ax.draw_artist(artist)
+        dpi = self.fig.dpi
+        Image.fromarray(np.asarray(canvas.buffer_rgba())).save(
+            fname, format='png', dpi=(dpi, dpi))
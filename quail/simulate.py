@@ -1,18 +1,254 @@
+import os
+from functools import lru_cache
 import pandas as pd
 import numpy as np
-import os
+from .egg import Egg
+from .analysis.clustering import _check_random_state
+
+FEATURES = ['category', 'size', 'color', 'length']
+
+
+@lru_cache(maxsize=None)
+def _wordpool():
+    """The wordpool, read once per session"""
+    path = os.path.join(os.path.dirname(__file__), 'data/cut_wordpool.csv')
+    return pd.read_csv(path)
+
+
+@lru_cache(maxsize=None)
+def _pool_arrays():
+    """Columns of the wordpool as arrays"""
+    wp = _wordpool()
+    words = wp['WORD'].to_numpy(dtype=object)
+    return {
+        'words' : words,
+        'group' : wp['GROUP'].to_numpy(),
+        'category' : wp['CATEGORY'].to_numpy(dtype=object),
+        'size' : wp['SIZE'].to_numpy(dtype=object),
+        'length' : np.array([len(w) for w in words]),
+        'category_code' : pd.factorize(wp['CATEGORY'])[0],
+    }
+
 
 def simulate_list(nwords=16, nrec=10, ncats=4):
     """A function to simulate a list"""
 
     # load wordpool
-    # Assuming relative to this file
-    path = os.path.join(os.path.dirname(__file__), 'data/cut_wordpool.csv')
-    wp = pd.read_csv(path)
+    wp = _wordpool()
 
     # get one list - pick a random group (groups are 1-16)
     wp = wp[wp['GROUP']==np.random.choice(list(range(1, 17)), 1)[0]].sample(16)
 
     wp['COLOR'] = [[int(np.random.rand() * 255) for i in range(3)] for i in range(16)]
-    
+
     return wp
+
+
+def simulate_egg(n_subjects=10, n_lists=8, list_length=16, recall_rate=.5,
+                 primacy=1., recency=2., contiguity=1., semantic=1.,
+                 intrusion_rate=.05, features=('category', 'size', 'color'),
+                 random_state=None, backend='columnar', subjects=None):
+    """
+    Simulates a free recall experiment with words from the wordpool
+
+    Lists of up to 16 words are drawn from one group of the wordpool (4
+    categories of 4 words), like simulate_list; longer lists are drawn from
+    the whole pool.  Each word is recalled with a probability set by the
+    recall rate and its serial position.  The recalled words are then ordered
+    one output position at a time, for all lists at once: the first recall is
+    weighted by serial position, the following ones by the lag to, and the
+    category of, the previously recalled item.
+
+    Parameters
+    ----------
+    n_subjects, n_lists : int
+        Number of subjects and of lists per subject
+
+    list_length : int
+        Number of words per list (at most the size of the wordpool, 256)
+
+    recall_rate : float
+        Expected fraction of each list that is recalled (the mean of the
+        serial position curve, up to the recall probabilities capped at 1)
+
+    primacy, recency : float
+        Boost of the recall probability of the first and last serial
+        positions, and of their probability of being recalled first (0 for
+        both: flat serial position curve)
+
+    contiguity : float
+        Decay of the transition probabilities with the absolute lag from the
+        previously recalled item (0: no temporal clustering).  It sets the
+        order of the recalls, not which items are recalled.
+
+    semantic : float
+        Log odds boost of transitions to items of the category of the
+        previously recalled item (0: no semantic clustering)
+
+    intrusion_rate : float
+        Probability that a recall is a word from the pool that was not
+        presented (below 1)
+
+    features : list of str
+        Features of the presented words, among 'category', 'size' (strings),
+        'color' (random RGB vector, drawn for each presentation) and 'length'
+        (number of letters)
+
+    random_state : int, RandomState or None
+        Seed of the simulation
+
+    backend : str
+        Backend of the egg, 'columnar' (default) or 'pandas'
+
+    subjects : array-like (optional)
+        Subject labels
+
+    Returns
+    ----------
+    egg : quail.Egg
+        Simulated data
+    """
+    pool = _pool_arrays()
+    n_pool = len(pool['words'])
+    if not 0 < list_length <= n_pool:
+        raise ValueError('list_length must be between 1 and ' + str(n_pool) + '.')
+    if not 0 <= intrusion_rate < 1:
+        raise ValueError('intrusion_rate must be between 0 and 1 (excluded).')
+    if list_length == n_pool and intrusion_rate > 0:
+        raise ValueError('Intrusions need lists shorter than the wordpool.')
+    for name in features:
+        if name not in FEATURES:
+            raise ValueError('Unknown feature ' + str(name) + ', choose among '
+                             + str(FEATURES) + '.')
+    rng = _check_random_state(random_state)
+
+    # draw the lists: the words of the pool sorted by random keys, words of
+    # the drawn group first.  The words after the list are its intrusions.
+    n_rows = n_subjects * n_lists
+    keys = rng.rand(n_rows, n_pool)
+    if list_length <= 16:
+        groups = rng.randint(1, 17, size=n_rows)
+        keys += pool['group'] != groups[:, np.newaxis]
+    order = np.argsort(keys, axis=1)
+    words = order[:, :list_length]
+
+    positions = _simulate_recalls(rng, pool['category_code'][words], recall_rate,
+                                  primacy, recency, contiguity, semantic,
+                                  intrusion_rate)
+    recalled = np.full(positions.shape, -1)
+    hit = positions >= 0
+    recalled[hit] = np.take_along_axis(words, np.maximum(positions, 0), 1)[hit]
+    intrusion = positions == -2
+    others = list_length + rng.randint(n_pool - list_length, size=intrusion.sum()) \
+        if intrusion.any() else 0
+    recalled[intrusion] = order[np.nonzero(intrusion)[0], others]
+
+    shape = (n_subjects, n_lists)
+    pres = pool['words'][words].reshape(shape + (list_length,))
+    rec = np.where(recalled >= 0, pool['words'][recalled], None)
+    feats = {}
+    for name in features:
+        if name == 'color':
+            feats[name] = rng.randint(256, size=shape + (list_length, 3))
+        else:
+            feats[name] = pool[name][words].reshape(pres.shape)
+    return Egg.from_arrays(pres, rec.reshape(shape + (-1,)), features=feats,
+                           subjects=subjects, backend=backend)
+
+
+def simulate_shards(n_subjects, subjects_per_shard=1000, path=None,
+                    random_state=None, **kwargs):
+    """
+    Simulates a large experiment one shard of subjects at a time
+
+    Parameters
+    ----------
+    n_subjects : int
+        Total number of subjects
+
+    subjects_per_shard : int
+        Number of subjects of each egg
+
+    path : str (optional)
+        Directory to save the shards to, as columnar eggs that
+        quail.load_shards reads back in order
+
+    random_state : int, RandomState or None
+        Seed of the simulation.  Each shard is simulated from its own seed,
+        drawn from random_state, so the shards are reproducible (for a given
+        shard size) whether they are all consumed or not.
+
+    **kwargs
+        Other simulate_egg arguments
+
+    Returns
+    ----------
+    shards : generator
+        Generator of eggs, with subjects labelled from 0 to n_subjects - 1
+    """
+    if subjects_per_shard < 1:
+        raise ValueError('subjects_per_shard must be positive.')
+    starts = range(0, n_subjects, subjects_per_shard)
+    if random_state is None:
+        seeds = [None] * len(starts)
+    else:
+        seeds = _check_random_state(random_state).randint(
+            np.iinfo(np.int32).max, size=len(starts))
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+    for i, (start, seed) in enumerate(zip(starts, seeds)):
+        stop = min(start + subjects_per_shard, n_subjects)
+        egg = simulate_egg(n_subjects=stop - start, random_state=seed,
+                           subjects=np.arange(start, stop), **kwargs)
+        if path is not None:
+            egg.save(os.path.join(path, 'shard%05d.egg' % i), format='columnar')
+        yield egg
+
+
+def _simulate_recalls(rng, categories, recall_rate, primacy, recency,
+                      contiguity, semantic, intrusion_rate):
+    """
+    Serial positions of the recalls of each list (-1 after the last recall,
+    -2 for intrusions), given the category codes of the presented items
+    """
+    n_rows, length = categories.shape
+    serial = np.arange(length)
+    # serial position sets which items are recalled, and the first recall
+    weights = 1 + primacy * np.exp(-serial) + recency * np.exp(serial - length + 1)
+    p_recall = np.minimum(recall_rate * weights / weights.mean(), 1.)
+    remaining = rng.rand(n_rows, length) < p_recall
+    # transition weights by lag from the previous recall; the last row is
+    # used for the first recall
+    kernel = np.ones((length + 1, length))
+    kernel[:-1] = np.exp(-contiguity * (np.abs(serial - serial[:, np.newaxis]) - 1))
+    kernel[-1] = weights
+    boost = np.exp(semantic)
+    # each recall is an intrusion with probability intrusion_rate: the
+    # number of intrusions before the last correct recall is negative binomial
+    n_correct = remaining.sum(1)
+    n_intrusions = np.zeros(n_rows, dtype=int)
+    if intrusion_rate > 0:
+        n_intrusions[n_correct > 0] = rng.negative_binomial(
+            n_correct[n_correct > 0], 1 - intrusion_rate)
+    positions = np.full((n_rows, max((n_correct + n_intrusions).max(initial=0), 1)), -1)
+    current = np.full(n_rows, -1)
+    for t in range(positions.shape[1]):
+        rows = np.flatnonzero(n_correct + n_intrusions > 0)
+        intrude = (rng.rand(len(rows)) * (n_correct[rows] + n_intrusions[rows])
+                   < n_intrusions[rows])
+        prev = current[rows]
+        same = categories[rows] == categories[rows, prev, np.newaxis]
+        w = remaining[rows] * kernel[prev]
+        w *= np.where(same & (prev >= 0)[:, np.newaxis], boost, 1.)
+        # steep lag kernels can underflow: fall back to the remaining items
+        w = np.where(w.sum(1, keepdims=True) > 0, w, remaining[rows])
+        cum = np.cumsum(w, axis=1)
+        pick = (cum < rng.rand(len(rows), 1) * cum[:, -1:]).sum(1)
+        ok = ~intrude
+        positions[rows[intrude], t] = -2
+        n_intrusions[rows[intrude]] -= 1
+        positions[rows[ok], t] = pick[ok]
+        remaining[rows[ok], pick[ok]] = False
+        n_correct[rows[ok]] -= 1
+        current[rows[ok]] = pick[ok]
+    return positions
@@ -55,3 +55,10 @@ def test_acc_smooth_correlation_3d():
                [[20, 0, 0], [40, 0, -20], [10, 0, 10]]]]
     egg = Egg(pres=presented,rec=recalled)
     egg.analyze('spc', match='smooth', distance='correlation', features='item').data.values
+
+def test_accuracy_rows_ignores_repeats_and_intrusions():
+    from quail.analysis.accuracy import accuracy_rows
+    presented=[[['cat', 'bat', 'hat', 'goat'],['zoo', 'animal', 'zebra', 'horse']]]
+    recalled=[[['bat', 'bat', 'dog', 'cat'],[]]]
+    egg = Egg(pres=presented,rec=recalled)
+    assert np.allclose(accuracy_rows(egg), [.5, 0.])
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import inspect
+import pytest
+from benchmarks import bench_analysis, bench_egg, bench_fingerprint
+from benchmarks.common import make_egg
+
+
+def _benchmarks():
+    for module in [bench_analysis, bench_egg, bench_fingerprint]:
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ == module.__name__:
+                yield cls
+
+
+@pytest.mark.parametrize('cls', list(_benchmarks()), ids=lambda c: c.__name__)
+def test_benchmarks_run(cls):
+    # every benchmark runs once with the smallest parameters
+    params = [p[0] for p in cls.params]
+    bench = cls()
+    if hasattr(bench, 'setup'):
+        bench.setup(*params)
+    try:
+        for name in dir(bench):
+            if name.startswith(('time_', 'peakmem_')):
+                getattr(bench, name)(*params)
+    finally:
+        if hasattr(bench, 'teardown'):
+            bench.teardown(*params)
+
+
+def test_make_egg():
+    egg = make_egg(n_subjects=3, n_lists=2, list_length=6, n_recalls=4,
+                   n_features=3, feature_dim=5)
+    assert egg.n_subjects == 3
+    assert egg.n_lists == 2
+    assert egg.list_length == 6
+    assert set(egg.arrays.feature_names) >= {'category', 'feature1', 'feature2'}
+    assert egg.arrays.pres_features['feature1'].kind == 'vector'
+    assert (egg.arrays.rec_lengths == 4).all()
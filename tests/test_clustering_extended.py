@@ -95,3 +95,33 @@ def test_fingerprint_permute():
         assert res.shape == (1,)
     else:
         assert isinstance(res, np.floating) or isinstance(res, float)
+
+def test_exact_scores_batched_sequences():
+    from quail.analysis.clustering import _exact_scores
+    rng = np.random.RandomState(0)
+    distmat = rng.rand(6, 6)
+    seqs = np.array([rng.choice(6, 5) for _ in range(20)])
+    scores = _exact_scores(distmat, seqs)
+    for seq, score in zip(seqs, scores):
+        assert np.allclose(_exact_scores(distmat, seq[None, :]), score, equal_nan=True)
+    # 0 -> 1 is the closest transition (rank 4/4), 1 -> 3 ranks 2/3 among 2, 3, 4
+    distmat = np.abs(np.subtract.outer(np.arange(5.), np.arange(5.)))
+    assert np.isclose(_exact_scores(distmat, np.array([[0, 1, 3]]))[0], (1 + 2 / 3.) / 2)
+
+def test_permutation_engine_matches_reference():
+    from quail.analysis.clustering import _exact_scores, _permutations, _permutation_score
+    distmat = np.abs(np.subtract.outer(np.arange(8.), np.arange(8.)))
+    r_idxs = np.arange(8)
+    perms = _permutations(r_idxs, 50, random_state=3)
+    assert perms.shape == (50, 8)
+    assert all(sorted(p) == list(r_idxs) for p in perms)
+    real = _exact_scores(distmat, r_idxs[None, :])[0]
+    permuted = _exact_scores(distmat, perms)
+    reference = np.mean([1 if p < real else 0.5 if p == real else 0 for p in permuted])
+    assert np.isclose(_permutation_score(real, permuted), reference)
+
+def test_fingerprint_permute_random_state():
+    egg = quail.load_example_data(dataset='automatic').crack(subjects=[0], lists=[0, 1])
+    a = egg.analyze('fingerprint', permute=True, n_perms=100, random_state=1).data.values
+    b = egg.analyze('fingerprint', permute=True, n_perms=100, random_state=1).data.values
+    assert np.array_equal(a, b, equal_nan=True)
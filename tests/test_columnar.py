@@ -0,0 +1,232 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import quail
+from quail.egg import Egg
+from quail.columnar import EggArrays, match_positions
+
+presented = [[['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra', 'horse']],
+             [['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra']]]
+recalled = [[['bat', 'cat', 'dog', 'hat'], ['animal', 'horse', 'zoo']],
+            [['goat'], []]]
+
+features = [{'item': w, 'category': c, 'size': s, 'vec': [s, s * 2]}
+            for w, c, s in [('CAT', 'animal', 3), ('DOG', 'animal', 4),
+                            ('SHOE', 'object', 1), ('HORSE', 'animal', 5),
+                            ('CUP', 'object', 2)]]
+
+
+def test_match_positions():
+    pres = np.array([[0, 1, 2, 1], [3, 4, -1, -1]])
+    rec = np.array([[1, 5, 2], [4, 3, -1]])
+    assert np.array_equal(match_positions(pres, rec), [[2, 0, 3], [2, 1, 0]])
+
+
+def test_columnar_arrays():
+    egg = Egg(pres=presented, rec=recalled, backend='columnar')
+    arrays = egg.arrays
+    assert isinstance(arrays, EggArrays)
+    assert arrays.pres_codes.dtype == np.int32
+    assert arrays.pres_codes.shape == (2, 2, 4)
+    assert np.array_equal(arrays.pres_lengths, [4, 4, 4, 3])
+    assert np.array_equal(arrays.rec_lengths, [4, 3, 1, 0])
+    assert egg.n_subjects == 2 and egg.n_lists == 2 and egg.list_length == 4
+
+
+def test_columnar_feature_types():
+    egg = Egg(pres=[[features]], rec=[[features[::-1][:3]]], backend='columnar')
+    cols = egg.arrays.pres_features
+    assert cols['category'].kind == 'categorical'
+    assert cols['size'].kind == 'numeric'
+    assert cols['vec'].kind == 'vector'
+    assert egg.dist_funcs == {'category': 'match', 'size': 'euclidean',
+                              'vec': 'euclidean', 'Temporal': 'euclidean'}
+    assert egg.pres.iloc[0, 1] == {'item': 'DOG', 'category': 'animal', 'size': 4,
+                                   'vec': egg.pres.iloc[0, 1]['vec'], 'Temporal': 1}
+    assert list(egg.pres.iloc[0, 1]['vec']) == [4, 8]
+
+
+def test_columnar_accessors_match_pandas():
+    pandas_egg = Egg(pres=presented, rec=recalled)
+    columnar_egg = Egg(pres=presented, rec=recalled, backend='columnar')
+    assert columnar_egg.get_pres_items().equals(pandas_egg.get_pres_items())
+    assert columnar_egg.get_rec_items().iloc[:, :3].equals(pandas_egg.get_rec_items().iloc[:, :3])
+    assert columnar_egg.get_pres_features().iloc[0, 0] == pandas_egg.get_pres_features().iloc[0, 0]
+
+
+@pytest.mark.parametrize('analysis', ['accuracy', 'spc', 'pfr', 'lagcrp'])
+def test_columnar_analyses_match_pandas(analysis):
+    pandas_egg = Egg(pres=presented, rec=recalled)
+    columnar_egg = Egg(pres=presented, rec=recalled, backend='columnar')
+    assert np.allclose(pandas_egg.analyze(analysis).data.values,
+                       columnar_egg.analyze(analysis).data.values, equal_nan=True)
+
+
+def test_columnar_fingerprint_matches_pandas():
+    rec = [features[3], features[1], features[0], features[4]]
+    pandas_egg = Egg(pres=[[features]], rec=[[rec]])
+    columnar_egg = Egg(pres=[[features]], rec=[[rec]], backend='columnar')
+    assert np.allclose(pandas_egg.analyze('fingerprint').data.values,
+                       columnar_egg.analyze('fingerprint').data.values)
+
+
+def test_columnar_crack():
+    egg = Egg(pres=presented, rec=recalled, backend='columnar', subjgroup=['a', 'b'])
+    cracked = egg.crack(subjects=[1], lists=[0])
+    assert cracked.backend == 'columnar'
+    assert cracked.n_subjects == 1 and cracked.n_lists == 1
+    assert cracked.subjgroup == ['b']
+    assert list(cracked.get_rec_items().iloc[0].dropna()) == ['goat']
+
+
+def test_columnar_save_load(tmpdir):
+    egg = Egg(pres=presented, rec=recalled, backend='columnar', meta={'foo': 'bar'})
+    path = str(tmpdir.join('columnar.egg'))
+    egg.save(path)
+    assert os.path.exists(path)
+    loaded = quail.load_egg(path, update=False)
+    assert loaded.backend == 'columnar'
+    assert loaded.meta == {'foo': 'bar'}
+    assert np.allclose(loaded.analyze('spc').data.values,
+                       egg.analyze('spc').data.values, equal_nan=True)
+
+
+def size_distance(a, b):
+    return abs(a - b)
+
+
+def test_columnar_directory_format(tmpdir):
+    egg = Egg(pres=[[features]], rec=[[features[::-1][:3]]], backend='columnar',
+              subjgroup=['a'], meta={'foo': 'bar'}, dist_funcs={'size': size_distance})
+    path = str(tmpdir.join('dir.egg'))
+    egg.save(path, format='columnar')
+    assert os.path.isdir(path)
+    loaded = quail.load(path)
+    assert isinstance(loaded.arrays.pres_codes, np.memmap)
+    assert loaded.meta == {'foo': 'bar'} and loaded.subjgroup == ['a']
+    assert loaded.dist_funcs['size'](1, 3) == 2
+    assert loaded.arrays.pres_features['category'].kind == 'categorical'
+    assert loaded.get_pres_items().equals(egg.get_pres_items())
+    assert np.array_equal(loaded.arrays.rec_pos, egg.arrays.rec_pos)
+    assert np.allclose(loaded.analyze('lagcrp').data.values,
+                       egg.analyze('lagcrp').data.values, equal_nan=True)
+    # saving again replaces the directory
+    loaded.crack(lists=[0]).save(path, format='columnar')
+    assert quail.load(path).n_lists == 1
+
+
+def test_convert_egg(tmpdir):
+    egg = Egg(pres=presented, rec=recalled, meta={'foo': 'bar'})
+    src = str(tmpdir.join('pandas.egg'))
+    egg.save(src)
+    dst = quail.convert_egg(src, str(tmpdir.join('converted')))
+    assert dst.endswith('.egg') and os.path.isdir(dst)
+    loaded = quail.load(dst)
+    assert loaded.backend == 'columnar' and loaded.meta == {'foo': 'bar'}
+    assert np.allclose(loaded.analyze('spc').data.values,
+                       egg.analyze('spc').data.values, equal_nan=True)
+    with pytest.raises(ValueError):
+        quail.convert_egg(src, src)
+    with pytest.raises(ValueError):
+        egg.save(src, format='columnar')
+
+
+def test_columnar_setter_rebuilds_arrays():
+    egg = Egg(pres=presented, rec=recalled, backend='columnar')
+    other = Egg(pres=presented, rec=[[['cat'], ['zoo']], [['cat'], ['zoo']]])
+    egg.rec = other.rec
+    assert np.array_equal(egg.arrays.rec_lengths, [1, 1, 1, 1])
+
+
+def test_bad_backend():
+    with pytest.raises(ValueError):
+        Egg(pres=presented, rec=recalled, backend='sql')
+
+
+def _padded(lists, width):
+    out = np.full((len(lists), len(lists[0]), width), None, dtype=object)
+    for s, sub in enumerate(lists):
+        for l, lst in enumerate(sub):
+            out[s, l, :len(lst)] = lst
+    return out
+
+
+@pytest.mark.parametrize('backend', ['columnar', 'pandas'])
+def test_from_arrays_matches_constructor(backend):
+    egg = Egg(pres=presented, rec=recalled)
+    fast = Egg.from_arrays(_padded(presented, 4), _padded(recalled, 4),
+                           backend=backend)
+    assert fast.backend == backend
+    assert (fast.n_subjects, fast.n_lists, fast.list_length) == (2, 2, 4)
+    assert fast.feature_names == egg.feature_names
+    for analysis in ['accuracy', 'spc', 'pfr', 'lagcrp']:
+        assert np.allclose(fast.analyze(analysis).data.values,
+                           egg.analyze(analysis).data.values, equal_nan=True)
+
+
+def test_from_arrays_features():
+    pres = np.array([['CAT', 'DOG', 'SHOE'], ['HORSE', 'CUP', 'CAT']])
+    rec = np.array([['DOG', None, 'CAT'], ['CUP', 'HORSE', None]], dtype=object)
+    egg = Egg.from_arrays(pres, rec, features={
+        'size': [[3, 4, 1], [5, 2, 3]],
+        'category': [['animal', 'animal', 'object'], ['animal', 'object', 'animal']],
+        'vec': [[[3, 6], [4, 8], [1, 2]], [[5, 10], [2, 4], [3, 6]]]})
+    cols = egg.arrays.pres_features
+    assert [cols[k].kind for k in ['size', 'category', 'vec', 'Temporal']] == \
+        ['numeric', 'categorical', 'vector', 'numeric']
+    # recalls are left-aligned
+    assert np.array_equal(egg.arrays.rec_pos[0], [[2, 1], [2, 1]])
+    cell = egg.arrays.cell('pres', 0, 1, 1)
+    assert np.array_equal(cell.pop('vec'), [2, 4])
+    assert cell == {'item': 'CUP', 'size': 2, 'category': 'object', 'Temporal': 1}
+    assert egg.pres.iloc[1, 1]['category'] == 'object'
+
+    with pytest.raises(ValueError):
+        Egg.from_arrays(pres, rec[:1])
+    with pytest.raises(ValueError):
+        Egg.from_arrays(pres, rec, features={'size': [1, 2, 3]})
+
+
+def test_from_long_dataframe():
+    rows = [(s, l, 'pres', w, k) for s, sub in enumerate(presented)
+            for l, lst in enumerate(sub) for k, w in enumerate(lst)]
+    rows += [(s, l, 'rec', w, k) for s, sub in enumerate(recalled)
+             for l, lst in enumerate(sub) for k, w in enumerate(lst)]
+    df = pd.DataFrame(rows, columns=['Subject', 'List', 'Phase', 'item', 'Position'])
+    df['length'] = df['item'].str.len()
+    egg = Egg(pres=presented, rec=recalled)
+    for table, position in [(df, 'Position'), (df.iloc[::-1], 'Position'),
+                            (df.drop(columns='Position'), None)]:
+        fast = Egg.from_long_dataframe(table, position=position)
+        assert fast.arrays.feature_names == ['length', 'Temporal']
+        assert np.allclose(fast.analyze('spc').data.values,
+                           egg.analyze('spc').data.values, equal_nan=True)
+    with pytest.raises(ValueError):
+        Egg.from_long_dataframe(df, phase='Stage')
+
+
+def test_concatenate():
+    first = [[{'item': 'CAT', 'category': 'animal', 'size': 3},
+              {'item': 'SHOE', 'category': 'object', 'size': 1}]]
+    second = [[{'item': 'CUP', 'category': 'object', 'vec': [1, 2]},
+               {'item': 'DOG', 'category': 'animal', 'vec': [3, 4]},
+               {'item': 'CAT', 'category': 'animal', 'vec': [5, 6]}],
+              [{'item': 'HORSE', 'category': 'animal', 'vec': [7, 8]}]]
+    a = EggArrays.from_nested([first], [[['SHOE', 'CAT']]])
+    b = EggArrays.from_nested([second], [[['CAT', 'DOG'], ['HORSE']]])
+    stacked = EggArrays.concatenate([a, b])
+    assert stacked.shape == (2, 2, 3)
+    assert list(stacked.subjects) == [0, 1]
+    assert stacked.items('pres')[1, 0].tolist() == ['CUP', 'DOG', 'CAT']
+    assert stacked.items('rec')[0].tolist() == [['SHOE', 'CAT'], [np.nan, np.nan]]
+    assert np.array_equal(stacked.rec_pos[:, 0], [[2, 1], [3, 2]])
+    cols = stacked.pres_features
+    assert cols['category'].kind == 'categorical'
+    cell = stacked.cell('pres', 1, 0, 0)
+    assert np.array_equal(cell.pop('vec'), [1, 2])
+    assert cell == {'item': 'CUP', 'category': 'object', 'Temporal': 0}
+    assert not cols['size'].mask[1].any() and not cols['vec'].mask[0].any()
+    assert cols['vec'].kind == 'vector'
+    with pytest.raises(ValueError):
+        EggArrays.concatenate([])
@@ -0,0 +1,104 @@
+import numpy as np
+import quail
+from scipy.spatial.distance import cdist
+from quail.egg import Egg
+from quail.analysis.diststore import DistanceStore
+from quail.distance import dist_funcs
+
+pool = [{'item': w, 'size': s, 'category': c, 'vec': [s, 2 * s]}
+        for w, s, c in [('cat', 3, 'animal'), ('dog', 4, 'animal'), ('shoe', 1, 'object'),
+                        ('horse', 5, 'animal'), ('cup', 2, 'object')]]
+presented = [[[pool[i] for i in [0, 1, 2, 3]], [pool[i] for i in [4, 2, 1, 0]]],
+             [[pool[i] for i in [3, 4, 0, 2]], [pool[i] for i in [1, 3, 4, 2]]]]
+recalled = [[[pool[i] for i in [1, 0, 3]], [pool[i] for i in [2, 4, 0]]],
+            [[pool[i] for i in [4, 3, 2]], [pool[i] for i in [1, 4, 3]]]]
+
+
+def _expected(lst, feature, metric):
+    f = np.array([cell[feature] for cell in lst])
+    return cdist(f.reshape(len(f), -1), f.reshape(len(f), -1), metric)
+
+
+def test_store_distances():
+    for backend in ['pandas', 'columnar']:
+        store = DistanceStore()
+        egg = Egg(pres=presented, rec=recalled, backend=backend)
+        for feature in ['size', 'category', 'vec']:
+            metric = dist_funcs[egg.dist_funcs[feature]]
+            for row, lst in enumerate([presented[0][0], presented[0][1],
+                                       presented[1][0], presented[1][1]]):
+                assert np.array_equal(store.distances(egg, feature, metric, row),
+                                      _expected(lst, feature, metric))
+        # five items in the pool, whatever the number of lists
+        assert store.info()['pools'][('size', dist_funcs['euclidean'])] == (5, True)
+        assert store.hits > 0
+
+
+def test_store_views_share_codes():
+    store = DistanceStore()
+    egg = Egg(pres=presented, rec=recalled, backend='columnar')
+    metric = dist_funcs['euclidean']
+    view = egg.view(subjects=[1], lists=[1])
+    assert store.codes(view, 'size', metric)[0] is store.codes(egg, 'size', metric)[0]
+    assert np.array_equal(store.distances(view, 'size', metric),
+                          _expected(presented[1][1], 'size', metric))
+
+
+def test_store_limit():
+    metric = dist_funcs['euclidean']
+    for backend in ['pandas', 'columnar']:
+        store = DistanceStore(limit=0)
+        egg = Egg(pres=presented, rec=recalled, backend=backend)
+        for row, lst in enumerate([presented[0][1], presented[1][0]], 1):
+            assert np.array_equal(store.distances(egg, 'size', metric, row),
+                                  _expected(lst, 'size', metric))
+        assert store.nbytes == 0
+        assert store.info()['pools'] == {}
+        assert store.info()['unpooled'] == [('size', metric)]
+
+
+def test_store_evicts_whole_pools():
+    metric = dist_funcs['euclidean']
+    egg = Egg(pres=presented, rec=recalled)
+    store = DistanceStore()
+    store.distances(egg, 'size', metric)
+    store.limit = store.nbytes
+    store.distances(egg, 'vec', metric)
+    # the size pool was evicted with its values and the codes into it
+    assert list(store.info()['pools']) == [('vec', metric)]
+    assert ('size', metric) not in store._codes[egg]
+    assert store.nbytes <= store.limit
+    assert np.array_equal(store.distances(egg, 'size', metric, 2),
+                          _expected(presented[1][0], 'size', metric))
+
+
+def test_store_bounds_continuous_values():
+    # a new value per item: the values alone outgrow the limit
+    metric = dist_funcs['euclidean']
+    store = DistanceStore(limit=2**16)
+    rng = np.random.RandomState(0)
+    for _ in range(200):
+        values = list(rng.rand(16))
+        assert np.allclose(store.value_distances('x', metric, values),
+                           _expected([{'x': v} for v in values], 'x', metric))
+        assert store.nbytes <= store.limit
+    assert ('x', metric) in store.info()['unpooled']
+
+
+def test_fingerprint_uses_store():
+    fps = [Egg(pres=presented, rec=recalled, backend=backend).analyze(
+        'fingerprint', features=['size', 'category']).data
+        for backend in ['pandas', 'columnar']]
+    assert fps[0].shape == (4, 2)
+    assert np.allclose(fps[0].values, fps[1].values)
+
+
+def test_compute_distances():
+    from quail.fingerprint import compute_distances
+    egg = Egg(pres=[presented[0][:1]], rec=[recalled[0][:1]])
+    dists = compute_distances(egg)
+    assert dists.shape == (4, 4, 4)
+    size, category = dists[0], dists[1]
+    assert size[0, 3] == 2
+    assert category[0, 1] == 0
+    assert category[0, 2] == 1
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import quail
+from quail.egg import Egg, EggCollection
+
+presented = [[['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra', 'horse']]]
+recalled = [[['bat', 'cat', 'goat', 'hat'], ['animal', 'horse', 'zoo']]]
+other = [[['goat', 'hat', 'cat'], ['zebra', 'zoo', 'horse', 'animal']]]
+
+eggs = [Egg(pres=presented, rec=recalled, meta={'session': [1]}),
+        Egg(pres=presented * 2, rec=recalled + other, backend='columnar',
+            meta={'session': [2]}),
+        Egg(pres=presented, rec=other, meta={'session': [3]})]
+
+
+def _equal(a, b):
+    return (a.data.index.equals(b.data.index) and
+            np.allclose(a.data.values.astype(float), b.data.values.astype(float),
+                        equal_nan=True))
+
+
+def test_collection_sizes():
+    collection = EggCollection(eggs)
+    assert len(collection) == 3
+    assert (collection.n_subjects, collection.n_lists, collection.list_length) == (4, 2, 4)
+    assert collection.meta == {'session': [1, 2, 3]}
+    with pytest.raises(ValueError):
+        EggCollection([])
+
+
+@pytest.mark.parametrize('analysis', ['accuracy', 'spc', 'lagcrp', 'temporal'])
+def test_collection_analyze_matches_stacked(analysis):
+    collection = EggCollection(eggs, subjgroup=['a', 'a', 'b', 'b'])
+    stacked = collection.stack()
+    assert stacked.subjgroup == ['a', 'a', 'b', 'b']
+    assert _equal(collection.analyze(analysis), stacked.analyze(analysis))
+    assert _equal(quail.analyze(collection, analysis=analysis),
+                  stacked.analyze(analysis))
+
+
+@pytest.mark.parametrize('analysis', ['accuracy', 'spc', 'pfr', 'lagcrp'])
+@pytest.mark.parametrize('subjgroup', [None, ['x', 'x', 'y']])
+def test_collection_of_different_shapes(analysis, subjgroup):
+    ragged = [Egg(pres=[presented[0][:1]], rec=[recalled[0][:1]]),
+              Egg(pres=presented * 2, rec=recalled + other)]
+    collection = EggCollection(ragged, subjgroup=subjgroup)
+    stacked = collection.stack()
+    assert stacked.n_lists == collection.n_lists == 2
+    assert _equal(collection.analyze(analysis), stacked.analyze(analysis))
+
+
+def test_collection_crack():
+    collection = EggCollection(eggs, subjgroup=['a', 'b', 'c', 'd'])
+    cracked = collection.crack(subjects=[2, 1, 3], lists=[1])
+    assert len(cracked) == 2
+    assert cracked.n_subjects == 3 and cracked.n_lists == 1
+    assert cracked.subjgroup == ['b', 'c', 'd']
+    expected = collection.stack().crack(subjects=[1, 2, 3], lists=[1])
+    assert (cracked.stack().get_rec_items().fillna('').values.tolist() ==
+            expected.get_rec_items().fillna('').values.tolist())
+    with pytest.raises(ValueError):
+        collection.crack(subjects=[4])
+
+
+def test_collection_save(tmpdir):
+    collection = EggCollection(eggs)
+    collection.save(str(tmpdir.join('study')))
+    loaded = quail.load_egg(str(tmpdir.join('study.egg')))
+    assert loaded.n_subjects == 4
+    assert _equal(loaded.analyze('spc'), collection.analyze('spc'))
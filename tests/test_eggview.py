@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from quail.egg import Egg, EggView
+
+presented = [[['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra', 'horse']],
+             [['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra', 'horse']]]
+recalled = [[['bat', 'cat', 'goat', 'hat'], ['animal', 'horse', 'zoo']],
+            [['bat', 'cat', 'goat'], ['animal', 'horse']]]
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'columnar'])
+def test_view_matches_crack(backend):
+    egg = Egg(pres=presented, rec=recalled, backend=backend, subjgroup=['a', 'b'])
+    view = egg.view(subjects=[1], lists=[1])
+    cracked = egg.crack(subjects=[1], lists=[1])
+    assert isinstance(view, EggView)
+    assert view.n_subjects == 1 and view.n_lists == 1
+    assert view.subjgroup == ['b']
+    assert list(view.get_rec_items().iloc[0].dropna()) == ['animal', 'horse']
+    assert view.get_pres_items().values.tolist() == cracked.get_pres_items().values.tolist()
+    for a in ['spc', 'accuracy', 'lagcrp']:
+        assert np.allclose(view.analyze(a).data.values,
+                           cracked.analyze(a).data.values, equal_nan=True)
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'columnar'])
+def test_view_shares_parent_cache(backend):
+    egg = Egg(pres=presented, rec=recalled, backend=backend)
+    full = egg.get_recall_matrix()
+    view = egg.view(subjects=[0, 1], lists=[0])
+    assert view.recall_cache_info()['keys'] == [('exact',)]
+    assert np.array_equal(view.get_recall_matrix(), full[[0, 2]], equal_nan=True)
+
+
+def test_view_of_view():
+    egg = Egg(pres=presented, rec=recalled)
+    view = egg.view(subjects=[1]).view(lists=[0])
+    assert view.n_subjects == 1 and view.n_lists == 1
+    assert list(view.get_rec_items().iloc[0].dropna()) == ['bat', 'cat', 'goat']
+
+
+def test_view_is_read_only():
+    egg = Egg(pres=presented, rec=recalled)
+    view = egg.view(subjects=[0])
+    with pytest.raises(AttributeError):
+        view.rec = egg.rec
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'columnar'])
+def test_missing_labels(backend):
+    egg = Egg(pres=presented, rec=recalled, backend=backend)
+    with pytest.raises(ValueError, match='Subject'):
+        egg.view(subjects=[0, 5])
+    with pytest.raises(ValueError, match='List'):
+        egg.crack(lists=[2])
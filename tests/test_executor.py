@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pytest
+import quail
+from quail.egg import Egg
+from quail.analysis.executor import run_chunks, get_executor
+
+
+def _count(egg, chunk):
+    return (egg.n_subjects, chunk)
+
+
+@pytest.mark.parametrize('backend', ['serial', 'threads', 'processes', 'loky'])
+def test_run_chunks(backend):
+    egg = Egg(pres=[[['cat', 'bat', 'hat', 'goat']]], rec=[[['bat', 'cat']]])
+    assert run_chunks(_count, egg, list(range(7)), backend=backend, n_jobs=2,
+                      chunksize=3) == [(1, i) for i in range(7)]
+
+
+def test_executor_is_reused():
+    assert get_executor('threads', 2) is get_executor('threads', 2)
+
+
+def test_bad_backend():
+    with pytest.raises(ValueError):
+        run_chunks(_count, None, [1, 2], backend='mpi')
+
+
+@pytest.mark.parametrize('backend', ['threads', 'processes'])
+def test_analyze_backend_matches_serial(backend):
+    egg = quail.load_example_data(dataset='automatic').crack(subjects=[0, 1], lists=[0, 1])
+    serial = egg.analyze('temporal', permute=True, n_perms=50, random_state=0).data
+    parallel = egg.analyze('temporal', permute=True, n_perms=50, random_state=0,
+                           backend=backend, n_jobs=2).data
+    assert serial.equals(parallel)
+
+
+def _first_word(egg, chunk):
+    return egg.pres.iloc[0, 0]['item']
+
+
+def test_shared_egg_is_reused():
+    from quail.analysis import executor
+    egg = Egg(pres=[[['cat', 'bat', 'hat', 'goat']]], rec=[[['bat', 'cat']]])
+    assert run_chunks(_first_word, egg, [0, 1], backend='processes', n_jobs=2) == ['cat'] * 2
+    path = executor._dumps[id(egg)][1]
+    run_chunks(_first_word, egg, [0, 1], backend='processes', n_jobs=2)
+    assert executor._dumps[id(egg)][1] == path
+
+    # modifying the egg drops its file, and workers see the new data
+    egg.pres = Egg(pres=[[['dog', 'bat', 'hat', 'goat']]], rec=[[['bat']]]).pres
+    assert id(egg) not in executor._dumps
+    assert not os.path.exists(path)
+    assert run_chunks(_first_word, egg, [0, 1], backend='processes', n_jobs=2) == ['dog'] * 2
+
+    # files are removed with their egg
+    path = executor._dumps[id(egg)][1]
+    del egg
+    import gc
+    gc.collect()
+    assert not os.path.exists(path)
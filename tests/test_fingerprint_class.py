@@ -65,3 +65,51 @@ def test_fingerprint_math():
     # Check if we can do basic ops if implemented?
     # Fingerprint class might just be a wrapper.
     pass
+
+def _fingerprint_eggs():
+    egg = quail.load_example_data()
+    return [egg.crack(subjects=[0], lists=[i]) for i in range(4)]
+
+def _scores(egg):
+    # the fingerprint scores features in the order of dist_funcs
+    return egg.analyze('fingerprint', features=list(egg.dist_funcs)).data.values
+
+def test_fingerprint_running_mean():
+    eggs = _fingerprint_eggs()
+    fp = quail.Fingerprint(history_size=2)
+    for egg in eggs:
+        fp.update(egg)
+    scores = np.vstack([_scores(egg) for egg in eggs])
+    assert fp.n == 4
+    assert np.allclose(fp.state, np.nanmean(scores, 0), equal_nan=True)
+    assert len(fp.history) == 2
+    assert np.allclose(fp.history[-1], scores[-1], equal_nan=True)
+
+def test_fingerprint_decay():
+    eggs = _fingerprint_eggs()
+    fp = quail.Fingerprint(decay=.5)
+    for egg in eggs[:2]:
+        fp.update(egg)
+    scores = [_scores(egg)[0] for egg in eggs[:2]]
+    assert np.allclose(fp.state, .5 * scores[0] + .5 * scores[1])
+    assert np.allclose(fp.mean(), np.mean(scores, 0))
+    with pytest.raises(ValueError):
+        quail.Fingerprint(decay=2)
+
+def test_fingerprint_merge():
+    eggs = _fingerprint_eggs()
+    whole, left, right = quail.Fingerprint(), quail.Fingerprint(), quail.Fingerprint()
+    for i, egg in enumerate(eggs):
+        whole.update(egg)
+        (left if i < 2 else right).update(egg)
+    left.merge(right)
+    assert left.n == whole.n == 4
+    assert np.allclose(left.state, whole.state)
+    assert len(left.history) == 4
+    assert left.get_features() == whole.get_features()
+
+    other = quail.Fingerprint()
+    other.features = ['something else']
+    other._fold([[.5]])
+    with pytest.raises(ValueError):
+        left.merge(other)
@@ -2,6 +2,9 @@
 
 from quail.egg import Egg, FriedEgg
 import pytest
+import numpy as np
+import quail
+from quail import load
 import pandas as pd
 import six
 import matplotlib.pyplot as plt
@@ -31,3 +34,66 @@ def test_fried_egg_position():
 
 def test_fried_egg_plot():
     isinstance(fried_egg.plot(show=False), plt.Figure)
+
+def test_fried_egg_tensor():
+    fegg = Egg(pres=presented, rec=recalled).analyze('spc', listgroup=['a', 'b'])
+    tensor = fegg.tensor
+    assert tensor['values'].shape == (1, 2, 4)
+    assert tensor['present'].all()
+    assert fegg.to_numpy() is tensor['values']
+    assert np.array_equal(tensor['values'].reshape(2, 4), fegg.data.to_numpy())
+
+def test_fried_egg_from_tensor():
+    values = np.arange(12.).reshape(2, 3, 2)
+    present = np.array([[True, True, False], [True, False, False]])
+    fegg = FriedEgg.from_tensor(values, groups=['a', 'b'], lists=[0, 1, 2],
+                                present=present, analysis='accuracy')
+    assert fegg.data.index.tolist() == [('a', 0), ('a', 1), ('b', 0)]
+    assert fegg.data[0].tolist() == [0., 2., 6.]
+
+def test_fried_egg_data_setter():
+    fegg = Egg(pres=presented, rec=recalled).analyze('accuracy')
+    fegg.data = fegg.data * 2
+    assert fegg.to_numpy().ravel().tolist() == (fegg.data[0]).tolist()
+
+@pytest.mark.parametrize('fmt', ['joblib', 'columnar'])
+def test_fried_egg_save_load(tmp_path, fmt):
+    fegg = Egg(pres=presented, rec=recalled).analyze('lagcrp')
+    fname = str(tmp_path / 'result.fegg')
+    fegg.save(fname, format=fmt)
+    loaded = load(fname)
+    assert loaded.analysis == 'lagcrp'
+    assert loaded.list_length == 4
+    pd.testing.assert_frame_equal(loaded.data, fegg.data)
+
+@pytest.mark.parametrize('analysis', ['spc', 'lagcrp', 'fingerprint', 'accuracy'])
+def test_fried_egg_columnar_example_data(tmp_path, analysis):
+    # the example data names its subjects with a bytes subjname
+    egg = quail.load_example_data()
+    listgroup = ['a', 'b'] * (egg.n_lists // 2) if analysis == 'accuracy' else None
+    fegg = egg.analyze(analysis, listgroup=listgroup)
+    fname = str(tmp_path / 'result.fegg')
+    fegg.save(fname, format='columnar')
+    loaded = load(fname)
+    assert list(loaded.data.index.names) == list(fegg.data.index.names)
+    pd.testing.assert_frame_equal(loaded.data, fegg.data)
+
+def test_columnar_header_checked_before_writing(tmp_path):
+    from quail.columnar import write_directory
+    fname = str(tmp_path / 'result.fegg')
+    with pytest.raises(TypeError):
+        write_directory(fname, {'values' : np.zeros(2)}, names=[b'Subject'])
+    assert not (tmp_path / 'result.fegg').exists()
+
+def test_fried_egg_columnar_is_memory_mapped(tmp_path):
+    fname = str(tmp_path / 'result.fegg')
+    fried_egg.save(fname, format='columnar')
+    assert isinstance(np.load(str(tmp_path / 'result.fegg' / 'values.npy'),
+                              mmap_mode='r'), np.memmap)
+    assert not load(fname).to_numpy().flags.owndata
+
+def test_fried_egg_to_xarray():
+    xr = pytest.importorskip('xarray')
+    arr = fried_egg.to_xarray()
+    assert isinstance(arr, xr.DataArray)
+    assert arr.shape == fried_egg.to_numpy().shape
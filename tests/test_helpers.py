@@ -2,7 +2,7 @@ import pytest
 import quail
 import pandas as pd
 import numpy as np
-from quail.helpers import list2pd, recmat2egg, stack_eggs, crack_egg, shuffle_egg, r2z, z2r
+from quail.helpers import list2pd, recmat2egg, stack_eggs, crack_egg, shuffle_egg, r2z, z2r, format2tidy, summarize_tidy
 
 def test_list2pd_basic():
     # Input should be List[Subject]. Subject = List[List].
@@ -49,6 +49,25 @@ def test_stack_eggs():
     # Concatenation extends the list
     assert stacked_cat.meta['foo'] == [1, 3]
 
+@pytest.mark.parametrize('backend', ['pandas', 'columnar'])
+def test_stack_eggs_pads_lists(backend):
+    egg1 = quail.Egg(pres=[[['a', 'b', 'c']]], rec=[[['c', 'a']]], backend=backend)
+    egg2 = quail.Egg(pres=[[['d', 'e'], ['f', 'g']], [['h', 'i'], ['j', 'k']]],
+                     rec=[[['e'], ['g', 'f']], [[], ['k']]], backend=backend)
+    stacked = stack_eggs([egg1, egg2])
+    assert stacked.backend == backend
+    assert (stacked.n_subjects, stacked.n_lists, stacked.list_length) == (3, 2, 3)
+    # same data as stacking the nested lists
+    expected = quail.Egg(pres=[[['a', 'b', 'c'], []], [['d', 'e'], ['f', 'g']],
+                               [['h', 'i'], ['j', 'k']]],
+                         rec=[[['c', 'a'], []], [['e'], ['g', 'f']], [[], ['k']]])
+    for get in ['get_pres_items', 'get_rec_items']:
+        got, want = getattr(stacked, get)(), getattr(expected, get)()
+        assert got.index.equals(want.index)
+        assert got.fillna('').values.tolist() == want.fillna('').values.tolist()
+    assert np.allclose(stacked.analyze('spc').data.values,
+                       expected.analyze('spc').data.values, equal_nan=True)
+
 def test_crack_egg():
     pres = [[['a', 'b'], ['c', 'd']], [['e', 'f'], ['g', 'h']]] # 2 subjs, 2 lists
     rec = pres
@@ -83,3 +102,30 @@ def test_fisher_z():
     z = r2z(r)
     r_back = z2r(z)
     assert np.isclose(r, r_back)
+
+def test_format2tidy():
+    df = pd.DataFrame([[1., 0.], [0., 1.], [1., 1.]],
+                      index=pd.MultiIndex.from_tuples([(0, 0), (0, 1), (1, 0)],
+                                                      names=['Subject', 'List']))
+    tidy = format2tidy(df, 'Group', 'List', ['x', 'y'], analysis='spc')
+    assert tidy.columns.tolist() == ['Subject', 'List', 'Proportion Recalled',
+                                     'Group', 'Position']
+    assert tidy['Proportion Recalled'].tolist() == [1., 0., 0., 1., 1., 1.]
+    assert tidy['Group'].tolist() == ['x'] * 4 + ['y'] * 2
+    assert tidy['Position'].tolist() == [0, 1] * 3
+
+def test_summarize_tidy():
+    data = pd.DataFrame({'g' : ['a'] * 4 + ['b'] * 2,
+                         'v' : [1., 2., 3., np.nan, 5., 5.]})
+    summary = summarize_tidy(data, 'v', ['g'], interval='se')
+    assert summary['g'].tolist() == ['a', 'b']
+    assert summary['v'].tolist() == [2., 5.]
+    assert summary['n'].tolist() == [3, 2]
+    assert np.allclose(summary['high'] - summary['v'], [1 / np.sqrt(3), 0])
+    ci = summarize_tidy(data, 'v', ['g'])
+    assert (ci['high'] - ci['v'])[0] > (summary['high'] - summary['v'])[0]
+    boot = summarize_tidy(data, 'v', ['g'], interval='bootstrap', random_state=0)
+    assert 1 <= boot['low'][0] <= 2 <= boot['high'][0] <= 3
+    assert boot['low'][1] == boot['high'][1] == 5
+    with pytest.raises(ValueError):
+        summarize_tidy(data, 'v', ['g'], interval='iqr')
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+import pytest
+
+# imported only when plotting, decoding speech, saving eggs or running
+# analyses in parallel
+HEAVY = ['matplotlib', 'seaborn', 'whisper', 'torch', 'sqlalchemy', 'joblib']
+
+
+def _run(code):
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True)
+    return out.stdout.strip()
+
+
+def test_import_is_lazy():
+    loaded = _run("import sys, quail; "
+                  "print(','.join(m for m in %r if m in sys.modules))" % HEAVY)
+    assert loaded == ''
+
+
+def test_import_time():
+    # self time (in us) of each module imported by quail, from -X importtime
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import quail'],
+                         capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in out.splitlines()[1:]:
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(self_time)
+    assert not [m for m in times if m.split('.')[0] in HEAVY]
+
+    # quail's own modules (not their dependencies) load in well under a second
+    assert sum(t for m, t in times.items() if m.split('.')[0] == 'quail') < 1e6
+
+
+def test_lazy_api():
+    code = ("import types, quail; "
+            "import matplotlib; matplotlib.use('Agg'); "
+            "quail.load_example_data().analyze('spc').plot(show=False); "
+            "print(isinstance(quail.plot, types.FunctionType), "
+            "isinstance(quail.decode_speech, types.FunctionType), "
+            "'plot' in dir(quail))")
+    assert _run(code) == 'True True True'
+    import quail
+    with pytest.raises(AttributeError):
+        quail.not_an_attribute
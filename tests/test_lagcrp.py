@@ -52,3 +52,17 @@ def test_lagcrp_best_euclidean_3d():
 #     egg = Egg(pres=presented, rec=recalled)
 #     np.allclose(egg.analyze('lagcrp', match='smooth', distance='euclidean', features='item').data.values, np.array([[np.nan, 980.875, 639.625, 442.54166667, 364.625, 380.875, 466.29166667, 595.875, np.nan,
 #     744.625, 660.875, 546.29166667, 425.875, 324.625, 267.54166667, 279.625, 385.875]]))
+
+def test_lagcrp_rows_batched():
+    from quail.analysis.lagcrp import lagcrp_rows
+    presented=[[['cat', 'bat', 'hat', 'goat'],['zoo', 'animal', 'zebra', 'horse'],['a', 'b', 'c', 'd']]]
+    recalled=[[['bat', 'cat', 'dog', 'goat', 'hat'],['animal'],['b', 'b', 'c']]]
+    egg = Egg(pres=presented,rec=recalled)
+    rows = lagcrp_rows(egg)
+    assert rows.shape == (3, 9)
+    # bat->cat and goat->hat (lag -1, 2 of 2 possible), cat->goat (lag 3, 1 of 1)
+    assert np.allclose(rows[0], [0, 0, 0, 1, np.nan, 0, 0, 1, 0], equal_nan=True)
+    assert np.isnan(rows[1]).all()
+    # the repeated b->b transition counts towards the possible lags only
+    assert np.allclose(rows[2], [0, 0, 0, 0, np.nan, .5, 0, 0, 0], equal_nan=True)
+    assert np.array_equal(lagcrp_rows(egg, max_bytes=1), rows, equal_nan=True)
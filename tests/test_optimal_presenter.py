@@ -83,3 +83,147 @@ def test_optimal_presenter_order_stick():
     op = quail.OptimalPresenter(strategy='stabilize', features=['val'])
     new_egg = op.order(egg, method='stick', fingerprint=[1.0])
     assert isinstance(new_egg, quail.Egg)
+
+def test_compute_feature_weights():
+    from quail.fingerprint import compute_distances, compute_feature_weights
+    features = [{'item': w, 'val': v, 'group': g}
+                for w, v, g in zip('abcdef', [1, 2, 3, 4, 5, 6], 'xxxyyy')]
+    egg = quail.Egg(pres=[[features]], rec=[[['a', 'b', 'c']]])
+    distances = compute_distances(egg)
+    assert distances.shape == (3, 6, 6)
+    pres = list('abcdef')
+
+    # brute force ranks, as in the original nested-dict implementation
+    def expected(rec):
+        scores = []
+        for f in range(3):
+            past, ranks = [], []
+            for c, n in zip(rec[:-1], rec[1:]):
+                if c in pres and n in pres and c not in past and n not in past:
+                    i, j = pres.index(c), pres.index(n)
+                    left = [distances[f, i, k] for k in range(6) if pres[k] not in past]
+                    pos = np.where(np.sort(left)[::-1] == distances[f, i, j])[0] + 1
+                    ranks.append(np.mean(pos) / len(left))
+                    past.append(c)
+            scores.append(np.nanmean(ranks))
+        return scores
+
+    for rec in [list('abcdef'), list('fedcba'), list('adbecf'), ['a', 'z', 'b', 'c', 'a', 'd']]:
+        weights = compute_feature_weights(pres, rec, features, distances)
+        assert np.allclose(weights, expected(rec))
+    assert compute_feature_weights(pres, ['a'], features, distances) == [.5] * 3
+
+def test_optimal_presenter_order_best():
+    features = [{'item': w, 'val': v} for w, v in zip('abcde', [1, 2, 3, 4, 5])]
+    egg = quail.Egg(pres=[[features]], rec=[[list('abcde')]])
+    op = quail.OptimalPresenter(strategy='stabilize', features=['val', 'Temporal'])
+    for method in ['best_stick', 'best_choice']:
+        new_egg = op.order(egg, method=method, nperms=4, fingerprint=[.9, .5],
+                           distfun='euclidean')
+        assert sorted(new_egg.get_pres_items().values[0]) == list('abcde')
+
+def test_rand_perms():
+    from quail.fingerprint import compute_distances, compute_feature_weights, rand_perms
+    features = [{'item': w, 'val': v, 'group': g}
+                for w, v, g in zip('abcdefgh', range(8), 'xxyyxxyy')]
+    egg = quail.Egg(pres=[[features]], rec=[[list('abcdefgh')]])
+    distances = compute_distances(egg)
+    weights, orders = rand_perms(distances, 100, batch_size=16)
+    assert weights.shape == (100, 3)
+    assert (np.sort(orders, 1) == np.arange(8)).all()
+    pres = np.array(list('abcdefgh'))
+    for w, o in zip(weights[:10], orders[:10]):
+        assert np.allclose(w, compute_feature_weights(list(pres), list(pres[o]),
+                                                      features, distances))
+
+    # a tiny budget stops after the first batch
+    weights, orders = rand_perms(distances, 10000, time_budget_ms=1e-6)
+    assert len(weights) == len(orders) == 32
+
+def test_deprecated_dict_helpers():
+    from quail.fingerprint import (compute_distances, compute_feature_weights,
+                                   compute_distances_dict,
+                                   compute_feature_weights_dict, rand_perm)
+    features = [{'item': w, 'val': v, 'group': g}
+                for w, v, g in zip('abcdef', range(6), 'xxxyyy')]
+    egg = quail.Egg(pres=[[features]], rec=[[list('abcdef')]])
+    pres, rec = list('abcdef'), list('adbecf')
+    distances = compute_distances(egg)
+    with pytest.warns(DeprecationWarning):
+        dist_dict = compute_distances_dict(egg)
+    assert dist_dict['a']['c']['val'] == distances[0, 0, 2]
+    assert dist_dict['a']['d']['group'] == distances[1, 0, 3]
+    with pytest.warns(DeprecationWarning):
+        weights = compute_feature_weights_dict(pres, rec, features, dist_dict)
+    assert np.allclose(weights, compute_feature_weights(pres, rec, features, distances))
+    with pytest.warns(DeprecationWarning):
+        weights, order = rand_perm(np.array(pres), np.array(features), dist_dict,
+                                   egg.dist_funcs)
+    assert sorted(order) == list(range(6))
+    assert np.allclose(weights, compute_feature_weights(
+        pres, [pres[i] for i in order], features, distances))
+
+def test_optimal_presenter_order_time_budget():
+    features = [{'item': w, 'val': v} for w, v in zip('abcdef', range(6))]
+    egg = quail.Egg(pres=[[features]], rec=[[list('abcdef')]])
+    op = quail.OptimalPresenter(strategy='stabilize', features=['val', 'Temporal'])
+    new_egg = op.order(egg, method='permute', nperms=100000, fingerprint=[1., .5],
+                       distfun='euclidean', time_budget_ms=50)
+    assert sorted(new_egg.get_pres_items().values[0]) == list('abcdef')
+
+def test_optimal_presenter_service():
+    features = [{'item': w, 'val': v} for w, v in zip('abcdef', range(6))]
+    egg = quail.Egg(pres=[[features]], rec=[[list('abcdef')]])
+    op = quail.OptimalPresenter(strategy='stabilize', features=['val', 'Temporal'])
+    with pytest.raises(ValueError):
+        op.order_next()
+
+    op.prepare(egg, backend='threads', n_jobs=2)
+    for method in ['permute', 'stick', 'best_stick', 'best_choice']:
+        for i in range(3):
+            new_egg = op.order_next(method=method, nperms=8, fingerprint=[.9, .5],
+                                    distfun='euclidean')
+            assert sorted(new_egg.get_pres_items().values[0]) == list('abcdef')
+    with pytest.raises(ValueError):
+        op.order_next(method='nope', fingerprint=[.9, .5])
+
+    latency = op.latency()
+    assert sorted(latency) == ['best_choice', 'best_stick', 'permute', 'stick']
+    assert all(l['n'] == 3 and 0 <= l['p50'] <= l['p99'] for l in latency.values())
+
+def test_optimal_presenter_service_asyncio():
+    import asyncio
+    features = [{'item': w, 'val': v} for w, v in zip('abcdefgh', range(8))]
+    egg = quail.Egg(pres=[[features]], rec=[[list('abcdefgh')]])
+    op = quail.OptimalPresenter(strategy='stabilize', features=['val', 'Temporal'])
+    op.prepare(egg, backend='serial')
+
+    async def serve(n_requests):
+        # requests handled off the event loop, as a server would
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(None, lambda: op.order_next(
+                nperms=200, fingerprint=[.9, .5], distfun='euclidean'))
+            for i in range(n_requests)])
+
+    eggs = asyncio.run(serve(10))
+    assert len(eggs) == 10
+    assert op.latency()['permute']['n'] == 10
+
+def test_optimal_presenter_service_shares_list_once(capsys):
+    from quail.analysis import executor
+    features = [{'item': w, 'val': v} for w, v in zip('abcdef', range(6))]
+    egg = quail.Egg(pres=[[features]], rec=[[list('abcdef')]])
+    op = quail.OptimalPresenter(strategy='stabilize', features=['val', 'Temporal'])
+    op.prepare(egg, backend='processes', n_jobs=2)
+    shared = op._prepared['shared']
+    paths = set()
+    for i in range(3):
+        new_egg = op.order_next(method='best_stick', nperms=4, fingerprint=[.9, .5],
+                                distfun='euclidean')
+        assert sorted(new_egg.get_pres_items().values[0]) == list('abcdef')
+        paths.add(executor._dumps[id(shared)][1])
+    # one file for all the calls, holding the list but not the presenter
+    assert len(paths) == 1
+    assert not hasattr(shared, '_latencies')
+    assert capsys.readouterr().out == ''
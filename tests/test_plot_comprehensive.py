@@ -1,4 +1,6 @@
 import pytest
+import numpy as np
+import pandas as pd
 import quail
 import matplotlib.pyplot as plt
 
@@ -75,3 +77,62 @@ def test_plot_filtering(egg):
     # let's try
     res.plot(listconds=[0], show=False)
     plt.close('all')
+
+@pytest.mark.parametrize('analysis', ['accuracy', 'spc', 'pfr', 'lagcrp',
+                                      'temporal', 'fingerprint'])
+def test_plot_aggregate(egg, analysis):
+    res = egg.analyze(analysis)
+    for interval in ['ci', 'se', 'bootstrap', None]:
+        ax = res.plot(aggregate=True, interval=interval, plot_style='bar',
+                      show=False)
+        assert len(ax.lines) + len(ax.patches) > 0
+        plt.close('all')
+
+def test_plot_aggregate_means(egg):
+    res = egg.analyze('spc', listgroup=['a', 'b'])
+    plt.figure()
+    ax = res.plot(aggregate=True, show=False)
+    means = res.data.groupby(level=1).mean()
+    lines = {line.get_label() : line.get_ydata() for line in ax.lines}
+    assert np.allclose(lines['a'], means.loc['a'])
+    assert np.allclose(lines['b'], means.loc['b'])
+    plt.close('all')
+
+@pytest.mark.parametrize('plot_style', ['swarm', 'violin'])
+@pytest.mark.parametrize('analysis', ['accuracy', 'temporal', 'fingerprint'])
+def test_plot_large_data(egg, analysis, plot_style):
+    res = egg.analyze(analysis)
+    ax = res.plot(plot_style=plot_style, max_points=2, max_violin_points=2,
+                  show=False)
+    assert len(ax.collections) > 0
+    if plot_style == 'swarm':
+        assert all('\nn=' in label.get_text() for label in ax.get_xticklabels())
+    plt.close('all')
+
+def test_plot_swarm_under_threshold_is_fast():
+    import time
+    from quail.plot import MAX_POINTS
+    # discrete accuracies pile up in the swarm, its worst case
+    values = np.random.RandomState(0).randint(0, 17, MAX_POINTS) / 16.
+    res = quail.FriedEgg.from_tensor(values.reshape(-1, 2, 1), groups=range(MAX_POINTS // 2),
+                                     lists=[0, 1], analysis='accuracy',
+                                     list_length=16, n_lists=2,
+                                     n_subjects=MAX_POINTS // 2)
+    plt.figure()
+    start = time.time()
+    ax = res.plot(plot_style='swarm', show=False)
+    ax.figure.canvas.draw()
+    assert time.time() - start < 5
+    assert not any('\nn=' in label.get_text() for label in ax.get_xticklabels())
+    plt.close('all')
+
+def test_sampled_swarmplot_counts():
+    from quail.plot import _sampled_swarmplot
+    data = pd.DataFrame({'x' : ['a'] * 300 + ['b'] * 30,
+                         'y' : np.random.RandomState(0).rand(330)})
+    plt.figure()
+    ax = _sampled_swarmplot(data, 'x', 'y', n=40)
+    sizes = [len(c.get_offsets()) for c in ax.collections]
+    assert sizes == [20, 20]
+    assert [label.get_text() for label in ax.get_xticklabels()] == ['a\nn=300', 'b\nn=30']
+    plt.close('all')
@@ -70,3 +70,10 @@ def test_pfr_smooth_correlation_3d():
                [[20, 0, 0], [40, 0, -20], [10, 0, 10]]]]
     egg = Egg(pres=presented,rec=recalled)
     egg.analyze('pfr', match='smooth', distance='correlation', features='item').data.values
+
+def test_pnr_rows_variable_length():
+    from quail.analysis.pnr import pnr_rows
+    presented=[[['cat', 'bat', 'hat', 'goat'],['zoo', 'animal', 'zebra']]]
+    recalled=[[['dog', 'goat'],['zebra', 'zoo']]]
+    egg = Egg(pres=presented,rec=recalled)
+    assert np.array_equal(pnr_rows(egg, 1), [[0., 0., 0., 1.], [1., 0., 0., np.nan]], equal_nan=True)
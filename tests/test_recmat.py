@@ -37,3 +37,54 @@
 #
 # def test_exact():
 #     _recmat(egg.pres, egg.rec, 'exact', 'euclidean')
+
+from quail.egg import Egg
+from quail.analysis.recmat import recall_matrix
+import numpy as np
+import pytest
+
+
+def test_recmat_exact_intrusions_and_padding():
+    presented = [[['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra']]]
+    recalled = [[['bat', 'dog', 'cat'], ['zebra', 'zoo', 'animal', 'bat', 'zoo']]]
+    egg = Egg(pres=presented, rec=recalled)
+    recmat = recall_matrix(egg)
+    assert recmat.shape == (2, 5)
+    assert np.array_equal(recmat, [[2, np.nan, 1, np.nan, np.nan],
+                                   [3, 1, 2, np.nan, 1]], equal_nan=True)
+
+
+def test_recmat_exact_vector_items():
+    presented = [[[[10, 0, 0], [20, 0, 0], [30, 0, 0]]]]
+    recalled = [[[[30, 0, 0], [5, 0, 0], [10, 0, 0]]]]
+    egg = Egg(pres=presented, rec=recalled)
+    assert np.array_equal(recall_matrix(egg)[0], [3, np.nan, 1], equal_nan=True)
+
+
+def test_recmat_exact_duplicate_presentations():
+    egg = Egg(pres=[[['a', 'b', 'a', 'c']]], rec=[[['a', 'c', 'b']]])
+    assert np.array_equal(recall_matrix(egg)[0], [1, 4, 2, np.nan], equal_nan=True)
+
+
+def _vector_egg():
+    rng = np.random.RandomState(0)
+    pres = [[[{'item': i, 'emb': list(rng.rand(5))} for i in range(6)] for l in range(4)]]
+    rec = [[[dict(pres[0][l][j]) for j in rng.permutation(6)[:4]] for l in range(4)]]
+    return Egg(pres=pres, rec=rec)
+
+
+@pytest.mark.parametrize('distance', ['euclidean', 'correlation', 'cosine', 'cityblock'])
+def test_recmat_best_chunked(distance):
+    egg = _vector_egg()
+    full = recall_matrix(egg, match='best', distance=distance, features='emb')
+    chunked = recall_matrix(egg, match='best', distance=distance, features='emb', max_bytes=1)
+    assert np.array_equal(full, chunked, equal_nan=True)
+    assert np.array_equal(full[:, :4, 0], recall_matrix(egg)[:, :4])
+
+
+def test_recmat_smooth_float32():
+    egg = _vector_egg()
+    full = recall_matrix(egg, match='smooth', features='emb')
+    single = recall_matrix(egg, match='smooth', features='emb', dtype=np.float32)
+    assert full.shape == single.shape
+    assert np.allclose(full, single, atol=1e-3)
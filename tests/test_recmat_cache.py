@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from quail.egg import Egg
+from quail.analysis.recmat import RecallMatrixCache
+
+presented = [[['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra', 'horse']],
+             [['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra', 'horse']]]
+recalled = [[['bat', 'cat', 'goat', 'hat'], ['animal', 'horse', 'zoo']],
+            [['bat', 'cat', 'goat'], ['animal', 'horse']]]
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'columnar'])
+def test_recall_matrix_is_cached(backend):
+    egg = Egg(pres=presented, rec=recalled, backend=backend)
+    recmat = egg.get_recall_matrix()
+    assert egg.get_recall_matrix() is recmat
+    info = egg.recall_cache_info()
+    assert info['keys'] == [('exact',)]
+    assert info['hits'] == 1 and info['misses'] == 1
+    with pytest.raises(ValueError):
+        recmat[0, 0] = 2
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'columnar'])
+def test_cache_shared_across_analyses(backend):
+    egg = Egg(pres=presented, rec=recalled, backend=backend)
+    expected = {a: Egg(pres=presented, rec=recalled).analyze(a).data.values
+                for a in ['spc', 'pfr', 'accuracy', 'lagcrp']}
+    for a in expected:
+        assert np.allclose(egg.analyze(a).data.values, expected[a], equal_nan=True)
+    info = egg.recall_cache_info()
+    assert info['misses'] == 1 and info['hits'] == 3
+
+
+def test_cracked_egg_slices_cache():
+    egg = Egg(pres=presented, rec=recalled)
+    full = egg.get_recall_matrix()
+    cracked = egg.crack(subjects=[1], lists=[1])
+    assert cracked.recall_cache_info()['keys'] == [('exact',)]
+    assert np.array_equal(cracked.get_recall_matrix(), full[[3]], equal_nan=True)
+
+
+def test_cache_invalidated_by_setter():
+    egg = Egg(pres=presented, rec=recalled)
+    egg.get_recall_matrix()
+    egg.rec = Egg(pres=presented, rec=[[['cat'], ['zoo']], [['cat'], ['zoo']]]).rec
+    assert egg.recall_cache_info()['keys'] == []
+    assert np.array_equal(egg.get_recall_matrix()[:, 0], [1, 1, 1, 1])
+    egg.clear_recall_cache()
+    assert egg.recall_cache_info()['keys'] == []
+
+
+def test_cache_limit():
+    cache = RecallMatrixCache(limit=100)
+    cache.get('a', lambda: np.zeros(10))
+    cache.get('b', lambda: np.zeros(10))
+    assert cache.info()['keys'] == ['b']
+    big = cache.get('c', lambda: np.zeros(100))
+    assert big.flags.writeable
+    assert cache.info()['keys'] == ['b']
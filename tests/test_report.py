@@ -0,0 +1,65 @@
+import os
+import zipfile
+import numpy as np
+import pytest
+import quail
+from quail import FriedEgg
+
+egg = quail.simulate_egg(n_subjects=4, n_lists=4, random_state=0)
+results = [egg.analyze(analysis, listgroup=['a', 'a', 'b', 'b'])
+           for analysis in ['spc', 'lagcrp', 'pfr', 'fingerprint', 'accuracy']]
+
+
+@pytest.mark.parametrize('backend', ['serial', 'processes'])
+def test_report_files(tmp_path, backend):
+    info = quail.report(results, str(tmp_path), backend=backend, n_jobs=2)
+    assert info['figures'] == 20
+    assert info['figures_per_second'] > 0
+    assert sorted(os.listdir(str(tmp_path))) == sorted(info['files'])
+    assert '0_spc.png' in info['files']
+    assert '3_accuracy.png' in info['files']
+
+
+def test_report_archive(tmp_path):
+    path = str(tmp_path / 'reports.zip')
+    info = quail.report(results[0], path, groups=['x', 'y', 'x', 'y'],
+                        backend='serial')
+    assert info['files'] == ['x_spc.png', 'y_spc.png']
+    with zipfile.ZipFile(path) as zf:
+        assert zf.namelist() == info['files']
+        assert zf.read('x_spc.png').startswith(b'\x89PNG')
+
+
+def test_report_pooled_means():
+    from quail.report import _summarize
+    values = np.array([[[1., 0.]], [[0., 0.]], [[1., np.nan]]])
+    fegg = FriedEgg.from_tensor(values, groups=[0, 1, 2], lists=[0], analysis='spc')
+    panel = _summarize(fegg, ['a', 'a', 'b'])
+    assert panel['labels'].tolist() == ['a', 'b']
+    assert np.allclose(panel['mean'][:, 0], [[.5, 0.], [1., np.nan]], equal_nan=True)
+    assert np.allclose(panel['sem'][0, 0], [.5, 0.])
+
+
+def test_report_template_matches_savefig(tmp_path):
+    import matplotlib.image as mpimg
+    from quail.report import _summarize, FigureTemplate
+    panel = _summarize(results[3], None)
+    template = FigureTemplate(panel)
+    template.update(panel['mean'][0], panel['sem'][0], 'subject 0')
+    template.save(str(tmp_path / 'fast.png'))
+    template.save(str(tmp_path / 'full.pdf'), fmt='pdf')
+    assert all(artist.get_animated() for artist in template.dynamic)
+    for artist in template.dynamic:
+        artist.set_animated(False)
+    template.fig.savefig(str(tmp_path / 'full.png'))
+    fast = mpimg.imread(str(tmp_path / 'fast.png'))
+    full = mpimg.imread(str(tmp_path / 'full.png'))
+    assert fast.shape == full.shape
+    assert np.abs(fast - full).max() < .1
+
+
+def test_report_errors(tmp_path):
+    with pytest.raises(ValueError):
+        quail.report([results[0], results[0]], str(tmp_path), backend='serial')
+    with pytest.raises(ValueError):
+        quail.report(results[0], str(tmp_path), groups=['a'], backend='serial')
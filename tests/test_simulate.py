@@ -1,5 +1,6 @@
 import pytest
 import quail.simulate as simulate
+import numpy as np
 import pandas as pd
 
 def test_simulate_list():
@@ -7,3 +8,72 @@ def test_simulate_list():
     assert isinstance(df, pd.DataFrame)
     assert len(df) == 16
     assert 'COLOR' in df.columns
+
+def test_simulate_egg():
+    egg = simulate.simulate_egg(n_subjects=3, n_lists=4, list_length=12,
+                                features=['category', 'color', 'length'],
+                                random_state=0)
+    assert (egg.n_subjects, egg.n_lists, egg.list_length) == (3, 4, 12)
+    assert egg.arrays.pres_features['color'].kind == 'vector'
+    assert egg.arrays.pres_features['category'].kind == 'categorical'
+    again = simulate.simulate_egg(n_subjects=3, n_lists=4, list_length=12,
+                                  features=['category', 'color', 'length'],
+                                  random_state=0)
+    assert egg.get_rec_items().equals(again.get_rec_items())
+    # lists of up to 16 words come from one group of the wordpool
+    wp = simulate._wordpool().set_index('WORD')
+    for lst in egg.get_pres_items().values:
+        assert wp.loc[list(lst), 'GROUP'].nunique() == 1
+
+
+def test_simulate_egg_recall_parameters():
+    kwargs = dict(n_subjects=10, n_lists=8, random_state=0)
+    flat = simulate.simulate_egg(contiguity=0, semantic=0, primacy=0,
+                                 recency=0, **kwargs)
+    features = ['category', 'Temporal']
+    flat_fp = flat.analyze('fingerprint', features=features).get_data().mean()
+    # each kind of clustering on its own, as they compete for the transitions
+    for feature, params in [('category', dict(contiguity=0, semantic=3)),
+                            ('Temporal', dict(contiguity=2, semantic=0))]:
+        clustered = simulate.simulate_egg(**dict(kwargs, **params))
+        fp = clustered.analyze('fingerprint', features=features).get_data().mean()
+        assert fp[feature] > flat_fp[feature] + .1
+
+    def n_intrusions(egg):
+        pres, rec = egg.get_pres_items().values, egg.get_rec_items().values
+        return sum(len(set(r[pd.notnull(r)]) - set(p)) for p, r in zip(pres, rec))
+
+    assert n_intrusions(simulate.simulate_egg(intrusion_rate=0, **kwargs)) == 0
+    assert n_intrusions(simulate.simulate_egg(intrusion_rate=.5, **kwargs)) > 100
+
+
+def test_simulate_egg_serial_position():
+    kwargs = dict(n_subjects=50, n_lists=8, random_state=0)
+    spc = simulate.simulate_egg(**kwargs).analyze('spc').get_data().mean().values
+    middle = spc[4:12].mean()
+    assert spc[0] > middle + .1 and spc[-1] > middle + .1
+    flat = simulate.simulate_egg(primacy=0, recency=0, contiguity=2,
+                                 **kwargs).analyze('spc').get_data().mean().values
+    assert np.abs(flat - .5).max() < .1
+
+
+def test_simulate_egg_bad_input():
+    with pytest.raises(ValueError):
+        simulate.simulate_egg(features=['shape'])
+    with pytest.raises(ValueError):
+        simulate.simulate_egg(list_length=300)
+    with pytest.raises(ValueError):
+        simulate.simulate_egg(intrusion_rate=1)
+
+
+def test_simulate_shards(tmpdir):
+    from quail import load_shards
+    shards = list(simulate.simulate_shards(5, subjects_per_shard=2,
+                                           path=str(tmpdir), random_state=1))
+    assert [egg.n_subjects for egg in shards] == [2, 2, 1]
+    assert list(shards[1].get_pres_items().index.levels[0]) == [2, 3]
+    again = simulate.simulate_shards(5, subjects_per_shard=2, random_state=1)
+    assert next(again).get_rec_items().equals(shards[0].get_rec_items())
+    loaded = list(load_shards(str(tmpdir)))
+    assert len(loaded) == 3
+    assert loaded[2].get_rec_items().equals(shards[2].get_rec_items())
@@ -76,3 +76,23 @@ def test_spc_smooth_correlation_3d():
                [[20, 0, 0], [40, 0, -20], [10, 0, 10]]]]
     egg = Egg(pres=presented,rec=recalled)
     egg.analyze('spc', match='smooth', distance='euclidean', features='item').data.values
+
+def test_spc_rows_variable_length():
+    from quail.analysis.spc import spc_rows
+    presented=[[['cat', 'bat', 'hat', 'goat'],['zoo', 'animal', 'zebra']]]
+    recalled=[[['bat', 'dog', 'goat'],['zebra', 'zoo', 'zoo']]]
+    egg = Egg(pres=presented,rec=recalled)
+    assert np.array_equal(spc_rows(egg), [[0., 1., 0., 1.], [1., 0., 1., np.nan]], equal_nan=True)
+
+def test_spc_grouped_matches_helper():
+    from quail.analysis.spc import spc_helper
+    presented=[[['cat', 'bat', 'hat', 'goat'],['zoo', 'animal', 'zebra', 'horse'],['a', 'b', 'c', 'd']]]*3
+    recalled=[[['bat', 'cat'],['animal', 'horse', 'zoo'],['d']],
+              [['goat'],['zebra'],['a', 'b', 'c']],
+              [[],['horse', 'zoo'],['c', 'd']]]
+    egg = Egg(pres=presented,rec=recalled,subjgroup=['x', 'y', 'x'],listgroup=['l', 'm', 'l'])
+    result = egg.analyze('spc').data
+    for subj, subjects in [('x', [0, 2]), ('y', [1])]:
+        for lst, lists in [('l', [0, 2]), ('m', [1])]:
+            expected = spc_helper(egg.crack(subjects=subjects, lists=lists))
+            assert np.allclose(result.loc[(subj, lst)].values, expected)
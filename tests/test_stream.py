@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pytest
+import quail
+from quail.egg import Egg
+
+presented = [[['cat', 'bat', 'hat', 'goat'], ['zoo', 'animal', 'zebra', 'horse']]]
+recalled = [[['bat', 'cat', 'goat', 'hat'], ['animal', 'horse', 'zoo']]]
+other = [[['goat', 'hat', 'cat'], ['zebra', 'zoo', 'horse', 'animal']]]
+
+shards = [Egg(pres=presented, rec=recalled),
+          Egg(pres=presented, rec=other),
+          Egg(pres=presented * 2, rec=recalled + other, backend='columnar')]
+
+
+def _equal(a, b):
+    return (a.data.index.equals(b.data.index) and
+            np.allclose(a.data.values.astype(float), b.data.values.astype(float),
+                        equal_nan=True))
+
+
+@pytest.mark.parametrize('analysis', ['accuracy', 'spc', 'pfr', 'lagcrp', 'temporal'])
+def test_stream_matches_stacked(analysis):
+    stacked = quail.stack_eggs(shards)
+    streamed = quail.analyze(iter(shards), analysis=analysis)
+    assert streamed.n_subjects == 4
+    assert _equal(streamed, stacked.analyze(analysis))
+
+
+@pytest.mark.parametrize('backend', ['serial', 'threads'])
+def test_stream_matches_stacked_permuted(backend):
+    # every list draws its permutation seed in the same order either way
+    kwargs = dict(analysis='temporal', permute=True, n_perms=20, random_state=0)
+    stacked = quail.stack_eggs(shards).analyze(backend=backend, **kwargs)
+    assert _equal(quail.analyze(iter(shards), **kwargs), stacked)
+    subjgroup = ['a', 'b', 'a', 'b']
+    assert _equal(quail.analyze(iter(shards), subjgroup=subjgroup, **kwargs),
+                  quail.stack_eggs(shards).analyze(subjgroup=subjgroup,
+                                                   backend=backend, **kwargs))
+
+
+@pytest.mark.parametrize('analysis', ['accuracy', 'spc', 'pfr', 'lagcrp', 'temporal'])
+@pytest.mark.parametrize('subjgroup', [None, ['x', 'x', 'y']])
+def test_stream_shards_with_different_lists(analysis, subjgroup):
+    egg = Egg(pres=presented * 3, rec=recalled + other + recalled)
+    ragged = [egg.crack(subjects=[0], lists=[0]), egg.crack(subjects=[1, 2])]
+    streamed = quail.analyze(iter(ragged), analysis=analysis, subjgroup=subjgroup)
+    stacked = quail.stack_eggs(ragged).analyze(analysis, subjgroup=subjgroup)
+    assert len(streamed.data) == len(stacked.data) == (2 if subjgroup else 3) * 2
+    assert _equal(streamed, stacked)
+
+
+def test_stream_subject_groups_span_shards():
+    subjgroup = ['a', 'b', 'a', 'b']
+    stacked = quail.stack_eggs(shards)
+    streamed = quail.analyze((s for s in shards), analysis='spc', subjgroup=subjgroup)
+    assert len(streamed.data) == 4
+    assert _equal(streamed, stacked.analyze('spc', subjgroup=subjgroup))
+
+
+def test_stream_from_directory(tmpdir):
+    for i, shard in enumerate(shards):
+        shard.save(str(tmpdir.join('shard%d.egg' % i)),
+                   format='columnar' if i % 2 else 'joblib')
+    assert len(list(quail.load_shards(str(tmpdir)))) == 3
+    streamed = quail.analyze(str(tmpdir), analysis='accuracy')
+    assert _equal(streamed, quail.stack_eggs(shards).analyze('accuracy'))
+
+
+def test_stream_errors():
+    with pytest.raises(ValueError):
+        quail.analyze(iter([]), analysis='spc')
+    with pytest.raises(ValueError):
+        quail.analyze(iter(shards), analysis='spc', subjgroup=['a', 'b'])